@@ -0,0 +1,351 @@
+import time
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
+import wire
+import metrics
+
+# [BARU] Satu requests.Session bersama untuk semua panggilan API (UserManager,
+# MessageManager, transfer file, push, login/registrasi wajah).
+# Koneksi keep-alive dipakai ulang sehingga polling tidak membuka TCP+TLS baru
+# setiap detik. Pool dibatasi (pool_block=True: thread menunggu koneksi bebas
+# alih-alih membuka koneksi tambahan). Session aman dipakai lintas thread
+# selama tidak ada yang mengubah cookie/header bersama setelah dibuat.
+
+POOL_CONNECTIONS = 4 # Jumlah host berbeda yang pool-nya disimpan
+POOL_MAXSIZE = 8     # Koneksi maksimum per host (termasuk satu koneksi SSE)
+
+# Timeout (connect, read) per jenis endpoint
+ENDPOINT_TIMEOUTS = {
+    "default": (5, 10),
+    "auth": (5, 10),
+    "contacts": (5, 10),
+    "history": (5, 10),
+    "send": (5, 10),
+    "vigenere": (3, 5),
+    "face_login": (5, 30),
+    "face_register": (5, 60),
+    "transfer": (10, 60),
+    "push": (10, 60),
+}
+
+# Percobaan ulang otomatis hanya untuk status 502/503/504 pada metode idempoten
+# (server menjawab cepat). Gagal connect / timeout baca TIDAK diulang urllib3:
+# setiap request = satu percobaan jaringan yang langsung dicatat circuit breaker,
+# jadi host yang mati membuat circuit terbuka dalam hitungan satu timeout per
+# request, bukan setelah ~20 detik percobaan ulang tersembunyi. Pemanggil
+# (polling, outbox, transfer) sudah punya percobaan ulang sendiri.
+# PUT tidak termasuk: chunk upload (transfer.py) sudah diulang sendiri dengan
+# offset dari server, percobaan urllib3 di bawahnya hanya melipatgandakannya.
+RETRY_POLICY = Retry(
+    total=2, connect=0, read=0, status=2,
+    backoff_factor=0.3,
+    status_forcelist=(502, 503, 504),
+    allowed_methods=frozenset({"GET", "HEAD", "OPTIONS", "DELETE"}),
+    raise_on_status=False,
+    respect_retry_after_header=True,
+)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                          max_retries=RETRY_POLICY, pool_block=True)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    # [BARU] Tawarkan semua Content-Encoding yang bisa di-decode urllib3 (zstd/br jika terpasang)
+    session.headers.update({"User-Agent": "LDU-Client/1.0", "Accept-Encoding": ACCEPT_ENCODING})
+    return session
+
+
+def get_session():
+    """Session bersama (dibuat saat pertama kali dipakai)."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def close_session():
+    """Tutup semua koneksi pool (mis. saat aplikasi keluar)."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+# --- [BARU] Circuit breaker per host ---
+# Setelah CIRCUIT_FAILURE_THRESHOLD kegagalan beruntun (gagal connect, timeout,
+# 502/503/504) circuit "open": request ke host itu langsung ditolak dengan
+# CircuitOpenError tanpa menunggu timeout. Setelah jeda berlalu, satu request
+# dibiarkan lewat sebagai percobaan ("half_open"); berhasil -> "closed",
+# gagal -> "open" lagi dengan jeda dua kali lipat (maks CIRCUIT_OPEN_MAX).
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_OPEN = "open"
+CIRCUIT_HALF_OPEN = "half_open"
+
+CIRCUIT_FAILURE_THRESHOLD = 3
+CIRCUIT_OPEN_MIN = 5.0
+CIRCUIT_OPEN_MAX = 60.0
+CIRCUIT_FAILURE_STATUSES = (502, 503, 504)
+# [REVISI] False: setiap request benar-benar dikirim (tidak pernah CircuitOpenError,
+# jadi get_json_conditional juga tidak menyajikan salinan offline). Dipakai load
+# test agar kegagalan server tercatat apa adanya.
+CIRCUIT_BREAKER_ENABLED = True
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Request tidak dikirim karena server sedang dianggap tidak bisa dihubungi."""
+
+
+class CircuitBreaker:
+    def __init__(self, host):
+        self.host = host
+        self.state = CIRCUIT_CLOSED
+        self.failures = 0
+        self.open_duration = CIRCUIT_OPEN_MIN
+        self.retry_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """Raise CircuitOpenError jika request tidak boleh dikirim sekarang."""
+        with self._lock:
+            if self.state == CIRCUIT_CLOSED:
+                return
+            now = time.monotonic()
+            if now >= self.retry_at:
+                # Request ini menjadi percobaan. Jika hasilnya tidak pernah tercatat
+                # (mis. exception lain), percobaan berikutnya diizinkan setelah jeda.
+                self.retry_at = now + self.open_duration
+                if self.state != CIRCUIT_HALF_OPEN:
+                    self._transition(CIRCUIT_HALF_OPEN)
+                return
+            raise CircuitOpenError(f"Server {self.host} tidak bisa dihubungi (mode offline).")
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.open_duration = CIRCUIT_OPEN_MIN
+            if self.state != CIRCUIT_CLOSED:
+                self._transition(CIRCUIT_CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == CIRCUIT_HALF_OPEN:
+                self.open_duration = min(self.open_duration * 2, CIRCUIT_OPEN_MAX)
+            elif self.state == CIRCUIT_OPEN or self.failures < CIRCUIT_FAILURE_THRESHOLD:
+                return
+            self.retry_at = time.monotonic() + self.open_duration
+            self._transition(CIRCUIT_OPEN)
+
+    def _transition(self, state):
+        self.state = state
+        print(f"api_client: Circuit {self.host} -> {state}")
+        for listener in list(_circuit_listeners):
+            try:
+                listener(self.host, state)
+            except Exception as e:
+                print(f"api_client: Listener circuit gagal: {e}")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+_circuit_listeners = []
+
+
+def _breaker_for(url):
+    host = urlsplit(url).netloc
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = CircuitBreaker(host)
+    return breaker
+
+
+def circuit_state(url):
+    return _breaker_for(url).state
+
+
+def add_circuit_listener(callback):
+    """callback(host, state) dipanggil (dari thread mana pun) setiap state circuit berubah."""
+    _circuit_listeners.append(callback)
+
+
+def request(method, url, endpoint="default", **kwargs):
+    """
+    Seperti requests.request, lewat session bersama dengan timeout per endpoint.
+    [REVISI] Melewati circuit breaker host tujuan; raise CircuitOpenError saat offline.
+    """
+    kwargs.setdefault("timeout", ENDPOINT_TIMEOUTS.get(endpoint, ENDPOINT_TIMEOUTS["default"]))
+    breaker = _breaker_for(url) if CIRCUIT_BREAKER_ENABLED else None
+    started = time.perf_counter()
+    try:
+        if breaker:
+            breaker.before_request()
+        response = get_session().request(method, url, **kwargs)
+    except requests.exceptions.RequestException as e:
+        if breaker and isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)) \
+                and not isinstance(e, CircuitOpenError):
+            breaker.record_failure()
+        # [BARU] Metrik: request gagal dicatat dengan nama exception-nya
+        metrics.record(endpoint, time.perf_counter() - started, _body_size(e.request), 0, type(e).__name__)
+        raise
+    if breaker and response.status_code in CIRCUIT_FAILURE_STATUSES:
+        breaker.record_failure()
+    elif breaker:
+        breaker.record_success()
+    metrics.record(endpoint, time.perf_counter() - started,
+                   _body_size(response.request), _response_size(response, kwargs.get("stream")),
+                   f"HTTP {response.status_code}" if response.status_code >= 400 else None)
+    return response
+
+
+def _body_size(prepared):
+    """Ukuran body request yang sudah disiapkan (0 jika tidak ada / stream)."""
+    body = getattr(prepared, "body", None)
+    if isinstance(body, (bytes, str)):
+        return len(body)
+    try:
+        return int(prepared.headers.get("Content-Length") or 0)
+    except (AttributeError, ValueError):
+        return 0
+
+
+def _response_size(response, stream):
+    """Ukuran body di kabel: Content-Length jika ada (sebelum dekompresi), selain itu body yang sudah dibaca."""
+    try:
+        return int(response.headers.get("Content-Length"))
+    except (TypeError, ValueError):
+        pass
+    if not stream:
+        return len(response.content or b"")
+    return 0 # Respons stream tanpa Content-Length (mis. SSE) belum dibaca
+
+
+def get(url, endpoint="default", **kwargs):
+    return request("GET", url, endpoint, **kwargs)
+
+
+def post(url, endpoint="default", **kwargs):
+    return request("POST", url, endpoint, **kwargs)
+
+
+def put(url, endpoint="default", **kwargs):
+    return request("PUT", url, endpoint, **kwargs)
+
+
+# --- [BARU] Body ringkas (msgpack) yang dinegosiasikan, lihat wire.py ---
+_msgpack_hosts = set() # Host yang sudah terbukti membalas msgpack
+
+
+def _host_of(url):
+    parts = urlsplit(url)
+    return parts.scheme, parts.netloc
+
+
+def decode_payload(response):
+    """Seperti response.json(), tetapi juga menerima msgpack. None jika body tidak valid."""
+    content_type = response.headers.get("Content-Type", "")
+    try:
+        payload = wire.decode(response.content, content_type)
+    except wire.WireError:
+        return None
+    if content_type.startswith(wire.MSGPACK_TYPE):
+        _msgpack_hosts.add(_host_of(response.url or ""))
+    return payload
+
+
+def post_payload(url, payload, endpoint="default", **kwargs):
+    """
+    POST payload (dict). Ke server yang sudah pernah membalas msgpack, body dikirim
+    sebagai msgpack (dan gzip jika besar); selain itu sebagai JSON biasa.
+    Balasan dibaca dengan decode_payload().
+    """
+    headers = dict(kwargs.pop("headers", None) or {})
+    headers.setdefault("Accept", wire.ACCEPT)
+    if wire.msgpack and _host_of(url) in _msgpack_hosts:
+        body, encoding = wire.compress(wire.encode(payload, wire.MSGPACK_TYPE), "gzip")
+        packed_headers = dict(headers, **{"Content-Type": wire.MSGPACK_TYPE})
+        if encoding:
+            packed_headers["Content-Encoding"] = encoding
+        response = post(url, endpoint, data=body, headers=packed_headers, **kwargs)
+        if response.status_code != 415:
+            return response
+        _msgpack_hosts.discard(_host_of(url)) # Server tidak lagi menerima msgpack: kembali ke JSON
+    return post(url, endpoint, json=payload, headers=headers, **kwargs)
+
+
+# --- [BARU] GET bersyarat (ETag / Last-Modified) ---
+# Respons JSON terakhir per (url, params) disimpan bersama validator-nya. Request
+# berikutnya mengirim If-None-Match / If-Modified-Since; 304 berarti hasil parse
+# sebelumnya dipakai ulang tanpa mengunduh atau mem-parse body lagi.
+# [REVISI] Respons 200 terakhir selalu disimpan (juga tanpa validator) karena
+# salinan ini juga yang disajikan saat circuit terbuka; header bersyarat hanya
+# dikirim jika validatornya ada.
+CONDITIONAL_CACHE_SIZE = 256
+
+_conditional_cache = OrderedDict() # (url, params) -> (etag, last_modified, payload)
+_conditional_lock = threading.Lock()
+
+
+def _conditional_key(url, params):
+    return url, tuple(sorted((params or {}).items()))
+
+
+def get_json_conditional(url, endpoint="default", params=None, **kwargs):
+    """
+    GET JSON dengan validator cache. Mengembalikan (status_code, payload, changed):
+    - 304 -> (200, payload sebelumnya, False)
+    - 200 -> (200, payload baru, True)
+    - status lain -> (status, payload jika bisa di-parse, True)
+    - circuit open + ada salinan -> (200, payload sebelumnya, False)
+    Exception requests lain diteruskan ke pemanggil.
+    """
+    key = _conditional_key(url, params)
+    headers = dict(kwargs.pop("headers", None) or {})
+    headers.setdefault("Accept", wire.ACCEPT)
+    with _conditional_lock:
+        cached = _conditional_cache.get(key)
+        if cached:
+            _conditional_cache.move_to_end(key)
+    if cached:
+        etag, last_modified, _payload = cached
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+    try:
+        response = get(url, endpoint, params=params, headers=headers, **kwargs)
+    except CircuitOpenError:
+        if cached:
+            return 200, cached[2], False # [BARU] Offline: sajikan salinan terakhir (read-only)
+        raise
+    if response.status_code == 304 and cached:
+        return 200, cached[2], False
+    payload = decode_payload(response)
+    if response.status_code == 200 and payload is not None:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with _conditional_lock:
+            _conditional_cache[key] = (etag, last_modified, payload)
+            _conditional_cache.move_to_end(key)
+            while len(_conditional_cache) > CONDITIONAL_CACHE_SIZE:
+                _conditional_cache.popitem(last=False)
+    return response.status_code, payload, True
+
+
+def clear_conditional_cache():
+    with _conditional_lock:
+        _conditional_cache.clear()
@@ -1,24 +1,172 @@
 import os
+import time
 import base64
-import requests
+import threading
 import uuid
 import hashlib 
-import json    
 from stegano import lsb
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QLineEdit, QPushButton, QMessageBox,
-    QListWidget, QListWidgetItem, QFileDialog,
-    QInputDialog, QFrame, QApplication, QDialog,
-    QSizePolicy
+    QListView, QFileDialog,
+    QInputDialog, QProgressBar
 )
-from PySide6.QtGui import QFont, QColor, QPixmap
-from PySide6.QtCore import Qt, QSize, QTimer # [INSTRUKSI 1] Impor QTimer
+from PySide6.QtGui import QFont, QPixmap
+from PySide6.QtCore import Qt, QTimer, QThread, QObject, Signal, Slot # [INSTRUKSI 1] Impor QTimer
 from datetime import datetime, timezone # Diperlukan untuk timestamp
 
-from utils import CryptoEngine, vigenere_encrypt, vigenere_decrypt, encrypt_whitemist, decrypt_whitemist
+from utils import CryptoEngine, VigenereUnavailableError, vigenere_encrypt, vigenere_decrypt, encrypt_whitemist, decrypt_whitemist, parse_db_timestamp, API_BASE_URL
+from chat_view import ChatMessageModel, ChatBubbleDelegate
+from poll_scheduler import AdaptivePoller
+from message_cache import MessageCache
+from transfer import ChunkedUploader, download_file, TransferCancelled
+from outbox import STATE_PENDING
+from api_client import CIRCUIT_CLOSED
+
+# [BARU] Referensi (QThread, worker) yang sedang dimatikan. Thread pengambil
+# riwayat / unduhan boleh masih berjalan saat ChatPage-nya dihapus; referensi
+# di sini mencegah keduanya dihancurkan sebelum sinyal finished keluar.
+_retiring_threads = set()
+
+
+def wait_for_retiring_threads(timeout_ms=2000):
+    """Dipanggil saat aplikasi keluar: tunggu thread yang sedang dimatikan selesai."""
+    for thread, _worker in list(_retiring_threads):
+        thread.wait(timeout_ms)
+
+#
+# --- [BARU] Worker untuk mengambil riwayat chat di luar thread GUI ---
+#
+class HistoryFetchWorker(QObject):
+    """
+    Hidup di QThread milik ChatPage. Setiap permintaan fetch menjalankan
+    load_messages (blocking) lalu mengirim hasilnya lewat sinyal.
+    'generation' dikembalikan apa adanya agar ChatPage bisa membuang respons basi.
+    """
+    messages_loaded = Signal(int, list, bool) # (generation, pesan, berhasil)
+
+    def __init__(self, message_manager):
+        super().__init__()
+        self.message_manager = message_manager
+
+    @Slot(str, object, int)
+    def fetch(self, chat_id, since, generation):
+        try:
+            messages = self.message_manager.load_messages(chat_id, since=since)
+        except Exception as e:
+            print(f"HistoryFetchWorker: Gagal memuat pesan: {e}")
+            messages = None
+        ok = isinstance(messages, list)
+        self.messages_loaded.emit(generation, messages if ok else [], ok)
+
+#
+# --- [BARU] Worker unduhan lampiran (menggantikan dialog loading modal) ---
+#
+class DownloadWorker(QObject):
+    """
+    Mengunduh satu file_id ke disk di thread sendiri (transfer.download_file:
+    streaming per blok ke .part, bisa dilanjutkan). Progres dikirim lewat sinyal,
+    dibatasi ~10x per detik. cancel() aman dipanggil dari thread GUI.
+    """
+    progress = Signal(object, object) # (byte diterima, total byte; 0 = tidak diketahui)
+    finished = Signal(str)            # path lokal
+    failed = Signal(str)              # pesan error
+    cancelled = Signal()
+
+    PROGRESS_INTERVAL = 0.1 # detik
+
+    def __init__(self, api_url, chat_id, file_id, dest_path):
+        super().__init__()
+        self.api_url = api_url
+        self.chat_id = chat_id
+        self.file_id = file_id
+        self.dest_path = dest_path
+        self._cancel_event = threading.Event()
+        self._last_progress = 0.0
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def _on_progress(self, received, total):
+        now = time.monotonic()
+        if now - self._last_progress >= self.PROGRESS_INTERVAL or (total and received >= total):
+            self._last_progress = now
+            self.progress.emit(received, total)
+
+    @Slot()
+    def run(self):
+        try:
+            download_file(self.api_url, self.chat_id, self.file_id, self.dest_path,
+                          on_progress=self._on_progress, cancel_event=self._cancel_event)
+        except TransferCancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            print(f"DownloadWorker: Gagal mengunduh {self.file_id}: {e}")
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(self.dest_path)
+
+#
+# --- [BARU] Worker unggah lampiran (enkripsi + upload di luar thread GUI) ---
+#
+class UploadWorker(QObject):
+    """
+    Menjalankan prepare() (enkripsi / steganografi yang menulis upload_path)
+    lalu ChunkedUploader.upload di thread sendiri. Gagal atau dibatalkan ->
+    upload_path dihapus di sini; jika berhasil pemanggil yang menghapusnya.
+    cancel() aman dipanggil dari thread GUI.
+    """
+    progress = Signal(object, object) # (byte terkirim, total byte)
+    finished = Signal(str)            # file_id dari server
+    failed = Signal(str)              # pesan error
+    cancelled = Signal()
+
+    PROGRESS_INTERVAL = 0.1 # detik
+
+    def __init__(self, uploader, prepare, upload_path, filename, content_type):
+        super().__init__()
+        self.uploader = uploader
+        self.prepare = prepare
+        self.upload_path = upload_path
+        self.filename = filename
+        self.content_type = content_type
+        self._cancel_event = threading.Event()
+        self._last_progress = 0.0
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def _on_progress(self, sent, total):
+        now = time.monotonic()
+        if now - self._last_progress >= self.PROGRESS_INTERVAL or sent >= total:
+            self._last_progress = now
+            self.progress.emit(sent, total)
+
+    def _remove_upload_file(self):
+        try:
+            if os.path.exists(self.upload_path): os.remove(self.upload_path)
+        except OSError as e:
+            print(f"UploadWorker: Gagal menghapus file sementara: {e}")
+
+    @Slot()
+    def run(self):
+        try:
+            self.prepare()
+            file_id = self.uploader.upload(self.upload_path, self.filename, self.content_type,
+                                           on_progress=self._on_progress, cancel_event=self._cancel_event)
+        except TransferCancelled:
+            self._remove_upload_file()
+            self.cancelled.emit()
+        except Exception as e:
+            print(f"UploadWorker: Gagal mengunggah {self.filename}: {e}")
+            self._remove_upload_file()
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(file_id)
 
 class ChatPage(QWidget):
+    # [BARU] Dikirim ke HistoryFetchWorker: (chat_id, cursor, generation)
+    fetch_requested = Signal(str, object, int)
     
     # --- Palet Warna (Tidak Berubah) ---
     COLOR_BACKGROUND = "#1A1B2E"
@@ -39,19 +187,27 @@ class ChatPage(QWidget):
     COLOR_BUBBLE_RECV = "#3E3C6E"
     # -----------------------------------------------
 
-    def __init__(self, current_user, recipient_username, shared_password, message_manager, back_callback):
+    # [BARU] Interval polling (ms): normal, dan saat kanal push tersambung
+    # (polling hanya jaring pengaman karena pesan baru datang lewat push)
+    POLL_RANGE = (1000, 15000)
+    POLL_RANGE_PUSH = (15000, 60000)
+
+    def __init__(self, current_user, recipient_username, shared_password, message_manager, back_callback, push_bridge=None, delivery_bridge=None, connection_bridge=None):
         super().__init__()
         # ... (Logika init TIDAK BERUBAH) ...
         self.current_user = current_user
         self.recipient_username = recipient_username
         self.message_manager = message_manager
         self.back_callback = back_callback
+        self.push_bridge = push_bridge
+        self.delivery_bridge = delivery_bridge
+        self.connection_bridge = connection_bridge
         
         self.chat_id = self.message_manager.get_chat_id(self.current_user, self.recipient_username)
         self.session_crypto = CryptoEngine(shared_password)
         
-        self.api_url = "https://morsz.azeroth.site/"
-        self.MAX_FILE_SIZE = 2 * 1024 * 1024 # 2MB
+        self.api_url = API_BASE_URL # [REVISI] Sama dengan UserManager/MessageManager (konfigurasi)
+        self.MAX_FILE_SIZE = 2 * 1024 * 1024 # 2MB (White-Mist & stegano; file AES di-stream tanpa batas)
         
         script_file_path = os.path.abspath(__file__)
 
@@ -62,9 +218,18 @@ class ChatPage(QWidget):
         # 4. Tentukan base_data_dir Anda di dalam direktori basis tersebut
         self.base_data_dir = os.path.join(base_project_dir, "local_data")
         self.cache_dir = os.path.join(self.base_data_dir, "user_caches")
-        self.cache_file = os.path.join(self.cache_dir, f"cache_{self.current_user}.json")
+        self.cache_file = os.path.join(self.cache_dir, f"cache_{self.current_user}.json") # Cache lama (diimpor sekali)
+        self.cache_db_file = os.path.join(self.cache_dir, f"cache_{self.current_user}.sqlite3")
         self.message_cache = self.load_cache()
         
+        # [BARU] State delta sync: cursor = db_timestamp server terbaru yang sudah
+        # ditampilkan, displayed_items = key pesan -> nomor baris di chat_model.
+        self.sync_cursor = None
+        self.displayed_items = {}
+        # [BARU] client_msg_id -> nomor baris bubble kiriman sendiri (state outbox)
+        self.outbox_rows = {}
+        self.undelivered_shown = False
+        
         self.temp_stegano_dir = os.path.join(self.base_data_dir, "temp_stegano")
         self.temp_download_dir = os.path.join(self.base_data_dir, "temp_downloads")
         self.temp_decrypted_dir = os.path.join(self.base_data_dir, "temp_decrypted")
@@ -72,16 +237,55 @@ class ChatPage(QWidget):
         for folder in [self.base_data_dir, self.cache_dir, self.temp_stegano_dir, self.temp_download_dir, self.temp_decrypted_dir]:
             if not os.path.exists(folder):
                 os.makedirs(folder)
+        # [BARU] Upload per chunk (UploadWorker, satu per ChatPage)
+        self.uploader = ChunkedUploader(self.api_url, self.chat_id)
+        self.upload_thread = None
+        self.upload_worker = None
+        self.upload_request = None # (path file sementara, fungsi lanjutan setelah selesai)
+        # [BARU] Unduhan lampiran yang sedang berjalan (satu per ChatPage)
+        self.download_thread = None
+        self.download_worker = None
+        self.download_request = None # (metadata, fungsi lanjutan setelah selesai)
 
         self.init_ui() 
+        # [BARU] Riwayat terakhir dari cache lokal langsung tampil; fetch jaringan
+        # di bawah hanya mengambil pesan sejak sync_cursor snapshot tersebut.
+        self.show_history_snapshot()
+        
+        # [BARU] Thread pengambil riwayat. fetch_in_flight mencegah tick polling
+        # menumpuk; fetch_generation dinaikkan saat sinkronisasi dihentikan
+        # sehingga respons yang datang sesudahnya dibuang.
+        self.fetch_in_flight = False
+        self.refetch_pending = False
+        self.fetch_generation = 0
+        self.fetch_thread = QThread()
+        self.fetch_worker = HistoryFetchWorker(self.message_manager)
+        self.fetch_worker.moveToThread(self.fetch_thread)
+        self.fetch_requested.connect(self.fetch_worker.fetch)
+        self.fetch_worker.messages_loaded.connect(self.on_history_loaded)
+        self.fetch_thread.finished.connect(self.fetch_worker.deleteLater)
+        self.fetch_thread.start()
         
         # Refresh saat pertama kali masuk
         QTimer.singleShot(0, self.refresh_chat_display)
         
-        # [INSTRUKSI 1] Mulai polling data setiap 5 detik
-        self.poll_timer = QTimer(self)
-        self.poll_timer.timeout.connect(self.refresh_chat_display)
-        self.poll_timer.start(1000) # 5000 ms = 5 detik
+        # [REVISI] Polling adaptif: 1 detik saat aktif, mundur sampai 15 detik
+        # saat idle, berhenti saat window tersembunyi.
+        self.poll_scheduler = AdaptivePoller(self, *self.POLL_RANGE)
+        self.poll_scheduler.tick.connect(self.refresh_chat_display)
+        self.poll_scheduler.start()
+
+        # [BARU] Event push: pesan baru di chat ini langsung memicu delta sync
+        if self.push_bridge is not None:
+            self.push_bridge.event_received.connect(self.on_push_event)
+            self.push_bridge.state_changed.connect(self.on_push_state_changed)
+            self.on_push_state_changed(self.push_bridge.is_connected())
+        if self.delivery_bridge is not None:
+            self.delivery_bridge.state_changed.connect(self.on_delivery_state_changed)
+        # [BARU] Mode offline: riwayat dari salinan terakhir, pesan baru masuk outbox
+        if self.connection_bridge is not None:
+            self.connection_bridge.state_changed.connect(self.on_connection_state_changed)
+            self.on_connection_state_changed(self.connection_bridge.state)
 
 
 
@@ -94,22 +298,59 @@ class ChatPage(QWidget):
             return metadata.get('file_id')
         return None
 
+    def get_display_key(self, metadata):
+        """[BARU] Key unik bubble untuk de-duplikasi delta sync."""
+        message_id = self.get_message_id(metadata)
+        if message_id:
+            return message_id
+        return f"{metadata.get('type')}:{metadata.get('sender')}:{metadata.get('db_timestamp')}"
+
     def load_cache(self):
-        if not os.path.exists(self.cache_file): return {}
+        """[REVISI] Buka cache SQLite dan muat hanya entri milik chat ini."""
         try:
-            with open(self.cache_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError): return {} 
+            self.cache_store = MessageCache(self.cache_db_file, legacy_json_path=self.cache_file)
+            return self.cache_store.load_chat(self.chat_id)
+        except Exception as e:
+            print(f"Peringatan: Gagal membuka cache SQLite: {e}")
+            self.cache_store = None
+            return {}
+
+    def show_history_snapshot(self):
+        """[BARU] Tampilkan snapshot riwayat chat ini dari cache SQLite (tanpa jaringan)."""
+        if not self.cache_store: return
+        try:
+            snapshot = self.cache_store.load_history(self.chat_id)
+        except Exception as e:
+            print(f"Peringatan: Gagal membaca snapshot riwayat: {e}")
+            return
+        if snapshot:
+            self.load_and_display_chat_history(snapshot)
+            self.chat_display.scrollToBottom()
+
+    def save_history_snapshot(self, messages):
+        """[BARU] Simpan pesan hasil fetch ke snapshot (pesan yang sama cukup di-update)."""
+        if not (self.cache_store and messages): return
+        try:
+            self.cache_store.save_history(self.chat_id, [(self.get_display_key(m), m) for m in messages])
+        except Exception as e: print(f"Peringatan: Gagal menyimpan snapshot riwayat: {e}")
+
+    def get_cached(self, message_id):
+        """[BARU] Ambil cache satu pesan; entri cache JSON lama dicari lewat primary key."""
+        if not message_id: return None
+        if message_id in self.message_cache:
+            return self.message_cache[message_id]
+        cached_data = self.cache_store.get(message_id) if self.cache_store else None
+        if cached_data is not None:
+            self.message_cache[message_id] = cached_data
+        return cached_data
 
     def save_to_cache(self, message_id, data_to_cache):
         if not message_id: return
         self.message_cache[message_id] = data_to_cache
+        if not self.cache_store: return
         try:
-            if not os.path.exists(self.cache_dir):
-                os.makedirs(self.cache_dir)
-            with open(self.cache_file, 'w', encoding='utf-8') as f:
-                json.dump(self.message_cache, f, indent=2, ensure_ascii=False)
-        except IOError as e: print(f"Peringatan: Gagal menyimpan cache ke file: {e}")
+            self.cache_store.put(message_id, self.chat_id, data_to_cache)
+        except Exception as e: print(f"Peringatan: Gagal menyimpan cache: {e}")
     # -------------------------------------------
 
     def init_ui(self):
@@ -134,22 +375,48 @@ class ChatPage(QWidget):
         title.setAlignment(Qt.AlignmentFlag.AlignCenter)
         
         top_bar_layout.addWidget(back_btn); top_bar_layout.addWidget(title)
+
+        # [BARU] Label status koneksi (tersembunyi saat server normal)
+        self.connection_label = QLabel()
+        self.connection_label.setStyleSheet(f"color: {self.COLOR_RED}; font-size: 12px;")
+        self.connection_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.connection_label.hide()
         
-        self.chat_display = QListWidget()
+        # [REVISI] QListView + model/delegate: bubble dilukis hanya untuk baris
+        # yang terlihat, bukan satu pohon widget per pesan.
+        self.chat_display = QListView()
         self.chat_display.setStyleSheet(f"""
-            QListWidget {{ 
+            QListView {{ 
                 background-color: {self.COLOR_PANE_LEFT}; 
                 border: 2px solid {self.COLOR_GOLD};
                 border-radius: 12px; 
                 color: {self.COLOR_TEXT}; 
             }}
         """)
-        self.chat_display.setSelectionMode(QListWidget.SelectionMode.NoSelection)
+        self.chat_display.setSelectionMode(QListView.SelectionMode.NoSelection)
         self.chat_display.setFocusPolicy(Qt.FocusPolicy.NoFocus)
         self.chat_display.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAsNeeded)
         self.chat_display.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.chat_display.setVerticalScrollMode(QListView.ScrollMode.ScrollPerPixel)
+        self.chat_display.setResizeMode(QListView.ResizeMode.Adjust)
+        self.chat_display.setLayoutMode(QListView.LayoutMode.Batched)
+        self.chat_display.setBatchSize(100)
+        self.chat_display.setMouseTracking(True)
+
+        self.chat_model = ChatMessageModel(self)
+        self.chat_delegate = ChatBubbleDelegate({
+            'text': self.COLOR_TEXT,
+            'text_subtle': self.COLOR_TEXT_SUBTLE,
+            'gold': self.COLOR_GOLD,
+            'gold_hover': self.COLOR_GOLD_HOVER,
+            'red': self.COLOR_RED,
+            'bubble_sent': self.COLOR_BUBBLE_SENT,
+            'bubble_recv': self.COLOR_BUBBLE_RECV,
+        }, self.chat_display)
+        self.chat_display.setModel(self.chat_model)
+        self.chat_display.setItemDelegate(self.chat_delegate)
         
-        self.chat_display.itemClicked.connect(self.on_chat_item_clicked)
+        self.chat_delegate.message_clicked.connect(self.on_chat_item_clicked)
 
         input_bar_layout = QHBoxLayout()
         self.attach_btn = QPushButton("🖼️ Gbr"); self.attach_btn.setToolTip("Sembunyikan teks dari input ke dalam Gambar (.png)")
@@ -184,26 +451,147 @@ class ChatPage(QWidget):
 
         input_bar_layout.addWidget(self.attach_btn); input_bar_layout.addWidget(self.attach_file_btn)
         input_bar_layout.addWidget(self.message_input); input_bar_layout.addWidget(self.send_btn)
-        layout.addLayout(top_bar_layout); layout.addWidget(self.chat_display); layout.addLayout(input_bar_layout)
+
+        # [BARU] Bar progres unduhan & unggahan (non-modal): chat tetap bisa di-scroll
+        self.download_bar, self.download_label, self.download_progress = self.create_transfer_bar(self.cancel_download)
+        self.upload_bar, self.upload_label, self.upload_progress = self.create_transfer_bar(self.cancel_upload)
+
+        layout.addLayout(top_bar_layout); layout.addWidget(self.connection_label); layout.addWidget(self.chat_display)
+        layout.addWidget(self.download_bar); layout.addWidget(self.upload_bar); layout.addLayout(input_bar_layout)
+
+    def create_transfer_bar(self, cancel_slot):
+        """[BARU] Label + progress bar + tombol Batal; mengembalikan (bar, label, progress)."""
+        bar = QWidget()
+        bar_layout = QHBoxLayout(bar); bar_layout.setContentsMargins(0, 0, 0, 0)
+        label = QLabel()
+        label.setStyleSheet(f"color: {self.COLOR_TEXT_SUBTLE}; font-size: 12px;")
+        progress = QProgressBar()
+        progress.setFixedHeight(14); progress.setTextVisible(False)
+        progress.setStyleSheet(f"""
+            QProgressBar {{ background-color: {self.COLOR_CARD_BG}; border: 1px solid {self.COLOR_CARD}; border-radius: 6px; }}
+            QProgressBar::chunk {{ background-color: {self.COLOR_GOLD}; border-radius: 6px; }}
+        """)
+        cancel_btn = QPushButton("Batal")
+        cancel_btn.setStyleSheet(self.button_style(
+            base=self.COLOR_RED, hover=self.COLOR_RED_HOVER, pressed=self.COLOR_RED_PRESSED, radius=8
+        ))
+        cancel_btn.setFixedSize(70, 26)
+        cancel_btn.clicked.connect(cancel_slot)
+        bar_layout.addWidget(label); bar_layout.addWidget(progress, 1)
+        bar_layout.addWidget(cancel_btn)
+        bar.hide()
+        return bar, label, progress
         
     # [INSTRUKSI 1] Fungsi baru untuk menghentikan timer saat keluar
     def handle_back_pressed(self):
         """Hentikan QTimer polling sebelum memanggil callback kembali."""
-        if hasattr(self, 'poll_timer') and self.poll_timer.isActive():
-            self.poll_timer.stop()
-            print("ChatPage: Polling timer stopped.")
+        self.suspend()
         self.back_callback()
 
-    def load_and_display_chat_history(self):
-        # [REVISI]
-        self.chat_display.clear()
-        messages = self.message_manager.load_messages(self.chat_id)
+    def suspend(self):
+        """
+        [BARU] Halaman disembunyikan tapi tetap disimpan MainWindow (LRU chat):
+        polling & push dihentikan, riwayat yang sudah tampil dan cache tetap.
+        """
+        self.stop_history_sync()
+
+    def resume(self):
+        """[BARU] Halaman dari LRU ditampilkan lagi: delta sync sejak sync_cursor."""
+        if not self.poll_scheduler.is_active():
+            self.poll_scheduler.start()
+        self.refresh_chat_display()
+        self.message_input.setFocus()
+
+    def stop_history_sync(self):
+        """[BARU] Hentikan polling dan abaikan respons fetch yang masih berjalan."""
+        if hasattr(self, 'poll_scheduler') and self.poll_scheduler.is_active():
+            self.poll_scheduler.stop()
+            print("ChatPage: Polling timer stopped.")
+        self.fetch_generation += 1
+        self.fetch_in_flight = False
+        self.refetch_pending = False
+
+    def shutdown(self):
+        """
+        [BARU] Dipanggil sebelum ChatPage dihapus. Thread fetch dihentikan tanpa
+        menunggu (fetch yang sedang berjalan boleh selesai di latar belakang).
+        """
+        self.stop_history_sync()
+        self.cancel_download()
+        self.cancel_upload()
+        if self.upload_thread is not None:
+            # File sementara dihapus oleh worker saat pembatalan sampai
+            self.retire_thread(self.upload_thread, self.upload_worker)
+            self.upload_thread = None
+            self.upload_worker = None
+            self.upload_request = None
+        if self.download_thread is not None:
+            # Unduhan berhenti di blok berikutnya; thread selesai setelah itu
+            self.retire_thread(self.download_thread, self.download_worker)
+            self.download_thread = None
+            self.download_worker = None
+            self.download_request = None
+        if self.cache_store:
+            self.cache_store.close()
+            self.cache_store = None
+        self.retire_thread(self.fetch_thread, self.fetch_worker)
+
+    @staticmethod
+    def retire_thread(thread, worker=None):
+        """
+        Hentikan event loop QThread tanpa menunggu; referensi thread (dan worker
+        di dalamnya) dipegang sampai finished agar tidak dihapus saat masih jalan.
+        """
+        entry = (thread, worker)
+        _retiring_threads.add(entry)
+        thread.finished.connect(lambda: _retiring_threads.discard(entry))
+        if worker is not None:
+            thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        thread.quit()
+
+    def load_and_display_chat_history(self, messages):
+        """
+        [REVISI Delta Sync]
+        Menerima pesan yang lebih baru dari sync_cursor lalu menambahkan bubble
+        untuk pesan yang belum tampil. Mengembalikan jumlah bubble baru.
+        """
+        new_count = 0
+        previous_cursor = self.sync_cursor
+        newest = parse_db_timestamp(self.sync_cursor)
         for msg_data in messages:
+            timestamp = parse_db_timestamp(msg_data.get('db_timestamp'))
+            if timestamp is not None and (newest is None or timestamp > newest):
+                newest = timestamp
+                self.sync_cursor = msg_data['db_timestamp']
+
+            display_key = self.get_display_key(msg_data)
+            existing_row = self.displayed_items.get(display_key)
+            if existing_row is not None:
+                # Pesan kiriman sendiri yang sudah tampil: cukup pakai metadata server
+                # [REVISI] Metadata sama (mis. hasil 304) -> tidak perlu digambar ulang
+                if self.chat_model.index(existing_row).data(Qt.UserRole) != msg_data:
+                    self.chat_model.set_metadata(existing_row, msg_data)
+                continue
+
             align = "sent" if msg_data['sender'] == self.current_user else "received"
             message_id = self.get_message_id(msg_data)
-            cached_data = self.message_cache.get(message_id)
+            cached_data = self.get_cached(message_id)
             
             self.add_message_to_display(align, msg_data, cached_data, is_loading_history=True)
+            new_count += 1
+        if self.sync_cursor != previous_cursor and self.cache_store:
+            # [BARU] Chat yang terbuka = sudah dibaca sampai cursor ini (badge unread di dashboard)
+            self.cache_store.set_read_cursor(self.chat_id, self.recipient_username, self.sync_cursor)
+        return new_count
+
+    def rerender_message(self, metadata):
+        """[BARU] Lukis ulang satu bubble (mis. setelah dekripsi) tanpa memuat ulang riwayat."""
+        row = self.displayed_items.get(self.get_display_key(metadata))
+        if row is None:
+            return
+        cached_data = self.get_cached(self.get_message_id(metadata))
+        self.chat_model.set_cached_data(row, cached_data)
 
     def handle_send_message_super(self):
         # [REVISI Timestamp]
@@ -229,11 +617,11 @@ class ChatPage(QWidget):
                 'vigenere_key_debug': user_key,
                 'db_timestamp': datetime.now(timezone.utc).astimezone().isoformat()
             }
-            self.message_manager.save_message(self.chat_id, metadata)
+            self.queue_outgoing(metadata)
             message_id = self.get_message_id(metadata)
             self.save_to_cache(message_id, message_text)
             
-            self.add_message_to_display("sent", metadata, cached_data=message_text)
+            self.add_message_to_display("sent", metadata, cached_data=message_text, delivery=STATE_PENDING)
             
         except Exception as e: 
             self.add_message_to_display("error", metadata=None, error_text=f"--- Error Super Enkripsi: {e} ---")
@@ -257,21 +645,14 @@ class ChatPage(QWidget):
         if not os.path.exists(self.temp_stegano_dir): os.makedirs(self.temp_stegano_dir)
         base_filename = os.path.basename(file_path)
         temp_filename = os.path.join(self.temp_stegano_dir, f"stego_{uuid.uuid4()}.png") 
-        try:
+
+        def prepare():
+            # [REVISI] Berjalan di UploadWorker (thread latar)
             encrypted_text_to_hide = vigenere_encrypt(message_to_hide, text_key)
             secret_image = lsb.hide(file_path, encrypted_text_to_hide)
             secret_image.save(temp_filename)
-            
-            self.add_message_to_display("error", metadata=None, error_text=f"--- Mengunggah {base_filename}... ---")
-            
-            with open(temp_filename, "rb") as f:
-                files = {'file': (base_filename, f, 'image/png')}
-                upload_url = f"{self.api_url}/upload_file/{self.chat_id}"
-                response = requests.post(upload_url, files=files, timeout=30)
-            if response.status_code != 200 or not response.json().get("success"):
-                if response.status_code == 413: raise Exception(f"Gagal unggah: {response.json().get('message')}")
-                raise Exception(f"Gagal mengunggah file: {response.json().get('message', 'Error tidak diketahui')}")
-            file_id = response.json().get("file_id")
+
+        def on_uploaded(file_id):
             metadata = { 
                 'type': 'stegano', 
                 'sender': self.current_user, 
@@ -282,14 +663,14 @@ class ChatPage(QWidget):
                 'text_key_debug': text_key,
                 'db_timestamp': datetime.now(timezone.utc).astimezone().isoformat()
             }
-            self.message_manager.save_message(self.chat_id, metadata)
-            
+            self.queue_outgoing(metadata)
+        
             # [REQUEST #2] Simpan ke cache agar thumbnail pengirim muncul
             message_id = self.get_message_id(metadata)
-            
+        
             # [PERBAIKAN] Tentukan path cache menggunakan file_id yang unik dari server
             cached_stego_path = os.path.join(self.temp_stegano_dir, file_id) 
-            
+        
             try:
                 # Salin file stego (temp_filename) ke cache, BUKAN file asli (file_path)
                 if not os.path.exists(cached_stego_path):
@@ -298,17 +679,15 @@ class ChatPage(QWidget):
                     shutil.copy(temp_filename, cached_stego_path) 
             except Exception as e:
                 print(f"Gagal cache stego path: {e}")
-            
+        
             cache_data = {"text": message_to_hide, "image_path": cached_stego_path} 
             self.save_to_cache(message_id, cache_data)
 
-            self.add_message_to_display("sent", metadata, cached_data=cache_data)
-            
+            self.add_message_to_display("sent", metadata, cached_data=cache_data, delivery=STATE_PENDING)
+
+        # [REVISI] Steganografi + upload per chunk di UploadWorker (GUI tidak membeku)
+        if self.start_upload(prepare, temp_filename, base_filename, 'image/png', on_uploaded):
             self.message_input.clear()
-            os.remove(temp_filename)
-        except Exception as e:
-            self.add_message_to_display("error", metadata=None, error_text=f"--- Error Steganografi/Upload: {e} ---")
-            if os.path.exists(temp_filename): os.remove(temp_filename)
 
     def handle_attach_file(self):
         # [REVISI Timestamp]
@@ -316,95 +695,280 @@ class ChatPage(QWidget):
         if not file_path: return
         try:
             file_size = os.path.getsize(file_path)
-            if file_size > self.MAX_FILE_SIZE:
-                QMessageBox.warning(self, "File Terlalu Besar", f"Ukuran file ({file_size // 1024} KB) melebihi batas 2MB ({self.MAX_FILE_SIZE // 1024} KB).")
-                return
-        except OSError as e: QMessageBox.critical(self, "Error", f"Tidak dapat membaca file: {e}")
+        except OSError as e:
+            QMessageBox.critical(self, "Error", f"Tidak dapat membaca file: {e}")
+            return
         methods = ["AES (Modern)", "White-Mist (Eksperimental)"]
         method, ok = QInputDialog.getItem(self, "Pilih Metode Enkripsi", "Metode:", methods, 0, False)
         if not ok: return
+        # [REVISI] Batas 2MB hanya untuk White-Mist (masih memproses seluruh file di memori).
+        # AES memakai enkripsi stream per chunk, jadi memori tetap konstan.
+        if method != "AES (Modern)" and file_size > self.MAX_FILE_SIZE:
+            QMessageBox.warning(self, "File Terlalu Besar", f"Ukuran file ({file_size // 1024} KB) melebihi batas 2MB ({self.MAX_FILE_SIZE // 1024} KB).")
+            return
         key, ok = QInputDialog.getText(self, f"Kunci Enkripsi ({method})", f"Masukkan Kunci untuk {method}:", QLineEdit.Password)
         if not (ok and key): return
-        try:
-            with open(file_path, "rb") as f: data_bytes = f.read()
-            filename = os.path.basename(file_path)
-            encrypted_payload_bytes = None; metadata = {}
-            if method == "AES (Modern)":
-                temp_crypto = CryptoEngine(key); encrypted_payload_bytes = temp_crypto.encrypt(data_bytes)
-                metadata = { 'type': 'file', 'sender': self.current_user, 'recipient': self.recipient_username, 'data': None, 'encryption_method': 'aes', 'aes_key_debug': key, 'filename': filename }
-            elif method == "White-Mist (Eksperimental)":
+        filename = os.path.basename(file_path)
+        encrypted_temp_path = os.path.join(self.temp_download_dir, f"upload_{uuid.uuid4()}.enc")
+        if method == "AES (Modern)":
+            encryption_method = 'aes'
+            def prepare():
+                # [REVISI] Stream v3: file dienkripsi per chunk ke file sementara, tanpa base64
+                temp_crypto = CryptoEngine(key)
+                with open(file_path, "rb") as src, open(encrypted_temp_path, "wb") as dst:
+                    temp_crypto.encrypt_stream(src, dst)
+        elif method == "White-Mist (Eksperimental)":
+            encryption_method = 'whitemist'
+            def prepare():
+                with open(file_path, "rb") as f: data_bytes = f.read()
                 # [INSTRUKSI 1] Ini adalah file, JANGAN kirim 'is_text=True'. Default (False) akan digunakan (Base64).
-                encrypted_string = encrypt_whitemist(data_bytes, key); encrypted_payload_bytes = encrypted_string.encode('utf-8')
-                metadata = { 'type': 'file', 'sender': self.current_user, 'recipient': self.recipient_username, 'data': None, 'encryption_method': 'whitemist', 'aes_key_debug': key, 'filename': filename }
-            else: return 
-            
-            self.add_message_to_display("error", metadata=None, error_text=f"--- Mengunggah {filename} ({method})... ---")
-            
-            files = {'file': (f"{filename}.enc", encrypted_payload_bytes, 'application/octet-stream')}
-            upload_url = f"{self.api_url}/upload_file/{self.chat_id}"
-            response = requests.post(upload_url, files=files, timeout=60)
-            if response.status_code != 200 or not response.json().get("success"):
-                if response.status_code == 413: raise Exception(f"Gagal unggah: {response.json().get('message')}")
-                raise Exception(f"Gagal mengunggah file: {response.json().get('message', 'Error tidak diketahui')}")
-            file_id = response.json().get("file_id")
+                encrypted_payload = encrypt_whitemist(data_bytes, key).encode('utf-8')
+                with open(encrypted_temp_path, "wb") as f: f.write(encrypted_payload)
+        else: return
+
+        def on_uploaded(file_id):
+            metadata = { 'type': 'file', 'sender': self.current_user, 'recipient': self.recipient_username, 'data': None, 'encryption_method': encryption_method, 'aes_key_debug': key, 'filename': filename }
             metadata['file_id'] = file_id 
             metadata['db_timestamp'] = datetime.now(timezone.utc).astimezone().isoformat()
             
-            self.message_manager.save_message(self.chat_id, metadata)
-            
-            self.add_message_to_display("sent", metadata)
+            self.queue_outgoing(metadata)
             
-        except Exception as e: 
-            self.add_message_to_display("error", metadata=None, error_text=f"--- Error File Encryption/Upload: {e} ---")
+            self.add_message_to_display("sent", metadata, delivery=STATE_PENDING)
+
+        # [REVISI] Enkripsi + upload per chunk di UploadWorker (GUI tidak membeku)
+        self.start_upload(prepare, encrypted_temp_path, f"{filename}.enc", 'application/octet-stream', on_uploaded)
+
+    # --- [BARU] Outbox ---
+    def queue_outgoing(self, metadata):
+        """Masukkan pesan ke outbox (metadata diberi client_msg_id) lalu percepat polling."""
+        metadata['client_msg_id'] = uuid.uuid4().hex
+        self.message_manager.save_message(self.chat_id, metadata)
+        self.poll_scheduler.notify_activity()
+        return metadata['client_msg_id']
+
+    def show_undelivered_messages(self):
+        """Tampilkan pesan kiriman sendiri yang masih tertahan di outbox (mis. dari sesi sebelumnya)."""
+        try:
+            undelivered = self.message_manager.undelivered_messages(self.current_user, self.chat_id)
+        except Exception as e:
+            print(f"ChatPage: Gagal membaca outbox: {e}")
+            return 0
+        shown = 0
+        for payload, state, created_at in undelivered:
+            metadata = dict(payload); metadata['db_timestamp'] = created_at
+            if self.get_display_key(metadata) in self.displayed_items: continue
+            cached_data = self.get_cached(self.get_message_id(metadata))
+            self.add_message_to_display("sent", metadata, cached_data=cached_data, delivery=state)
+            shown += 1
+        return shown
+
+    def on_delivery_state_changed(self, client_msg_id, state):
+        row = self.outbox_rows.get(client_msg_id)
+        if row is not None:
+            self.chat_model.set_delivery_state(row, state)
 
     def refresh_chat_display(self):
-        """Membersihkan dan memuat ulang seluruh riwayat chat."""
-        scroll_bar = self.chat_display.verticalScrollBar()
-        old_value = scroll_bar.value()
-        is_at_bottom = old_value == scroll_bar.maximum()
+        """
+        [REVISI] Minta pesan baru sejak sync_cursor ke HistoryFetchWorker.
+        Tick dilewati jika fetch sebelumnya belum selesai.
+        """
+        if self.fetch_in_flight:
+            self.refetch_pending = True
+            return
+        self.fetch_in_flight = True
+        self.fetch_requested.emit(self.chat_id, self.sync_cursor, self.fetch_generation)
 
-        # [INSTRUKSI 1] Simpan jumlah item saat ini sebelum me-refresh
-        old_item_count = self.chat_display.count()
+    @Slot(int, list, bool)
+    def on_history_loaded(self, generation, messages, ok):
+        """[BARU] Hasil dari HistoryFetchWorker; respons basi dibuang."""
+        if generation != self.fetch_generation:
+            return
+        self.fetch_in_flight = False
 
-        self.load_and_display_chat_history()
-        
-        # [PERBAIKAN] Paksa update layout setelah memuat ulang
-        QApplication.processEvents()
+        if ok:
+            self.save_history_snapshot(messages)
+        new_count = self.load_and_display_chat_history(messages)
+        self.poll_scheduler.report(changed=new_count > 0, failed=not ok)
+        if not self.undelivered_shown:
+            # Setelah fetch pertama (berhasil atau tidak): pesan outbox tampil di bawah riwayat
+            self.undelivered_shown = True
+            new_count += self.show_undelivered_messages()
+        if self.refetch_pending:
+            # Event push datang saat fetch berjalan: ambil lagi agar tidak terlewat
+            self.refetch_pending = False
+            self.refresh_chat_display()
+        if new_count == 0:
+            # Tidak ada yang ditambahkan: posisi scroll dibiarkan apa adanya
+            return
 
-        new_item_count = self.chat_display.count()
+        # Ada pesan baru: selalu scroll ke bawah
+        self.chat_display.scrollToBottom()
 
-        # [INSTRUKSI 1] Logika scroll yang disempurnakan
-        if is_at_bottom or (new_item_count > old_item_count):
-            # Selalu scroll ke bawah jika sebelumnya sudah di bawah, 
-            # ATAU jika ada pesan baru
-            self.chat_display.scrollToBottom()
+    @Slot(str, dict)
+    def on_push_event(self, event_type, payload):
+        """[BARU] Pesan baru untuk chat ini -> delta sync sekarang juga."""
+        if not self.poll_scheduler.is_active():
+            return
+        if event_type == "message" and payload.get("chat_id") == self.chat_id:
+            self.refresh_chat_display()
+
+    @Slot(bool)
+    def on_push_state_changed(self, connected):
+        """[BARU] Saat push tersambung polling diperlambat; saat putus kembali cepat."""
+        if connected:
+            self.poll_scheduler.set_interval_range(*self.POLL_RANGE_PUSH)
         else:
-            # Jika tidak, kembalikan posisi scroll (misalnya saat dekripsi)
-            scroll_bar.setValue(old_value)
-
-    def show_loading_dialog(self, filename):
-        # [UI Loading TIDAK BERUBAH]
-        dialog = QDialog(self)
-        dialog.setModal(True)
-        dialog.setWindowTitle("Mengunduh...")
-        dialog.setStyleSheet(f"background-color: {self.COLOR_BACKGROUND}; color: {self.COLOR_TEXT}; font-size: 14px;")
-        layout = QVBoxLayout()
-        label = QLabel(f"Sedang mengunduh file:\n{filename}\n\nHarap tunggu...")
-        label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        layout.addWidget(label)
-        dialog.setLayout(layout)
-        dialog.setFixedSize(300, 150)
-        
-        dialog.show()
-        QApplication.processEvents() 
-        return dialog
+            self.poll_scheduler.set_interval_range(*self.POLL_RANGE)
+            if self.poll_scheduler.is_active():
+                # Kejar pesan yang mungkin terlewat selama push terputus
+                self.poll_scheduler.notify_activity()
+
+    def on_connection_state_changed(self, state):
+        """[BARU] Tampilkan mode offline; saat server pulih langsung kejar pesan baru."""
+        label = self.connection_bridge.LABELS.get(state, "")
+        self.connection_label.setText(label)
+        self.connection_label.setVisible(bool(label))
+        if state == CIRCUIT_CLOSED and self.poll_scheduler.is_active():
+            self.poll_scheduler.notify_activity()
+
+    # --- [BARU] Unggahan lampiran di latar belakang ---
+    def start_upload(self, prepare, upload_path, filename, content_type, on_done):
+        """
+        Mulai UploadWorker: prepare() menulis upload_path di thread latar, lalu
+        file diunggah per chunk. on_done(file_id) dipanggil di thread GUI;
+        upload_path dihapus setelahnya. False jika unggahan lain masih berjalan.
+        """
+        if self.upload_worker is not None:
+            QMessageBox.information(self, "Unggahan Berjalan", "Tunggu unggahan sebelumnya selesai atau batalkan dulu.")
+            return False
+        self.upload_request = (upload_path, on_done)
+        self.upload_thread = QThread() # Tanpa parent: dilepas lewat retire_thread
+        self.upload_worker = UploadWorker(self.uploader, prepare, upload_path, filename, content_type)
+        self.upload_worker.moveToThread(self.upload_thread)
+        self.upload_thread.started.connect(self.upload_worker.run)
+        self.upload_worker.progress.connect(self.on_upload_progress)
+        self.upload_worker.finished.connect(self.on_upload_finished)
+        self.upload_worker.failed.connect(self.on_upload_failed)
+        self.upload_worker.cancelled.connect(self.on_upload_cancelled)
+
+        self.upload_label.setText(f"Menyiapkan {filename}...")
+        self.upload_progress.setRange(0, 0) # Tak tentu selama enkripsi
+        self.upload_bar.show()
+        self.upload_thread.start()
+        return True
+
+    def cancel_upload(self):
+        if self.upload_worker is not None:
+            self.upload_worker.cancel()
+
+    def finish_upload(self):
+        """Sembunyikan bar progres dan lepaskan worker/thread unggahan."""
+        self.upload_bar.hide()
+        self.upload_request = None
+        if self.upload_thread is not None:
+            self.retire_thread(self.upload_thread, self.upload_worker)
+            self.upload_thread = None
+            self.upload_worker = None
+
+    def on_upload_progress(self, sent, total):
+        # QProgressBar memakai int 32-bit: tampilkan dalam KB
+        self.upload_progress.setRange(0, max(1, total // 1024))
+        self.upload_progress.setValue(sent // 1024)
+        self.upload_label.setText(f"Mengunggah... {sent // 1024} / {total // 1024} KB")
 
-    def on_chat_item_clicked(self, item):
+    def on_upload_finished(self, file_id):
+        upload_path, on_done = self.upload_request
+        self.finish_upload()
+        try:
+            on_done(file_id)
+        except Exception as e:
+            self.add_message_to_display("error", metadata=None, error_text=f"--- Error Upload: {e} ---")
+        finally:
+            if os.path.exists(upload_path): os.remove(upload_path)
+
+    def on_upload_failed(self, error_text):
+        self.finish_upload()
+        self.add_message_to_display("error", metadata=None, error_text=f"--- Gagal mengunggah: {error_text} ---")
+
+    def on_upload_cancelled(self):
+        self.finish_upload()
+        self.add_message_to_display("error", metadata=None, error_text="--- Unggahan dibatalkan. ---")
+
+    # --- [BARU] Unduhan lampiran di latar belakang ---
+    def start_download(self, metadata, dest_path, on_done):
+        """
+        Mulai DownloadWorker untuk lampiran 'metadata'. on_done(metadata, path)
+        dipanggil di thread GUI setelah file lengkap di disk.
+        """
+        if self.download_worker is not None:
+            if self.download_worker.file_id == metadata.get('file_id'):
+                return # Sudah sedang diunduh
+            QMessageBox.information(self, "Unduhan Berjalan", "Tunggu unduhan sebelumnya selesai atau batalkan dulu.")
+            return
+        filename = metadata.get('filename', metadata.get('file_id'))
+        self.download_request = (metadata, on_done)
+        self.download_thread = QThread() # Tanpa parent: dilepas lewat retire_thread
+        self.download_worker = DownloadWorker(self.api_url, self.chat_id, metadata.get('file_id'), dest_path)
+        self.download_worker.moveToThread(self.download_thread)
+        self.download_thread.started.connect(self.download_worker.run)
+        self.download_worker.progress.connect(self.on_download_progress)
+        self.download_worker.finished.connect(self.on_download_finished)
+        self.download_worker.failed.connect(self.on_download_failed)
+        self.download_worker.cancelled.connect(self.on_download_cancelled)
+
+        self.download_label.setText(f"Mengunduh {filename}...")
+        self.download_progress.setRange(0, 0) # Tak tentu sampai ukuran diketahui
+        self.download_bar.show()
+        self.download_thread.start()
+
+    def cancel_download(self):
+        if self.download_worker is not None:
+            self.download_worker.cancel()
+
+    def finish_download(self):
+        """Sembunyikan bar progres dan lepaskan worker/thread unduhan."""
+        self.download_bar.hide()
+        self.download_request = None
+        if self.download_thread is not None:
+            self.retire_thread(self.download_thread, self.download_worker)
+            self.download_thread = None
+            self.download_worker = None
+
+    def on_download_progress(self, received, total):
+        if total:
+            # QProgressBar memakai int 32-bit: tampilkan dalam KB
+            self.download_progress.setRange(0, max(1, total // 1024))
+            self.download_progress.setValue(received // 1024)
+            self.download_label.setText(f"Mengunduh... {received // 1024} / {total // 1024} KB")
+        else:
+            self.download_label.setText(f"Mengunduh... {received // 1024} KB")
+
+    def on_download_finished(self, path):
+        metadata, on_done = self.download_request
+        self.finish_download()
+        try:
+            on_done(metadata, path)
+        except Exception as e:
+            self.show_decrypt_error(metadata, e)
+
+    def on_download_failed(self, error_text):
+        self.finish_download()
+        self.add_message_to_display("error", metadata=None, error_text=f"--- Gagal mengunduh: {error_text} ---")
+
+    def on_download_cancelled(self):
+        self.finish_download()
+        self.add_message_to_display("error", metadata=None, error_text="--- Unduhan dibatalkan (bisa dilanjutkan nanti). ---")
+
+    def show_decrypt_error(self, metadata, e):
+        print(f"Error di on_chat_item_clicked: {e}")
+        debug_key = metadata.get('aes_key_debug') or metadata.get('text_key_debug', 'TIDAK DIKETAHUI')
+        QMessageBox.critical(self, "Error Dekripsi", f"Terjadi error: {e}\n\n(Debug: Kunci yg benar mungkin '{debug_key}')")
+
+    def on_chat_item_clicked(self, index):
         # [REVISI REQUEST #3]
-        metadata = item.data(Qt.UserRole)
+        metadata = index.data(Qt.UserRole)
         if not metadata: return
         
-        msg_box = QMessageBox(self)
         msg_type = metadata.get('type')
         file_id = metadata.get('file_id')
         
@@ -443,6 +1007,10 @@ class ChatPage(QWidget):
 
                         decrypted_text = vigenere_decrypt(vigenere_encrypted_text, key)
                     
+                    except VigenereUnavailableError as e_vigenere:
+                        # [REVISI] Jangan simpan hasil ke cache; coba lagi nanti
+                        QMessageBox.warning(self, "Vigenere Tidak Tersedia", str(e_vigenere))
+                        return
                     except Exception as e_aes:
                         print(f"Error AES: {e_aes}")
                         decrypted_text = f"[DEKRIPSI GAGAL: Data korup atau kunci sesi salah.]"
@@ -450,278 +1018,123 @@ class ChatPage(QWidget):
                     if message_id: 
                         self.save_to_cache(message_id, decrypted_text)
                     
-                    self.refresh_chat_display()
+                    self.rerender_message(metadata)
 
             elif msg_type == 'file' and file_id:
-                # [Logika File TIDAK BERUBAH]
+                # [REVISI] Unduhan berjalan di DownloadWorker; dekripsi dilanjutkan setelah selesai
                 local_encrypted_path = os.path.join(self.temp_download_dir, file_id)
-                filename = metadata.get('filename', 'file.enc')
-                
                 if not os.path.exists(local_encrypted_path):
-                    loading_dialog = self.show_loading_dialog(filename)
-                    download_url = f"{self.api_url}/download_file/{self.chat_id}/{file_id}"
-                    response = requests.get(download_url, timeout=60)
-                    loading_dialog.close() 
-                    if response.status_code != 200: raise Exception("Gagal mengunduh file dari server.")
-                    with open(local_encrypted_path, "wb") as f: f.write(response.content)
-                    self.add_message_to_display("error", metadata=None, error_text=f"--- Unduhan Selesai. Disimpan di cache. ---")
-                else:
-                    self.add_message_to_display("error", metadata=None, error_text=f"--- Membuka {filename} dari cache... ---")
-
-                key, ok = QInputDialog.getText(self, "Dekripsi File", "Masukkan Kunci untuk file ini:", QLineEdit.Password)
-                if not (ok and key): return
-                
-                with open(local_encrypted_path, "rb") as f: encrypted_bytes = f.read()
-                decrypted_bytes = None; method = metadata.get('encryption_method', 'aes')
-                
-                if method == 'aes':
-                    self.add_message_to_display("error", metadata=None, error_text=f"--- Mendekripsi (AES)... ---")
-                    temp_crypto = CryptoEngine(key); decrypted_bytes = temp_crypto.decrypt(encrypted_bytes)
-                elif method == 'whitemist':
-                    self.add_message_to_display("error", metadata=None, error_text=f"--- Mendekripsi (White-Mist)... ---")
-                    encrypted_string = encrypted_bytes.decode('utf-8'); 
-                    # [INSTRUKSI 1] Ini adalah file, JANGAN kirim 'is_text=True'. Default (False) akan digunakan (Base64).
-                    decrypted_bytes = decrypt_whitemist(encrypted_string, key)
-                else: raise ValueError(f"Metode enkripsi '{method}' tidak dikenal.")
-                
-                decrypted_path = os.path.join(self.temp_decrypted_dir, f"DECRYPTED_{filename}")
-                with open(decrypted_path, "wb") as f: f.write(decrypted_bytes)
-                
-                msg_box.setWindowTitle("File Didekripsi"); msg_box.setText(f"File '{filename}' ({method}) berhasil didekripsi!")
-                msg_box.setInformativeText(f"Disimpan di: {decrypted_path}"); msg_box.exec()
+                    self.start_download(metadata, local_encrypted_path, self.on_file_downloaded)
+                    return
+                filename = metadata.get('filename', 'file.enc')
+                self.add_message_to_display("error", metadata=None, error_text=f"--- Membuka {filename} dari cache... ---")
+                self.open_file_message(metadata, local_encrypted_path)
 
             elif msg_type == 'stegano' and file_id:
-                # [Logika Stegano TIDAK BERUBAH]
-                filename = metadata.get('filename', f"{file_id}.png")
                 local_stegano_path = os.path.join(self.temp_stegano_dir, file_id) 
-                
                 if not os.path.exists(local_stegano_path):
-                    loading_dialog = self.show_loading_dialog(filename)
-                    download_url = f"{self.api_url}/download_file/{self.chat_id}/{file_id}"
-                    response = requests.get(download_url, timeout=60)
-                    loading_dialog.close() 
-                    if response.status_code != 200: raise Exception("Gagal mengunduh gambar dari server.")
-                    with open(local_stegano_path, "wb") as f: f.write(response.content)
-                    self.add_message_to_display("error", metadata=None, error_text=f"--- Gambar diterima. Disimpan di cache. ---")
-                else:
-                    self.add_message_to_display("error", metadata=None, error_text=f"--- Membuka gambar {filename} dari cache... ---")
-
-                msg_box.setWindowTitle("Pesan Gambar Diterima")
-                pixmap = QPixmap(local_stegano_path).scaled(400, 400, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                msg_box.setIconPixmap(pixmap)
-                msg_box.setText("Gambar diterima. Ingin mendekripsi teks tersembunyi di dalamnya?")
-                decrypt_button = msg_box.addButton("Dekripsi Teks Tersembunyi", QMessageBox.AcceptRole)
-                msg_box.addButton(QMessageBox.Close); msg_box.exec()
-                
-                if msg_box.clickedButton() == decrypt_button:
-                    key, ok = QInputDialog.getText(self, "Dekripsi Steganografi", "Masukkan Kunci VIGENERE untuk teks tersembunyi:")
-                    if ok and key:
-                        revealed_encrypted_text = lsb.reveal(local_stegano_path) 
-                        if not revealed_encrypted_text:
-                            QMessageBox.warning(self, "Gagal", "Tidak ada pesan tersembunyi yang ditemukan di gambar ini.")
-                            return
-                        
-                        decrypted_message = vigenere_decrypt(revealed_encrypted_text, key)
-                        
-                        message_id = self.get_message_id(metadata)
-                        if message_id:
-                            cache_data = {"text": decrypted_message, "image_path": local_stegano_path}
-                            self.save_to_cache(message_id, cache_data)
-                        
-                        QMessageBox.information(self, "Teks Terungkap", f"Pesan tersembunyi adalah:\n\n{decrypted_message}")
-                        
-                        self.refresh_chat_display()
+                    self.start_download(metadata, local_stegano_path, self.on_stegano_downloaded)
+                    return
+                filename = metadata.get('filename', f"{file_id}.png")
+                self.add_message_to_display("error", metadata=None, error_text=f"--- Membuka gambar {filename} dari cache... ---")
+                self.open_stegano_message(metadata, local_stegano_path)
 
         except Exception as e:
-            print(f"Error di on_chat_item_clicked: {e}")
-            debug_key = metadata.get('aes_key_debug') or metadata.get('text_key_debug', 'TIDAK DIKETAHUI')
-            QMessageBox.critical(self, "Error Dekripsi", f"Terjadi error: {e}\n\n(Debug: Kunci yg benar mungkin '{debug_key}')")
+            self.show_decrypt_error(metadata, e)
 
-    def create_chat_bubble(self, align, metadata, cached_data=None, item=None):
-        """Membuat widget bubble chat kustom dengan ukuran minimal dan maksimal yang disesuaikan."""
-        
-        bubble_container = QWidget()
-        container_layout = QHBoxLayout(bubble_container)
-        container_layout.setContentsMargins(5, 5, 5, 5)
-        container_layout.setSpacing(0)
-
-        bubble_frame = QFrame()
-        bubble_frame.setFrameShape(QFrame.Shape.StyledPanel)
-        bubble_frame.setFrameShadow(QFrame.Shadow.Plain)
-        bubble_frame.setLineWidth(0)
-        
-        # Set kebijakan ukuran minimum dan maksimal yang konsisten
-        bubble_frame.setSizePolicy(QSizePolicy.Policy.Minimum, QSizePolicy.Policy.Minimum)
-        
-        # Set lebar minimal dan maksimal relatif terhadap lebar window
-        bubble_frame.setMinimumWidth(self.width() * 0.3)  # Minimal 30% lebar window
-        bubble_frame.setMaximumWidth(self.width() * 0.7)  # Maksimal 70% lebar window
+    def on_file_downloaded(self, metadata, local_encrypted_path):
+        self.add_message_to_display("error", metadata=None, error_text=f"--- Unduhan Selesai. Disimpan di cache. ---")
+        self.open_file_message(metadata, local_encrypted_path)
 
-        bubble_content_layout = QVBoxLayout(bubble_frame)
-        bubble_content_layout.setContentsMargins(12, 10, 12, 8)  # Padding internal yang lebih besar
-        bubble_content_layout.setSpacing(8)  # Jarak antar elemen yang lebih besar
-        
-        msg_type = metadata.get('type', 'unknown')
-        
-        # [INSTRUKSI 2] Hitung lebar maks konten (70% lebar window - padding L/R)
-        # Padding adalah 12px kiri + 12px kanan = 24px
-        content_max_width = (self.width() * 0.7) - 24
-        
-        # [INSTRUKSI 3] Tambahkan label "YOU" untuk pengirim
-        if align == "sent":
-            name_label = QLabel("YOU")
-            name_label.setFont(QFont("Segoe UI", 10, QFont.Bold))
-            name_label.setStyleSheet(f"color: {self.COLOR_GOLD};")
-            bubble_content_layout.addWidget(name_label)
-        elif align == "received":
-            prefix = metadata.get('sender', 'Unknown')
-            name_label = QLabel(prefix)
-            name_label.setFont(QFont("Segoe UI", 10, QFont.Bold))
-            name_label.setStyleSheet(f"color: {self.COLOR_GOLD};")
-            bubble_content_layout.addWidget(name_label)
-        
-        if msg_type == 'text':
-            display_text = cached_data if cached_data else "[Pesan Teks Super-Terenkripsi]"
-            content_label = QLabel(display_text)
-            content_label.setWordWrap(True)
-            content_label.setMaximumWidth(content_max_width) # [INSTRUKSI 2] Terapkan lebar maks
-            content_label.setStyleSheet(f"color: {self.COLOR_TEXT}; font-size: 14px;")
-            content_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
-            content_label.setMinimumHeight(30)  # Tinggi minimal untuk text
-            bubble_content_layout.addWidget(content_label)
-
-        elif msg_type == 'stegano':
-            filename = metadata.get('filename', 'unknown.png')
-            if cached_data and isinstance(cached_data, dict):
-                secret_text = cached_data.get('text', '[ERROR CACHE]')
-                image_path = cached_data.get('image_path')
-                
-                if image_path and os.path.exists(image_path):
-                    pixmap = QPixmap(image_path).scaled(250, 250, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    img_label = QLabel()
-                    img_label.setPixmap(pixmap)
-                    img_label.setMinimumSize(200, 150)  # Ukuran minimal untuk gambar
-                    bubble_content_layout.addWidget(img_label)
-                else:
-                    stegano_label = QLabel(f"🖼️ Stegano: {filename}")
-                    stegano_label.setMaximumWidth(content_max_width) # [INSTRUKSI 2]
-                    stegano_label.setWordWrap(True)
-                    bubble_content_layout.addWidget(stegano_label)
-                
-                text_label = QLabel(f"Pesan: {secret_text}")
-                text_label.setWordWrap(True)
-                text_label.setMaximumWidth(content_max_width) # [INSTRUKSI 2] Terapkan lebar maks
-                text_label.setStyleSheet(f"color: {self.COLOR_TEXT}; font-size: 14px; font-style: italic;")
-                text_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
-                text_label.setMinimumHeight(30)  # Tinggi minimal untuk text
-                bubble_content_layout.addWidget(text_label)
-            else:
-                content_label = QLabel(f"梼 Stegano Image: {filename}")
-                content_label.setWordWrap(True)
-                content_label.setMaximumWidth(content_max_width) # [INSTRUKSI 2] Terapkan lebar maks
-                content_label.setStyleSheet(f"color: {self.COLOR_TEXT_SUBTLE}; font-size: 14px; font-style: italic;")
-                content_label.setMinimumHeight(30)  # Tinggi minimal
-                bubble_content_layout.addWidget(content_label)
-
-        elif msg_type == 'file':
-            filename = metadata.get('filename', 'unknown_file')
-            method = metadata.get('encryption_method', 'aes').upper()
-            content_label = QLabel(f"📂 File ({method}): {filename}")
-            content_label.setWordWrap(True)
-            content_label.setMaximumWidth(content_max_width) # [INSTRUKSI 2] Terapkan lebar maks
-            content_label.setStyleSheet(f"color: {self.COLOR_TEXT_SUBTLE}; font-size: 14px; font-style: italic;")
-            content_label.setMinimumHeight(30)  # Tinggi minimal
-            bubble_content_layout.addWidget(content_label)
-        else:
-            content_label = QLabel("[Pesan tidak dikenal]")
-            content_label.setMaximumWidth(content_max_width) # [INSTRUKSI 2] Terapkan lebar maks
-            content_label.setStyleSheet(f"color: {self.COLOR_RED}; font-size: 14px;")
-            content_label.setMinimumHeight(30)  # Tinggi minimal
-            bubble_content_layout.addWidget(content_label)
+    def on_stegano_downloaded(self, metadata, local_stegano_path):
+        self.add_message_to_display("error", metadata=None, error_text=f"--- Gambar diterima. Disimpan di cache. ---")
+        self.open_stegano_message(metadata, local_stegano_path)
+
+    def open_file_message(self, metadata, local_encrypted_path):
+        """Minta kunci lalu dekripsi file lampiran yang sudah ada di disk."""
+        # [Logika File TIDAK BERUBAH]
+        msg_box = QMessageBox(self)
+        filename = metadata.get('filename', 'file.enc')
+        key, ok = QInputDialog.getText(self, "Dekripsi File", "Masukkan Kunci untuk file ini:", QLineEdit.Password)
+        if not (ok and key): return
         
-        bottom_layout = QHBoxLayout()
-        bottom_layout.setContentsMargins(0, 5, 0, 0)  # Margin atas untuk pemisah
+        decrypted_bytes = None; method = metadata.get('encryption_method', 'aes')
+        decrypted_path = os.path.join(self.temp_decrypted_dir, f"DECRYPTED_{filename}")
+        with open(local_encrypted_path, "rb") as f: is_stream = CryptoEngine.is_stream_payload(f.read(8))
         
-        timestamp_str = "..."
-        timestamp_iso = metadata.get('db_timestamp')
-        if timestamp_iso:
+        if method == 'aes' and is_stream:
+            # [BARU] Stream v3: dekripsi per chunk ke .part, ganti nama hanya jika semua chunk valid
+            self.add_message_to_display("error", metadata=None, error_text=f"--- Mendekripsi (AES)... ---")
+            partial_path = f"{decrypted_path}.part"
             try:
-                dt_obj = datetime.fromisoformat(timestamp_iso)
-                if dt_obj.tzinfo is None:
-                    dt_obj = dt_obj.replace(tzinfo=timezone.utc)
-                dt_local = dt_obj.astimezone()
-                timestamp_str = dt_local.strftime("%H:%M") 
-            except ValueError:
-                timestamp_str = "err"
-        
-        time_label = QLabel(timestamp_str)
-        time_label.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignBottom)
-        time_label.setStyleSheet(f"color: {self.COLOR_TEXT_SUBTLE}; font-size: 10px; padding-top: 5px;")
-        
-        refresh_btn = QPushButton("🔄") 
-        refresh_btn.setFixedSize(25, 25)
-        refresh_btn.setToolTip("Dekripsi ulang pesan ini")
-        refresh_btn.setStyleSheet(f"""
-            QPushButton {{ background-color: transparent; border: none; color: {self.COLOR_TEXT_SUBTLE}; font-size: 14px; }}
-            QPushButton:hover {{ color: {self.COLOR_GOLD_HOVER}; }}
-        """)
-        
-        if item:
-            refresh_btn.clicked.connect(lambda: self.on_chat_item_clicked(item))
-            
-        bottom_layout.addWidget(time_label)
-        bottom_layout.addStretch()
-        bottom_layout.addWidget(refresh_btn)
-        
-        bubble_content_layout.addLayout(bottom_layout)
-        
-        if align == "sent":
-            bubble_frame.setStyleSheet(f"QFrame {{ background-color: {self.COLOR_BUBBLE_SENT}; border-radius: 12px; border-bottom-right-radius: 0px; }}")
-            container_layout.addStretch()
-            container_layout.addWidget(bubble_frame)
-        else: # received
-            bubble_frame.setStyleSheet(f"QFrame {{ background-color: {self.COLOR_BUBBLE_RECV}; border-radius: 12px; border-bottom-left-radius: 0px; }}")
-            container_layout.addWidget(bubble_frame)
-            container_layout.addStretch()
-
-        return bubble_container
-
-    # --- [PERBAIKAN BUG #1] ---
-    def add_message_to_display(self, align, metadata, cached_data=None, error_text=None, is_loading_history=False):
-        """Memperbaiki bug bubble hilang saat load."""
+                with open(local_encrypted_path, "rb") as src, open(partial_path, "wb") as dst:
+                    CryptoEngine(key).decrypt_stream(src, dst)
+                os.replace(partial_path, decrypted_path)
+            finally:
+                if os.path.exists(partial_path): os.remove(partial_path)
+        elif method == 'aes':
+            # File lama (base64 v1/v2) tetap didukung
+            with open(local_encrypted_path, "rb") as f: encrypted_bytes = f.read()
+            self.add_message_to_display("error", metadata=None, error_text=f"--- Mendekripsi (AES)... ---")
+            temp_crypto = CryptoEngine(key); decrypted_bytes = temp_crypto.decrypt(encrypted_bytes)
+        elif method == 'whitemist':
+            with open(local_encrypted_path, "rb") as f: encrypted_bytes = f.read()
+            self.add_message_to_display("error", metadata=None, error_text=f"--- Mendekripsi (White-Mist)... ---")
+            encrypted_string = encrypted_bytes.decode('utf-8'); 
+            # [INSTRUKSI 1] Ini adalah file, JANGAN kirim 'is_text=True'. Default (False) akan digunakan (Base64).
+            decrypted_bytes = decrypt_whitemist(encrypted_string, key)
+        else: raise ValueError(f"Metode enkripsi '{method}' tidak dikenal.")
         
-        item = QListWidgetItem() 
-        item.setData(Qt.UserRole, metadata)
+        if decrypted_bytes is not None:
+            with open(decrypted_path, "wb") as f: f.write(decrypted_bytes)
         
-        if error_text:
-            item.setText(error_text)
-            item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
-            item.setForeground(QColor(self.COLOR_RED))
-            item.setSizeHint(QSize(0, 30))
-            self.chat_display.addItem(item) # Add error item
-        else:
-            # 1. Buat widget DULU, dan berikan item
-            bubble_widget = self.create_chat_bubble(align, metadata, cached_data, item)
-            
-            # 2. Paksa widget menghitung ukuran minimumnya.
-            # Ini adalah perbaikan utamanya:
-            bubble_widget.layout().activate() 
-            bubble_widget.adjustSize()
-            
-            # 3. Dapatkan sizeHint()
-            size = bubble_widget.sizeHint() 
-            item.setSizeHint(size) 
+        msg_box.setWindowTitle("File Didekripsi"); msg_box.setText(f"File '{filename}' ({method}) berhasil didekripsi!")
+        msg_box.setInformativeText(f"Disimpan di: {decrypted_path}"); msg_box.exec()
 
-            # 4. BARU tambahkan item ke list
-            self.chat_display.addItem(item)
-            
-            # 5. Set widget
-            self.chat_display.setItemWidget(item, bubble_widget)
+    def open_stegano_message(self, metadata, local_stegano_path):
+        """Tampilkan gambar stegano yang sudah ada di disk dan tawarkan dekripsi teksnya."""
+        # [Logika Stegano TIDAK BERUBAH]
+        msg_box = QMessageBox(self)
+        msg_box.setWindowTitle("Pesan Gambar Diterima")
+        pixmap = QPixmap(local_stegano_path).scaled(400, 400, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        msg_box.setIconPixmap(pixmap)
+        msg_box.setText("Gambar diterima. Ingin mendekripsi teks tersembunyi di dalamnya?")
+        decrypt_button = msg_box.addButton("Dekripsi Teks Tersembunyi", QMessageBox.AcceptRole)
+        msg_box.addButton(QMessageBox.Close); msg_box.exec()
         
-        # [PERBAIKAN] Hanya scroll ke bawah jika ini BUKAN bagian dari
-        # pemuatan riwayat, atau jika ini item terakhir dari riwayat.
+        if msg_box.clickedButton() == decrypt_button:
+            key, ok = QInputDialog.getText(self, "Dekripsi Steganografi", "Masukkan Kunci VIGENERE untuk teks tersembunyi:")
+            if ok and key:
+                revealed_encrypted_text = lsb.reveal(local_stegano_path) 
+                if not revealed_encrypted_text:
+                    QMessageBox.warning(self, "Gagal", "Tidak ada pesan tersembunyi yang ditemukan di gambar ini.")
+                    return
+                
+                try:
+                    decrypted_message = vigenere_decrypt(revealed_encrypted_text, key)
+                except VigenereUnavailableError as e:
+                    QMessageBox.warning(self, "Vigenere Tidak Tersedia", str(e))
+                    return
+                
+                message_id = self.get_message_id(metadata)
+                if message_id:
+                    cache_data = {"text": decrypted_message, "image_path": local_stegano_path}
+                    self.save_to_cache(message_id, cache_data)
+                
+                QMessageBox.information(self, "Teks Terungkap", f"Pesan tersembunyi adalah:\n\n{decrypted_message}")
+                
+                self.rerender_message(metadata)
 
-    # --- [AKHIR PERBAIKAN BUG #1] ---
+    def add_message_to_display(self, align, metadata, cached_data=None, error_text=None, is_loading_history=False, delivery=None):
+        """[REVISI] Tambah satu baris ke chat_model; delegate yang melukis bubble-nya."""
+        if error_text:
+            self.chat_model.append_message("error", metadata, error_text=error_text)
+            return
+        row = self.chat_model.append_message(align, metadata, cached_data, delivery=delivery)
+        # [BARU] Catat untuk de-duplikasi delta sync
+        self.displayed_items[self.get_display_key(metadata)] = row
+        if delivery and metadata.get('client_msg_id'):
+            self.outbox_rows[metadata['client_msg_id']] = row
 
     # --- (Helper Styling TIDAK BERUBAH) ---
     def input_style(self):
@@ -0,0 +1,411 @@
+import os
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from PySide6.QtWidgets import QStyledItemDelegate, QToolTip
+from PySide6.QtGui import QFont, QColor, QPixmap, QPainter, QFontMetrics
+from PySide6.QtCore import Qt, QSize, QRect, QEvent, QAbstractListModel, QModelIndex, Signal
+
+# [BARU] Model + delegate untuk tampilan chat tervirtualisasi.
+# Menggantikan satu pohon QWidget/QFrame/layout per pesan (setItemWidget):
+# bubble hanya dilukis untuk baris yang terlihat di viewport.
+
+ALIGN_ROLE = Qt.UserRole + 1
+CACHED_DATA_ROLE = Qt.UserRole + 2
+ERROR_TEXT_ROLE = Qt.UserRole + 3
+VERSION_ROLE = Qt.UserRole + 4
+DELIVERY_ROLE = Qt.UserRole + 5 # [BARU] State outbox pesan kiriman sendiri (None = dari server)
+
+# [BARU] Penanda state kirim di footer bubble: (teks, kunci warna)
+DELIVERY_LABELS = {
+    'pending': ("⏳", 'text_subtle'),
+    'retrying': ("⏳ mencoba ulang", 'text_subtle'),
+    'sent': ("✓", 'gold'),
+    'failed': ("⚠ gagal terkirim", 'red'),
+}
+
+
+class ChatMessageModel(QAbstractListModel):
+    """
+    Menyimpan baris chat sebagai dict ringan:
+    {'align', 'metadata', 'cached_data', 'error_text', 'delivery', 'version'}.
+    Qt.UserRole mengembalikan metadata (sama seperti QListWidgetItem dulu).
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not (0 <= index.row() < len(self._rows)):
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.UserRole:
+            return row['metadata']
+        if role == ALIGN_ROLE:
+            return row['align']
+        if role == CACHED_DATA_ROLE:
+            return row['cached_data']
+        if role == ERROR_TEXT_ROLE:
+            return row['error_text']
+        if role == VERSION_ROLE:
+            return row['version']
+        if role == DELIVERY_ROLE:
+            return row['delivery']
+        if role == Qt.DisplayRole:
+            # Dipakai untuk aksesibilitas / pencarian keyboard saja
+            if row['error_text']:
+                return row['error_text']
+            return (row['metadata'] or {}).get('type', '')
+        return None
+
+    def append_message(self, align, metadata, cached_data=None, error_text=None, delivery=None):
+        """Tambah satu baris di akhir list. Mengembalikan nomor barisnya."""
+        row_number = len(self._rows)
+        self.beginInsertRows(QModelIndex(), row_number, row_number)
+        self._rows.append({
+            'align': align,
+            'metadata': metadata,
+            'cached_data': cached_data,
+            'error_text': error_text,
+            'delivery': delivery,
+            'version': 0,
+        })
+        self.endInsertRows()
+        return row_number
+
+    def set_metadata(self, row_number, metadata):
+        """Ganti metadata baris (mis. salinan server dari pesan kiriman sendiri)."""
+        self._update_row(row_number, metadata=metadata)
+
+    def set_cached_data(self, row_number, cached_data):
+        """Ganti hasil dekripsi yang ditampilkan baris ini."""
+        self._update_row(row_number, cached_data=cached_data)
+
+    def set_delivery_state(self, row_number, state):
+        """Ganti state outbox yang ditampilkan di footer bubble."""
+        self._update_row(row_number, delivery=state)
+
+    def _update_row(self, row_number, **changes):
+        if not (0 <= row_number < len(self._rows)):
+            return
+        row = self._rows[row_number]
+        row.update(changes)
+        row['version'] += 1
+        index = self.index(row_number)
+        self.dataChanged.emit(index, index)
+
+
+class ChatBubbleDelegate(QStyledItemDelegate):
+    """
+    Melukis bubble chat (nama pengirim, teks, thumbnail stegano, timestamp,
+    tombol 🔄) langsung dengan QPainter. Layout dan tinggi baris dihitung dari
+    font metrics dan di-cache per (baris, versi, lebar viewport).
+    """
+    message_clicked = Signal(QModelIndex)
+
+    # Ukuran disamakan dengan versi widget lama
+    OUTER_MARGIN = 5
+    PAD_H = 12
+    PAD_TOP = 10
+    PAD_BOTTOM = 8
+    SPACING = 8
+    CONTENT_MIN_HEIGHT = 30
+    FOOTER_TOP = 5
+    REFRESH_SIZE = 25
+    THUMB_MAX = 250
+    THUMB_MIN_W, THUMB_MIN_H = 200, 150
+    ERROR_ROW_HEIGHT = 30
+    RADIUS = 12
+    PIXMAP_CACHE_SIZE = 64
+    LAYOUT_CACHE_SIZE = 512 # [REVISI] Cukup untuk baris yang terlihat + hover
+    SIZE_CACHE_SIZE = 20000 # [REVISI] Tinggi baris (ringan), LRU seperti layout
+
+    def __init__(self, colors, parent=None):
+        super().__init__(parent)
+        self.colors = colors
+        self._name_font = QFont("Segoe UI", 10, QFont.Bold)
+        self._content_font = QFont("Segoe UI")
+        self._content_font.setPixelSize(14)
+        self._italic_font = QFont(self._content_font)
+        self._italic_font.setItalic(True)
+        self._time_font = QFont("Segoe UI")
+        self._time_font.setPixelSize(10)
+        self._refresh_font = QFont("Segoe UI")
+        self._refresh_font.setPixelSize(14)
+        self._size_cache = OrderedDict()
+        self._layout_cache = OrderedDict()
+        self._pixmap_cache = OrderedDict()
+        self._hover_row = -1
+
+    # --- Helper data bubble ---
+    def _viewport_width(self, option):
+        view = self.parent()
+        if view is not None and hasattr(view, 'viewport'):
+            return view.viewport().width()
+        return option.rect.width()
+
+    def _thumbnail(self, image_path):
+        """Thumbnail stegano maks 250x250, disimpan di LRU kecil."""
+        pixmap = self._pixmap_cache.get(image_path)
+        if pixmap is not None:
+            self._pixmap_cache.move_to_end(image_path)
+            return pixmap
+        pixmap = QPixmap(image_path)
+        if not pixmap.isNull():
+            pixmap = pixmap.scaled(self.THUMB_MAX, self.THUMB_MAX, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        self._pixmap_cache[image_path] = pixmap
+        if len(self._pixmap_cache) > self.PIXMAP_CACHE_SIZE:
+            self._pixmap_cache.popitem(last=False)
+        return pixmap
+
+    def _content_parts(self, metadata, cached_data):
+        """
+        Mengembalikan list bagian isi bubble: ('text', str, font, warna) atau
+        ('image', path). Logikanya sama dengan create_chat_bubble versi lama.
+        """
+        msg_type = metadata.get('type', 'unknown')
+        if msg_type == 'text':
+            display_text = cached_data if cached_data else "[Pesan Teks Super-Terenkripsi]"
+            return [('text', display_text, self._content_font, self.colors['text'])]
+        if msg_type == 'stegano':
+            filename = metadata.get('filename', 'unknown.png')
+            if cached_data and isinstance(cached_data, dict):
+                secret_text = cached_data.get('text', '[ERROR CACHE]')
+                image_path = cached_data.get('image_path')
+                parts = []
+                if image_path and os.path.exists(image_path):
+                    parts.append(('image', image_path))
+                else:
+                    parts.append(('text', f"🖼️ Stegano: {filename}", self._content_font, self.colors['text']))
+                parts.append(('text', f"Pesan: {secret_text}", self._italic_font, self.colors['text']))
+                return parts
+            return [('text', f"梼 Stegano Image: {filename}", self._italic_font, self.colors['text_subtle'])]
+        if msg_type == 'file':
+            filename = metadata.get('filename', 'unknown_file')
+            method = metadata.get('encryption_method', 'aes').upper()
+            return [('text', f"📂 File ({method}): {filename}", self._italic_font, self.colors['text_subtle'])]
+        return [('text', "[Pesan tidak dikenal]", self._content_font, self.colors['red'])]
+
+    @staticmethod
+    def _format_timestamp(metadata):
+        timestamp_iso = metadata.get('db_timestamp')
+        if not timestamp_iso:
+            return "..."
+        try:
+            dt_obj = datetime.fromisoformat(timestamp_iso)
+            if dt_obj.tzinfo is None:
+                dt_obj = dt_obj.replace(tzinfo=timezone.utc)
+            return dt_obj.astimezone().strftime("%H:%M")
+        except ValueError:
+            return "err"
+
+    def _layout(self, index, viewport_width):
+        """
+        Hitung geometri bubble relatif terhadap (0, 0) baris.
+        Mengembalikan dict berisi ukuran baris, rect bubble, bagian isi, dll.
+        """
+        metadata = index.data(Qt.UserRole) or {}
+        align = index.data(ALIGN_ROLE)
+        parts = self._content_parts(metadata, index.data(CACHED_DATA_ROLE))
+
+        min_width = int(viewport_width * 0.3)
+        max_width = max(min_width, int(viewport_width * 0.7))
+        content_max_width = max(1, max_width - 2 * self.PAD_H)
+
+        name_text = None
+        if align == "sent":
+            name_text = "YOU"
+        elif align == "received":
+            name_text = metadata.get('sender', 'Unknown')
+
+        # Lebar alami isi (dibatasi lebar maks) menentukan lebar bubble
+        natural_width = 0
+        measured = []
+        for part in parts:
+            if part[0] == 'image':
+                pixmap = self._thumbnail(part[1])
+                size = QSize(max(pixmap.width(), self.THUMB_MIN_W), max(pixmap.height(), self.THUMB_MIN_H))
+                measured.append((part, size))
+                natural_width = max(natural_width, size.width())
+            else:
+                metrics = QFontMetrics(part[2])
+                rect = metrics.boundingRect(QRect(0, 0, content_max_width, 100000), Qt.TextWordWrap, part[1])
+                size = QSize(rect.width(), max(rect.height(), self.CONTENT_MIN_HEIGHT))
+                measured.append((part, size))
+                natural_width = max(natural_width, rect.width())
+        if name_text:
+            natural_width = max(natural_width, QFontMetrics(self._name_font).horizontalAdvance(name_text))
+
+        bubble_width = min(max(natural_width + 2 * self.PAD_H, min_width), max_width)
+        inner_width = bubble_width - 2 * self.PAD_H
+
+        y = self.PAD_TOP
+        name_rect = None
+        if name_text:
+            name_height = QFontMetrics(self._name_font).height()
+            name_rect = QRect(self.PAD_H, y, inner_width, name_height)
+            y += name_height + self.SPACING
+
+        content = []
+        for part, size in measured:
+            height = size.height()
+            if part[0] == 'text':
+                # Tinggi ulang berdasarkan lebar akhir bubble
+                metrics = QFontMetrics(part[2])
+                rect = metrics.boundingRect(QRect(0, 0, inner_width, 100000), Qt.TextWordWrap, part[1])
+                height = max(rect.height(), self.CONTENT_MIN_HEIGHT)
+            content.append((part, QRect(self.PAD_H, y, inner_width if part[0] == 'text' else size.width(), height)))
+            y += height + self.SPACING
+
+        footer_y = y + self.FOOTER_TOP
+        time_rect = QRect(self.PAD_H, footer_y, inner_width - self.REFRESH_SIZE, self.REFRESH_SIZE)
+        refresh_rect = QRect(bubble_width - self.PAD_H - self.REFRESH_SIZE, footer_y, self.REFRESH_SIZE, self.REFRESH_SIZE)
+        bubble_height = footer_y + self.REFRESH_SIZE + self.PAD_BOTTOM
+
+        if align == "sent":
+            bubble_x = viewport_width - self.OUTER_MARGIN - bubble_width
+        else:
+            bubble_x = self.OUTER_MARGIN
+        bubble_rect = QRect(bubble_x, self.OUTER_MARGIN, bubble_width, bubble_height)
+
+        return {
+            'row_height': bubble_height + 2 * self.OUTER_MARGIN,
+            'bubble': bubble_rect,
+            'name': (name_text, name_rect),
+            'content': content,
+            'time': (self._format_timestamp(metadata), time_rect),
+            'delivery': DELIVERY_LABELS.get(index.data(DELIVERY_ROLE)) if align == "sent" else None,
+            'refresh': refresh_rect,
+            'align': align,
+        }
+
+    def _layout_key(self, index, viewport_width):
+        return (index.row(), index.data(VERSION_ROLE), viewport_width)
+
+    def _cached_layout(self, index, viewport_width):
+        """[REVISI] _layout() dengan cache LRU, dipakai bersama paint/sizeHint/event."""
+        key = self._layout_key(index, viewport_width)
+        layout = self._layout_cache.get(key)
+        if layout is not None:
+            self._layout_cache.move_to_end(key)
+            return layout
+        layout = self._layout(index, viewport_width)
+        self._layout_cache[key] = layout
+        if len(self._layout_cache) > self.LAYOUT_CACHE_SIZE:
+            self._layout_cache.popitem(last=False)
+        return layout
+
+    def _refresh_rect_at(self, option, index):
+        layout = self._cached_layout(index, self._viewport_width(option))
+        bubble = layout['bubble'].translated(option.rect.topLeft())
+        return bubble, layout['refresh'].translated(bubble.topLeft())
+
+    # --- QStyledItemDelegate ---
+    def sizeHint(self, option, index):
+        error_text = index.data(ERROR_TEXT_ROLE)
+        if error_text:
+            return QSize(0, self.ERROR_ROW_HEIGHT)
+        width = self._viewport_width(option)
+        key = self._layout_key(index, width)
+        height = self._size_cache.get(key)
+        if height is not None:
+            self._size_cache.move_to_end(key)
+            return QSize(0, height)
+        height = self._cached_layout(index, width)['row_height']
+        self._size_cache[key] = height
+        if len(self._size_cache) > self.SIZE_CACHE_SIZE:
+            self._size_cache.popitem(last=False) # Buang satu entri tertua, bukan seluruh cache
+        return QSize(0, height)
+
+    def paint(self, painter, option, index):
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setClipRect(option.rect)
+
+        error_text = index.data(ERROR_TEXT_ROLE)
+        if error_text:
+            painter.setFont(self._content_font)
+            painter.setPen(QColor(self.colors['red']))
+            painter.drawText(option.rect, Qt.AlignCenter, error_text)
+            painter.restore()
+            return
+
+        layout = self._cached_layout(index, self._viewport_width(option))
+        bubble = layout['bubble'].translated(option.rect.topLeft())
+        is_sent = layout['align'] == "sent"
+
+        # Latar bubble: sudut bawah sisi pengirim dibuat tajam
+        bubble_color = QColor(self.colors['bubble_sent'] if is_sent else self.colors['bubble_recv'])
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(bubble_color)
+        painter.drawRoundedRect(bubble, self.RADIUS, self.RADIUS)
+        corner_x = bubble.right() - self.RADIUS + 1 if is_sent else bubble.left()
+        painter.fillRect(QRect(corner_x, bubble.bottom() - self.RADIUS + 1, self.RADIUS, self.RADIUS), bubble_color)
+
+        name_text, name_rect = layout['name']
+        if name_text:
+            painter.setFont(self._name_font)
+            painter.setPen(QColor(self.colors['gold']))
+            painter.drawText(name_rect.translated(bubble.topLeft()), Qt.AlignLeft | Qt.AlignVCenter, name_text)
+
+        for part, rect in layout['content']:
+            rect = rect.translated(bubble.topLeft())
+            if part[0] == 'image':
+                pixmap = self._thumbnail(part[1])
+                painter.drawPixmap(rect.topLeft(), pixmap)
+            else:
+                painter.setFont(part[2])
+                painter.setPen(QColor(part[3]))
+                painter.drawText(rect, Qt.AlignLeft | Qt.AlignVCenter | Qt.TextWordWrap, part[1])
+
+        time_text, time_rect = layout['time']
+        time_rect = time_rect.translated(bubble.topLeft())
+        painter.setFont(self._time_font)
+        painter.setPen(QColor(self.colors['text_subtle']))
+        painter.drawText(time_rect, Qt.AlignLeft | Qt.AlignBottom, time_text)
+        if layout['delivery']:
+            delivery_text, color_key = layout['delivery']
+            offset = QFontMetrics(self._time_font).horizontalAdvance(time_text + "  ")
+            painter.setPen(QColor(self.colors[color_key]))
+            painter.drawText(time_rect.adjusted(offset, 0, 0, 0), Qt.AlignLeft | Qt.AlignBottom, delivery_text)
+
+        refresh_hovered = index.row() == self._hover_row
+        painter.setFont(self._refresh_font)
+        painter.setPen(QColor(self.colors['gold_hover'] if refresh_hovered else self.colors['text_subtle']))
+        painter.drawText(layout['refresh'].translated(bubble.topLeft()), Qt.AlignCenter, "🔄")
+
+        painter.restore()
+
+    def editorEvent(self, event, model, option, index):
+        """Klik pada bubble (termasuk 🔄) memicu message_clicked; hover menyorot 🔄."""
+        if index.data(ERROR_TEXT_ROLE):
+            return False
+        if event.type() == QEvent.MouseMove:
+            _bubble, refresh = self._refresh_rect_at(option, index)
+            hover_row = index.row() if refresh.contains(event.position().toPoint()) else -1
+            if hover_row != self._hover_row:
+                self._hover_row = hover_row
+                view = self.parent()
+                if view is not None:
+                    view.viewport().update()
+            return False
+        if event.type() == QEvent.MouseButtonRelease and event.button() == Qt.LeftButton:
+            bubble, _refresh = self._refresh_rect_at(option, index)
+            if bubble.contains(event.position().toPoint()):
+                self.message_clicked.emit(index)
+                return True
+        return False
+
+    def helpEvent(self, event, view, option, index):
+        if event.type() == QEvent.ToolTip and not index.data(ERROR_TEXT_ROLE):
+            _bubble, refresh = self._refresh_rect_at(option, index)
+            if refresh.contains(event.pos()):
+                QToolTip.showText(event.globalPos(), "Dekripsi ulang pesan ini", view)
+                return True
+        return super().helpEvent(event, view, option, index)
@@ -2,11 +2,63 @@ import os
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
     QLineEdit, QPushButton, QMessageBox, QFrame,
-    QSpacerItem, QSizePolicy, QListWidget
+    QSpacerItem, QSizePolicy, QListWidget, QListWidgetItem
 )
 from PySide6.QtGui import QFont, QPixmap
-from PySide6.QtCore import Qt, QSize, QTimer
-from utils import get_resource_path
+from PySide6.QtCore import Qt, QSize, Slot, Signal, QObject, QThread
+from utils import get_resource_path, LOCAL_DATA_DIR
+from message_cache import MessageCache
+from poll_scheduler import AdaptivePoller
+from api_client import CIRCUIT_CLOSED
+
+#
+# --- [BARU] Worker untuk mengambil daftar kontak di luar thread GUI ---
+#
+class ContactFetchWorker(QObject):
+    """
+    Hidup di QThread milik DashboardPage (pola sama dengan HistoryFetchWorker
+    di chat.py). 'generation' dikembalikan apa adanya agar respons basi dibuang.
+
+    [REVISI] Mengambil ringkasan chat (/chat_summary) dalam satu request: per
+    kontak pesan terakhir + jumlah belum dibaca sejak cursor baca lokal. Cursor
+    dibaca dari cache SQLite user (ditulis ChatPage saat chat dibuka).
+    """
+    contacts_loaded = Signal(int, list, bool, bool) # (generation, ringkasan chat, berhasil, berubah)
+
+    def __init__(self, user_manager):
+        super().__init__()
+        self.user_manager = user_manager
+        self.read_cache = None
+        self.read_cache_user = None
+
+    def read_cursors(self, username):
+        if self.read_cache_user != username:
+            self.close_read_cache()
+            db_path = os.path.join(LOCAL_DATA_DIR, "user_caches", f"cache_{username}.sqlite3")
+            try:
+                self.read_cache = MessageCache(db_path)
+                self.read_cache_user = username
+            except Exception as e:
+                print(f"ContactFetchWorker: Cursor baca tidak tersedia: {e}")
+                return {}
+        return self.read_cache.get_read_cursors()
+
+    @Slot()
+    def close_read_cache(self):
+        if self.read_cache:
+            self.read_cache.close()
+        self.read_cache = None
+        self.read_cache_user = None
+
+    @Slot(str, int)
+    def fetch(self, username, generation):
+        try:
+            ok, chats, modified = self.user_manager.get_chat_summary(username, self.read_cursors(username))
+        except Exception as e:
+            print(f"ContactFetchWorker: Gagal memuat kontak: {e}")
+            ok, chats, modified = False, [], False
+        self.contacts_loaded.emit(generation, list(chats) if ok else [], ok, modified)
+
 
 # [REVISI UI 4.0]
 # Menerapkan 4 permintaan terakhir dari pengguna (menambah card
@@ -14,6 +66,7 @@ from utils import get_resource_path
 # memperbaiki cropping logo).
 
 class DashboardPage(QWidget):
+    contacts_requested = Signal(str, int) # [BARU] (username, generation) -> ContactFetchWorker
     
     # --- Palet Warna (Tidak Berubah) ---
     COLOR_BACKGROUND = "#1A1B2E"
@@ -31,20 +84,51 @@ class DashboardPage(QWidget):
     COLOR_RED_PRESSED = "#e63946"
     # -----------------------------------------------
 
-    def __init__(self, logout_callback, switch_to_chat, user_manager):
+    # [BARU] Interval polling kontak (ms): normal, dan saat kanal push tersambung
+    POLL_RANGE = (5000, 60000)
+    POLL_RANGE_PUSH = (30000, 120000)
+
+    def __init__(self, logout_callback, switch_to_chat, user_manager, push_bridge=None, connection_bridge=None):
         super().__init__()
         # --- Fungsionalitas Inti (Tidak Berubah) ---
         self.logout_callback = logout_callback
         self.switch_to_chat = switch_to_chat
         self.user_manager = user_manager
         self.current_user = None
+        self.last_contacts = None
+        self.contacts_rendered = False # [BARU] Daftar kontak sudah tampil (bukan teks status)
         # -------------------------------------------
         
         self.init_ui()
-        
-        self.contact_poll_timer = QTimer(self)
-        self.contact_poll_timer.setInterval(5000) # 5000 ms = 5 detik (LEBIH BAIK)
-        self.contact_poll_timer.timeout.connect(self.load_contact_list)
+
+        # [BARU] Thread pengambil kontak; fetch_in_flight mencegah tick menumpuk,
+        # fetch_generation dinaikkan saat user berganti / logout.
+        self.fetch_in_flight = False
+        self.refetch_pending = False
+        self.fetch_generation = 0
+        self.fetch_thread = QThread()
+        self.fetch_worker = ContactFetchWorker(self.user_manager)
+        self.fetch_worker.moveToThread(self.fetch_thread)
+        self.contacts_requested.connect(self.fetch_worker.fetch)
+        self.fetch_worker.contacts_loaded.connect(self.on_contacts_loaded)
+        self.fetch_thread.finished.connect(self.fetch_worker.close_read_cache)
+        self.fetch_thread.finished.connect(self.fetch_worker.deleteLater)
+        self.fetch_thread.start()
+        
+        # [REVISI] Polling kontak adaptif: 5 detik, mundur sampai 60 detik saat idle
+        self.contact_poller = AdaptivePoller(self, *self.POLL_RANGE)
+        self.contact_poller.tick.connect(self.load_contact_list)
+
+        # [BARU] Event push kontak/pesan memicu muat ulang daftar kontak
+        self.push_bridge = push_bridge
+        if self.push_bridge is not None:
+            self.push_bridge.event_received.connect(self.on_push_event)
+            self.push_bridge.state_changed.connect(self.on_push_state_changed)
+        # [BARU] Status koneksi server (circuit breaker di api_client)
+        self.connection_bridge = connection_bridge
+        if self.connection_bridge is not None:
+            self.connection_bridge.state_changed.connect(self.on_connection_state_changed)
+            self.on_connection_state_changed(self.connection_bridge.state)
 
     def init_ui(self):
         """
@@ -274,8 +358,15 @@ class DashboardPage(QWidget):
         self.subtitle_label.setFont(QFont("Segoe UI", 12))
         self.subtitle_label.setStyleSheet(f"color: {self.COLOR_TEXT_SUBTLE}; background-color: transparent; border: none;")
         
+        # [BARU] Label status koneksi (tersembunyi saat server normal)
+        self.connection_label = QLabel()
+        self.connection_label.setFont(QFont("Segoe UI", 10))
+        self.connection_label.setStyleSheet(f"color: {self.COLOR_RED}; background-color: transparent; border: none;")
+        self.connection_label.hide()
+
         name_info.addWidget(self.title_label)
         name_info.addWidget(self.subtitle_label)
+        name_info.addWidget(self.connection_label)
         name_info.addStretch()
 
         # --- Susun Header ---
@@ -292,40 +383,182 @@ class DashboardPage(QWidget):
     def set_welcome_message(self, username):
         self.title_label.setText(f"Hi, {username}!")
         self.subtitle_label.setText("Selamat datang kembali di dashboard Anda.")
+        if username != self.current_user:
+            # [BARU] User lain: buang daftar & respons milik user sebelumnya
+            self.reset_contact_state()
+            self.contact_list.clear()
         self.current_user = username
         self.load_contact_list()
         
-        if not self.contact_poll_timer.isActive():
-            self.contact_poll_timer.start()
+        if not self.contact_poller.is_active():
+            self.contact_poller.start()
 
 
     def handle_logout(self):
         """Menghentikan timer sebelum memanggil logout callback."""
-        if self.contact_poll_timer.isActive():
-            self.contact_poll_timer.stop()
+        if self.contact_poller.is_active():
+            self.contact_poller.stop()
             print("Dashboard: Polling kontak dihentikan.")
+        self.reset_contact_state()
         self.logout_callback()
 
+    def reset_contact_state(self):
+        self.fetch_generation += 1
+        self.fetch_in_flight = False
+        self.refetch_pending = False
+        self.last_contacts = None
+        self.contacts_rendered = False
+
+    def shutdown(self):
+        """[BARU] Dipanggil saat aplikasi keluar: hentikan thread pengambil kontak."""
+        self.reset_contact_state()
+        self.fetch_thread.quit()
+        self.fetch_thread.wait(2000)
+
     def load_contact_list(self):
+        """
+        [REVISI] Minta daftar kontak ke ContactFetchWorker (tidak memblokir GUI).
+        Tick dilewati jika fetch sebelumnya belum selesai.
+        """
         if not self.current_user: return
-        self.contact_list.clear(); self.contact_list.addItem("Memuat kontak...")
-        success, contacts = self.user_manager.get_contacts(self.current_user)
+        if self.fetch_in_flight:
+            self.refetch_pending = True
+            return
+        if self.contact_list.count() == 0:
+            self.set_contact_status("Memuat kontak...")
+        self.fetch_in_flight = True
+        self.contacts_requested.emit(self.current_user, self.fetch_generation)
+
+    @Slot(int, list, bool, bool)
+    def on_contacts_loaded(self, generation, contacts, success, modified):
+        """[BARU] Hasil ContactFetchWorker; respons basi dibuang."""
+        if generation != self.fetch_generation:
+            return
+        self.fetch_in_flight = False
+        # [REVISI] GET bersyarat: 304 (tidak berubah) -> daftar tidak disentuh
+        changed = success and modified and contacts != self.last_contacts
+        if success:
+            self.last_contacts = contacts
+        # [BARU] Laporkan hasil ke penjadwal polling (berubah / gagal / idle)
+        self.contact_poller.report(changed=changed, failed=not success)
+        if success and (changed or not self.contacts_rendered):
+            if contacts:
+                self.sync_contact_items(contacts)
+            else:
+                self.set_contact_status("Belum ada obrolan...")
+            self.contacts_rendered = True
+        elif not success and not self.contacts_rendered:
+            # Daftar yang sudah tampil dibiarkan saat fetch gagal
+            self.set_contact_status("Gagal memuat kontak.")
+        if self.refetch_pending:
+            self.refetch_pending = False
+            self.load_contact_list()
+
+    # [BARU] Label tipe pesan terakhir untuk tooltip kontak
+    MESSAGE_TYPE_LABELS = {"text": "Pesan teks", "stegano": "Gambar stegano", "file": "File"}
+
+    @staticmethod
+    def make_contact_item(username):
+        item = QListWidgetItem(username)
+        item.setData(Qt.UserRole, username) # Item status (teks abu-abu) tidak punya data
+        return item
+
+    def apply_chat_summary(self, item, chat):
+        """[BARU] Badge unread (teks + tebal) dan tooltip pesan terakhir pada item kontak."""
+        username = chat["contact"]
+        unread = chat.get("unread") or 0
+        text = f"{username}  ● {unread}" if unread else username
+        if item.text() != text:
+            item.setText(text)
+            font = item.font()
+            font.setBold(bool(unread))
+            item.setFont(font)
+        tooltip = ""
+        if chat.get("last_timestamp"):
+            type_label = self.MESSAGE_TYPE_LABELS.get(chat.get("last_type"), chat.get("last_type") or "Pesan")
+            tooltip = f"{type_label} terakhir: {chat['last_timestamp']}"
+            if unread:
+                tooltip += f"\n{unread} pesan belum dibaca"
+        if item.toolTip() != tooltip:
+            item.setToolTip(tooltip)
+
+    def find_contact_row(self, username):
+        for row in range(self.contact_list.count()):
+            if self.contact_list.item(row).data(Qt.UserRole) == username:
+                return row
+        return -1
+
+    def set_contact_status(self, text):
+        """Ganti isi daftar dengan satu baris status (mis. "Memuat kontak...")."""
         self.contact_list.clear()
-        if success and contacts:
-            for contact in contacts: self.contact_list.addItem(contact)
-        elif success and not contacts:
-            self.contact_list.addItem("Belum ada obrolan...")
-        else:
-            self.contact_list.addItem("Gagal memuat kontak.")
+        self.contact_list.addItem(text)
+
+    def sync_contact_items(self, chats):
+        """
+        [BARU] Samakan isi daftar dengan 'chats' lewat hapus/sisip/pindah saja,
+        tanpa clear(): pilihan dan posisi scroll tetap, tanpa kedip.
+        [REVISI] 'chats' = ringkasan dari /chat_summary, sudah urut pesan terakhir
+        terbaru; item yang ada diperbarui badge-nya saja.
+        """
+        contact_list = self.contact_list
+        current = contact_list.currentItem()
+        selected = current.data(Qt.UserRole) if current else None
+        scroll_value = contact_list.verticalScrollBar().value()
+        contact_list.setUpdatesEnabled(False)
+        try:
+            summaries = {}
+            for chat in chats:
+                summaries.setdefault(chat["contact"], chat) # Buang duplikat, urutan tetap
+            wanted = list(summaries)
+            wanted_set = set(wanted)
+            for row in range(contact_list.count() - 1, -1, -1):
+                if contact_list.item(row).data(Qt.UserRole) not in wanted_set:
+                    contact_list.takeItem(row) # Kontak hilang atau item status
+            rows = {contact_list.item(row).data(Qt.UserRole): row for row in range(contact_list.count())}
+            for index, username in enumerate(wanted):
+                item = contact_list.item(index)
+                if item is None or item.data(Qt.UserRole) != username:
+                    if username in rows:
+                        item = contact_list.takeItem(self.find_contact_row(username))
+                    else:
+                        item = self.make_contact_item(username)
+                    contact_list.insertItem(index, item)
+                self.apply_chat_summary(item, summaries[username])
+            if selected in wanted_set:
+                for row in range(contact_list.count()):
+                    if contact_list.item(row).data(Qt.UserRole) == selected:
+                        contact_list.setCurrentRow(row)
+                        break
+        finally:
+            contact_list.setUpdatesEnabled(True)
+        contact_list.verticalScrollBar().setValue(scroll_value)
+
+    @Slot(str, dict)
+    def on_push_event(self, event_type, payload):
+        """[BARU] Daftar kontak berubah (atau ada pesan baru) -> muat ulang sekarang."""
+        if self.contact_poller.is_active() and event_type in ("contacts", "message"):
+            self.load_contact_list()
+
+    @Slot(bool)
+    def on_push_state_changed(self, connected):
+        self.contact_poller.set_interval_range(*(self.POLL_RANGE_PUSH if connected else self.POLL_RANGE))
+
+    def on_connection_state_changed(self, state):
+        """[BARU] Tampilkan mode offline; saat server pulih langsung muat ulang kontak."""
+        label = self.connection_bridge.LABELS.get(state, "")
+        self.connection_label.setText(label)
+        self.connection_label.setVisible(bool(label))
+        if state == CIRCUIT_CLOSED and self.contact_poller.is_active():
+            self.contact_poller.notify_activity()
 
     def on_contact_clicked(self, item): 
-        recipient = item.text()
-        if recipient.startswith("Memuat") or recipient.startswith("Gagal") or recipient.startswith("Belum"):
+        recipient = item.data(Qt.UserRole) # [REVISI] Item status tidak punya username
+        if not recipient:
             return
 
     # [BARU] Hentikan timer sebelum pindah
-        if self.contact_poll_timer.isActive():
-            self.contact_poll_timer.stop()
+        if self.contact_poller.is_active():
+            self.contact_poller.stop()
             print("Dashboard: Polling kontak dihentikan.")
 
         users = sorted([self.current_user, recipient])
@@ -341,8 +574,8 @@ class DashboardPage(QWidget):
             QMessageBox.warning(self, "Error", "Tidak bisa chat dengan diri sendiri."); return
         
         # [BARU] Hentikan timer sebelum pindah
-        if self.contact_poll_timer.isActive():
-            self.contact_poll_timer.stop()
+        if self.contact_poller.is_active():
+            self.contact_poller.stop()
             print("Dashboard: Polling kontak dihentikan.")
         
         users = sorted([self.current_user, recipient])
@@ -350,12 +583,11 @@ class DashboardPage(QWidget):
         self.switch_to_chat(recipient, shared_password)
         self.recipient_input.clear()
         
-        items = self.contact_list.findItems(recipient, Qt.MatchExactly)
-        if not items:
+        if self.find_contact_row(recipient) < 0:
             placeholder_item = self.contact_list.findItems("Belum ada obrolan...", Qt.MatchExactly)
             if placeholder_item:
                 self.contact_list.takeItem(self.contact_list.row(placeholder_item[0]))
-            self.contact_list.addItem(recipient)
+            self.contact_list.addItem(self.make_contact_item(recipient))
 
     # ===================================================================
     # --- [BARU] FUNGSI HELPER STYLING (Card) ---
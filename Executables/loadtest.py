@@ -0,0 +1,348 @@
+"""
+[BARU] Load test headless untuk API pesan.
+
+Mensimulasikan N user sekaligus (thread pool, satu thread per user) dengan pola
+yang sama seperti klien GUI:
+  - ChatPage: delta sync riwayat (load_messages ?since=<cursor>) setiap tick
+  - DashboardPage: muat daftar kontak setiap beberapa tick
+  - kirim pesan teks lewat outbox MessageManager (latensi = antri -> terkirim)
+  - sesekali lampiran file lewat ChunkedUploader
+User ke-i chat dengan user ke-(i+1), jadi setiap chat punya pengirim dan pembaca.
+
+Contoh (server lokal di dalam proses yang sama):
+    python loadtest.py --local --users 50 --duration 30
+
+Atau ke server yang sudah berjalan:
+    python local_server.py --port 8765
+    python loadtest.py --url http://127.0.0.1:8765/ --users 100 --duration 60 --json hasil.json
+
+Hasil: throughput, p50/p95/p99 latensi dan error rate per endpoint.
+"""
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import base64
+import shutil
+import argparse
+import tempfile
+import threading
+import ipaddress
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+ENDPOINTS = ("register", "login", "contacts", "history", "send", "attach")
+PASSWORD = "loadtest-password"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile dari list yang sudah terurut: rank = ceil(fraction * n)."""
+    if not sorted_values:
+        return None
+    # round(): 0.07 * 100 = 7.000000000000001 tidak boleh naik ke rank 8
+    rank = math.ceil(round(fraction * len(sorted_values), 9))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+class LoadStats:
+    """Kumpulan latensi & error per endpoint (aman dipakai lintas thread)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {endpoint: [] for endpoint in ENDPOINTS}
+        self.errors = {endpoint: 0 for endpoint in ENDPOINTS}
+        self.error_samples = {}
+        self.started_at = None
+        self.finished_at = None
+
+    def record(self, endpoint, seconds, ok=True, error=None):
+        with self._lock:
+            if ok:
+                self.latencies[endpoint].append(seconds)
+            else:
+                self.errors[endpoint] += 1
+                if error:
+                    key = (endpoint, str(error)[:120])
+                    self.error_samples[key] = self.error_samples.get(key, 0) + 1
+
+    def summary(self):
+        elapsed = max((self.finished_at or time.perf_counter()) - (self.started_at or 0), 1e-9)
+        with self._lock:
+            rows = {}
+            for endpoint in ENDPOINTS:
+                values = sorted(self.latencies[endpoint])
+                total = len(values) + self.errors[endpoint]
+                if not total:
+                    continue
+                rows[endpoint] = {
+                    "count": total,
+                    "errors": self.errors[endpoint],
+                    "error_rate": self.errors[endpoint] / total,
+                    "throughput": total / elapsed,
+                    "p50_ms": _ms(percentile(values, 0.50)),
+                    "p95_ms": _ms(percentile(values, 0.95)),
+                    "p99_ms": _ms(percentile(values, 0.99)),
+                    "max_ms": _ms(values[-1] if values else None),
+                }
+            error_samples = [{"endpoint": endpoint, "error": error, "count": count}
+                             for (endpoint, error), count in sorted(self.error_samples.items(), key=lambda item: -item[1])]
+        total = sum(row["count"] for row in rows.values())
+        return {
+            "elapsed_s": elapsed,
+            "total_requests": total,
+            "throughput": total / elapsed,
+            "endpoints": rows,
+            "errors": error_samples[:10],
+        }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+class SimulatedUser:
+    """Satu klien: UserManager + MessageManager sendiri (termasuk outbox-nya)."""
+
+    def __init__(self, username, partner, stats, args, attach_path):
+        from utils import UserManager, MessageManager, CryptoEngine
+        self.username = username
+        self.partner = partner
+        self.stats = stats
+        self.args = args
+        self.attach_path = attach_path
+        self.user_manager = UserManager()
+        self.message_manager = MessageManager()
+        self.chat_id = self.message_manager.get_chat_id(username, partner)
+        users = sorted([username, partner])
+        self.crypto = CryptoEngine(f"key_rahasia_{users[0]}_{users[1]}")
+        self.cursor = None
+        self.random = random.Random(hash(username))
+        self._pending = {} # client_msg_id -> waktu masuk antrian
+        self._pending_lock = threading.Lock()
+        self.message_manager.add_delivery_listener(self._on_delivery)
+
+    # --- Skenario ---
+    def sign_in(self):
+        started = time.perf_counter()
+        ok, message = self.user_manager.register_user(self.username, PASSWORD)
+        self.stats.record("register", time.perf_counter() - started, ok, None if ok else message)
+        started = time.perf_counter()
+        ok = self.user_manager.verify_user(self.username, PASSWORD)
+        self.stats.record("login", time.perf_counter() - started, ok, None if ok else "Login gagal")
+        self.message_manager.start_outbox(self.username)
+
+    def run(self, deadline):
+        from utils import parse_db_timestamp
+        tick = 0
+        while time.perf_counter() < deadline:
+            tick_started = time.perf_counter()
+
+            started = time.perf_counter()
+            messages = self.message_manager.load_messages(self.chat_id, since=self.cursor)
+            self.stats.record("history", time.perf_counter() - started, messages is not None, "load_messages gagal")
+            newest = parse_db_timestamp(self.cursor)
+            for message in messages or []:
+                timestamp = parse_db_timestamp(message.get('db_timestamp'))
+                if timestamp is not None and (newest is None or timestamp > newest):
+                    newest, self.cursor = timestamp, message['db_timestamp']
+
+            if tick % self.args.contacts_every == 0:
+                started = time.perf_counter()
+                ok, _contacts = self.user_manager.get_contacts(self.username)
+                self.stats.record("contacts", time.perf_counter() - started, ok, "get_contacts gagal")
+
+            if self.random.random() < self.args.send_rate:
+                self.send_text()
+            if self.attach_path and self.random.random() < self.args.attach_rate:
+                self.send_attachment()
+
+            tick += 1
+            # Jeda seperti AdaptivePoller yang aktif, dengan sedikit jitter
+            remaining = self.args.poll_interval * self.random.uniform(0.8, 1.2) - (time.perf_counter() - tick_started)
+            if remaining > 0:
+                time.sleep(min(remaining, max(deadline - time.perf_counter(), 0)))
+
+    def send_text(self):
+        text = base64.b64encode(os.urandom(self.args.message_size)).decode('ascii')[:self.args.message_size]
+        metadata = {
+            'type': 'text',
+            'sender': self.username,
+            'recipient': self.partner,
+            'data': self.crypto.encrypt(text.encode('utf-8')).decode('utf-8'),
+            'client_msg_id': uuid.uuid4().hex,
+        }
+        with self._pending_lock:
+            self._pending[metadata['client_msg_id']] = time.perf_counter()
+        self.message_manager.save_message(self.chat_id, metadata)
+
+    def send_attachment(self):
+        import requests
+        from transfer import ChunkedUploader, TransferError
+        uploader = ChunkedUploader(self.message_manager.api_url, self.chat_id)
+        started = time.perf_counter()
+        try:
+            # Ubah beberapa byte agar setiap upload berisi data baru
+            with open(self.attach_path, "r+b") as f:
+                f.write(os.urandom(16))
+            uploader.upload(self.attach_path, "loadtest.bin")
+            self.stats.record("attach", time.perf_counter() - started)
+        except (TransferError, OSError, requests.exceptions.RequestException) as e:
+            self.stats.record("attach", time.perf_counter() - started, False, e)
+
+    def _on_delivery(self, client_msg_id, state):
+        if state not in ("sent", "failed"):
+            return
+        with self._pending_lock:
+            started = self._pending.pop(client_msg_id, None)
+        if started is not None:
+            self.stats.record("send", time.perf_counter() - started, state == "sent", f"Outbox: {state}")
+
+    def drain(self, timeout):
+        """Tunggu outbox mengirim sisa antrian; sisanya dihitung error."""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            with self._pending_lock:
+                if not self._pending:
+                    break
+            time.sleep(0.05)
+        with self._pending_lock:
+            leftover = len(self._pending)
+            self._pending.clear()
+        for _ in range(leftover):
+            self.stats.record("send", 0, False, "Belum terkirim saat load test selesai")
+
+    def close(self):
+        from utils import LOCAL_DATA_DIR
+        self.message_manager.stop_outbox()
+        db_path = os.path.join(LOCAL_DATA_DIR, "user_caches", f"outbox_{self.username}.sqlite3")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+def print_report(summary, args):
+    print()
+    print(f"Load test: {args.users} user, {summary['elapsed_s']:.1f} detik, {args.url}")
+    print(f"Total {summary['total_requests']} operasi, {summary['throughput']:.1f} op/detik")
+    header = f"{'endpoint':<10}{'count':>8}{'err%':>8}{'op/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for endpoint, row in summary["endpoints"].items():
+        cells = [row[key] if row[key] is not None else float('nan') for key in ("p50_ms", "p95_ms", "p99_ms", "max_ms")]
+        print(f"{endpoint:<10}{row['count']:>8}{row['error_rate'] * 100:>7.1f}%{row['throughput']:>9.1f}"
+              + "".join(f"{cell:>10.1f}" for cell in cells))
+    if summary["errors"]:
+        print("\nError terbanyak:")
+        for item in summary["errors"]:
+            print(f"  [{item['endpoint']}] x{item['count']}: {item['error']}")
+
+
+def _is_local_url(url):
+    host = urlsplit(url).hostname or ""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback or ipaddress.ip_address(host).is_private
+    except ValueError:
+        return False
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load test multi-klien untuk API pesan LDU.")
+    parser.add_argument("--url", default=os.environ.get("LDU_API_URL", "http://127.0.0.1:8765/"),
+                        help="Base URL API (default: LDU_API_URL atau server lokal)")
+    parser.add_argument("--local", action="store_true", help="Jalankan local_server.py di dalam proses ini")
+    parser.add_argument("--allow-remote", action="store_true", help="Izinkan URL selain localhost/jaringan privat")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0, help="Durasi (detik)")
+    parser.add_argument("--ramp-up", type=float, default=2.0, help="Waktu untuk memulai semua user (detik)")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Jeda polling riwayat (ChatPage aktif: 1 detik)")
+    parser.add_argument("--contacts-every", type=int, default=5, help="Muat kontak setiap N tick")
+    parser.add_argument("--send-rate", type=float, default=0.2, help="Peluang kirim pesan per tick")
+    parser.add_argument("--attach-rate", type=float, default=0.01, help="Peluang kirim lampiran per tick")
+    parser.add_argument("--attach-size", type=int, default=256 * 1024, help="Ukuran lampiran (byte)")
+    parser.add_argument("--message-size", type=int, default=200, help="Panjang teks pesan (karakter)")
+    parser.add_argument("--json", default=None, help="Simpan ringkasan ke file JSON")
+    args = parser.parse_args(argv)
+    if args.users < 2:
+        parser.error("--users minimal 2 (setiap user butuh lawan chat).")
+    args.contacts_every = max(args.contacts_every, 1)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = None
+    if args.local:
+        import local_server
+        server, args.url = local_server.run_in_thread()
+    elif not _is_local_url(args.url) and not args.allow_remote:
+        print(f"Menolak load test ke {args.url}: gunakan --allow-remote untuk server non-lokal.")
+        return 2
+
+    # URL harus diset sebelum utils diimpor (API_BASE_URL dibaca saat impor)
+    os.environ["LDU_API_URL"] = args.url
+    import api_client
+    # Setiap klien asli punya pool sendiri; di sini semua user berbagi satu session
+    api_client.POOL_MAXSIZE = max(api_client.POOL_MAXSIZE, args.users * 2)
+    # Circuit breaker bersama + salinan offline akan mengubah kegagalan server
+    # menjadi "sukses" instan dari cache; load test harus melihat setiap error
+    api_client.CIRCUIT_BREAKER_ENABLED = False
+    api_client.close_session()
+
+    run_id = uuid.uuid4().hex[:6]
+    names = [f"lt{run_id}_{index}" for index in range(args.users)]
+    stats = LoadStats()
+    work_dir = tempfile.mkdtemp(prefix="ldu_loadtest_")
+    attach_paths = {}
+    if args.attach_rate > 0:
+        # Satu file per user: setiap upload mengubah isi file-nya sendiri, jadi
+        # thread lain tidak pernah meng-hash / mengunggah file yang sedang ditulis
+        template = os.path.join(work_dir, "attachment.bin")
+        with open(template, "wb") as f:
+            f.write(os.urandom(args.attach_size))
+        for name in names:
+            attach_paths[name] = os.path.join(work_dir, f"attachment_{name}.bin")
+            shutil.copyfile(template, attach_paths[name])
+
+    print(f"Menyiapkan {args.users} user di {args.url} ...")
+    users = [SimulatedUser(name, names[(index + 1) % len(names)], stats, args, attach_paths.get(name))
+             for index, name in enumerate(names)]
+    try:
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            list(pool.map(lambda user: user.sign_in(), users))
+            stats.started_at = time.perf_counter()
+            deadline = stats.started_at + args.duration
+
+            def run_user(indexed_user):
+                index, user = indexed_user
+                time.sleep(args.ramp_up * index / len(users))
+                user.run(deadline)
+
+            list(pool.map(run_user, enumerate(users)))
+            list(pool.map(lambda user: user.drain(timeout=10), users))
+            stats.finished_at = time.perf_counter()
+    finally:
+        for user in users:
+            user.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        api_client.close_session()
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    summary = stats.summary()
+    summary["config"] = {key: value for key, value in vars(args).items()}
+    print_report(summary, args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nRingkasan disimpan ke {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
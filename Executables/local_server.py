@@ -0,0 +1,676 @@
+"""
+Server lokal pengganti API (https://morsz.azeroth.site/) untuk pengujian offline.
+
+Hanya memakai stdlib (http.server + sqlite3); msgpack/zstandard opsional lewat
+wire.py. Jalankan:
+
+    python local_server.py --port 8765 --db ldu_local.sqlite3
+    LDU_API_URL=http://127.0.0.1:8765/ python main.py
+
+(atau tulis {"api_url": "http://127.0.0.1:8765/"} di client_config.json)
+
+Endpoint yang didukung:
+    POST /register                     {"username", "salt_hex", "hash_hex"}
+    POST /login                        {"username"} -> {"salt_hex", "hash_hex"}
+    POST /login-face, /register-face   (tidak tersedia: 501)
+    POST /encrypt/vigenere, /decrypt/vigenere   {"text", "key"} -> {"result"}
+    GET  /get_chats/<username>                            (ETag / If-None-Match -> 304)
+    GET  /load_messages/<chat_id>[?since=<db_timestamp>]  (ETag / If-None-Match -> 304)
+    GET  /chat_summary/<username>[?since=<db_timestamp>&cursors=<json {kontak: db_timestamp}>]
+         -> {"chats": [{"contact", "chat_id", "last_timestamp", "last_type", "last_sender", "unread"}]}
+    POST /save_message
+    POST /save_messages                {"messages": [...]} -> {"results": [...]} per item
+    GET  /events/<username>            (Server-Sent Events: "message", "contacts")
+    POST /upload/start/<chat_id>       (upload per chunk, lihat transfer.py)
+    GET  /upload/<upload_id>
+    PUT  /upload/<upload_id>?offset=<n>
+    POST /upload/<upload_id>/complete
+    POST /upload_file/<chat_id>        (multipart lama, field 'file')
+    GET  /download_file/<chat_id>/<file_id>   (mendukung header Range)
+
+Body JSON/msgpack dinegosiasikan lewat Accept / Content-Type, kompresi gzip/zstd
+lewat Accept-Encoding / Content-Encoding (lihat wire.py).
+"""
+import argparse
+import hashlib
+import json
+import os
+import queue
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import uuid
+from email.parser import BytesParser
+from email import policy
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+import wire
+
+HEARTBEAT_INTERVAL = 15 # detik
+MAX_UPLOAD_CHUNK = 8 * 1024 * 1024
+MAX_BATCH_SIZE = 100
+MAX_LEGACY_UPLOAD = 64 * 1024 * 1024 # /upload_file dibaca utuh ke memori
+VIGENERE_DEFAULT_KEY = "defaultkey"
+FILE_BLOCK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r"bytes=(\d+)-(\d*)$")
+
+
+def utc_now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='microseconds')
+
+
+def vigenere(text, key, decrypt=False):
+    """
+    Implementasi acuan Vigenere server: hanya huruf A-Z/a-z yang digeser (kapitalisasi
+    tetap), posisi kunci hanya maju pada huruf, karakter kunci non-huruf diabaikan.
+    Sengaja ditulis per karakter (bukan salinan utils.py). Ini hanya pengganti lokal:
+    kesesuaian dengan server produksi dibuktikan lewat vektor rekaman
+    (utils.record_vigenere_vectors), bukan lewat server ini.
+    """
+    shifts = [ord(ch) - ord('a') for ch in (key or VIGENERE_DEFAULT_KEY).lower() if 'a' <= ch <= 'z']
+    if not shifts:
+        shifts = [ord(ch) - ord('a') for ch in VIGENERE_DEFAULT_KEY]
+    out = []
+    index = 0
+    for ch in text:
+        if 'a' <= ch <= 'z' or 'A' <= ch <= 'Z':
+            base = ord('a') if ch.islower() else ord('A')
+            shift = shifts[index % len(shifts)]
+            out.append(chr((ord(ch) - base + (-shift if decrypt else shift)) % 26 + base))
+            index += 1
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+class ServerStore:
+    """Penyimpanan pesan di SQLite (default :memory:), file upload di files_dir, dan daftar pelanggan SSE."""
+
+    def __init__(self, db_path=":memory:", files_dir=None):
+        self.files_dir = files_dir or tempfile.mkdtemp(prefix="ldu_files_")
+        os.makedirs(os.path.join(self.files_dir, "partial"), exist_ok=True)
+        self._uploads = {} # upload_id -> dict(chat_id, filename, size, sha256, received)
+        self._upload_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                chat_id TEXT NOT NULL,
+                sender TEXT,
+                recipient TEXT,
+                db_timestamp TEXT NOT NULL,
+                client_msg_id TEXT UNIQUE,
+                body TEXT NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages (chat_id, db_timestamp)")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                username TEXT PRIMARY KEY,
+                salt_hex TEXT NOT NULL,
+                hash_hex TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+        self._db.commit()
+        self._subscribers = {} # username -> set(queue.Queue)
+        self._sub_lock = threading.Lock()
+
+    # --- Akun ---
+    def register_user(self, username, salt_hex, hash_hex):
+        """False jika username sudah dipakai."""
+        with self._lock:
+            try:
+                self._db.execute("INSERT INTO users (username, salt_hex, hash_hex, created_at) VALUES (?, ?, ?, ?)",
+                                 (username, salt_hex, hash_hex, utc_now_iso()))
+                self._db.commit()
+            except sqlite3.IntegrityError:
+                return False
+        return True
+
+    def get_user(self, username):
+        """(salt_hex, hash_hex) atau None."""
+        with self._lock:
+            return self._db.execute("SELECT salt_hex, hash_hex FROM users WHERE username = ?", (username,)).fetchone()
+
+    # --- Pesan ---
+    def save_message(self, message):
+        """
+        Simpan pesan. Mengembalikan (pesan, baru); pesan dengan client_msg_id yang
+        sudah pernah disimpan tidak disimpan ulang (baru = False).
+        """
+        message = dict(message)
+        client_msg_id = message.get('client_msg_id')
+        with self._lock:
+            if client_msg_id:
+                row = self._db.execute("SELECT id, body FROM messages WHERE client_msg_id = ?", (client_msg_id,)).fetchone()
+                if row:
+                    existing = json.loads(row[1]); existing['id'] = row[0]
+                    return existing, False
+            message['db_timestamp'] = utc_now_iso()
+            cursor = self._db.execute(
+                "INSERT INTO messages (chat_id, sender, recipient, db_timestamp, client_msg_id, body) VALUES (?, ?, ?, ?, ?, ?)",
+                (message.get('chat_id'), message.get('sender'), message.get('recipient'),
+                 message['db_timestamp'], client_msg_id, json.dumps(message, ensure_ascii=False))
+            )
+            self._db.commit()
+            message['id'] = cursor.lastrowid
+        return message, True
+
+    def load_messages(self, chat_id, since=None):
+        query = "SELECT id, body FROM messages WHERE chat_id = ?"
+        params = [chat_id]
+        if since:
+            query += " AND db_timestamp >= ?"
+            params.append(since)
+        query += " ORDER BY id"
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        messages = []
+        for row_id, body in rows:
+            message = json.loads(body)
+            message['id'] = row_id
+            messages.append(message)
+        return messages
+
+    def chat_summary(self, username, since=None, cursors=None):
+        """
+        Ringkasan per lawan chat, urut pesan terakhir terbaru. 'unread' = pesan dari
+        kontak tersebut yang lebih baru dari cursors[kontak] (atau 'since' jika tidak ada).
+        """
+        cursors = cursors or {}
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT chat_id, sender, recipient, db_timestamp, body FROM messages WHERE id IN ("
+                "SELECT MAX(id) FROM messages WHERE sender = ? OR recipient = ? GROUP BY chat_id"
+                ") ORDER BY id DESC",
+                (username, username)
+            ).fetchall()
+            chats = []
+            for chat_id, sender, recipient, db_timestamp, body in rows:
+                contact = recipient if sender == username else sender
+                if not contact or contact == username:
+                    continue
+                cursor = cursors.get(contact) or since
+                query = "SELECT COUNT(*) FROM messages WHERE chat_id = ? AND sender = ?"
+                params = [chat_id, contact]
+                if cursor:
+                    query += " AND db_timestamp > ?"
+                    params.append(cursor)
+                unread = self._db.execute(query, params).fetchone()[0]
+                chats.append({
+                    "contact": contact,
+                    "chat_id": chat_id,
+                    "last_timestamp": db_timestamp,
+                    "last_type": json.loads(body).get('type'),
+                    "last_sender": sender,
+                    "unread": unread,
+                })
+        return chats
+
+    def get_contacts(self, username):
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT sender, recipient, MAX(id) AS last_id FROM messages "
+                "WHERE sender = ? OR recipient = ? GROUP BY sender, recipient ORDER BY last_id DESC",
+                (username, username)
+            ).fetchall()
+        contacts = []
+        for sender, recipient, _last_id in rows:
+            other = recipient if sender == username else sender
+            if other and other != username and other not in contacts:
+                contacts.append(other)
+        return contacts
+
+    # --- File (upload per chunk) ---
+    def _partial_path(self, upload_id):
+        return os.path.join(self.files_dir, "partial", upload_id)
+
+    def file_path(self, chat_id, file_id):
+        """Path file tersimpan, atau None jika tidak ada. file_id dibatasi ke hex agar aman."""
+        if not re.fullmatch(r"[0-9a-f]{32}", file_id or "") or not chat_id:
+            return None
+        path = os.path.join(self.files_dir, hashlib.sha256(chat_id.encode('utf-8')).hexdigest()[:16], file_id)
+        return path if os.path.exists(path) else None
+
+    def start_upload(self, chat_id, filename, size, sha256):
+        upload_id = uuid.uuid4().hex
+        with self._upload_lock:
+            self._uploads[upload_id] = {"chat_id": chat_id, "filename": filename, "size": size,
+                                        "sha256": sha256, "received": 0}
+        open(self._partial_path(upload_id), "wb").close()
+        return upload_id
+
+    def upload_status(self, upload_id):
+        with self._upload_lock:
+            upload = self._uploads.get(upload_id)
+            return dict(upload) if upload else None
+
+    def write_chunk(self, upload_id, offset, chunk):
+        """Tulis chunk di offset. Mengembalikan (ok, received); ok False jika offset tidak cocok."""
+        with self._upload_lock:
+            upload = self._uploads[upload_id]
+            if offset != upload["received"] or offset + len(chunk) > upload["size"]:
+                return False, upload["received"]
+            with open(self._partial_path(upload_id), "ab") as f:
+                f.write(chunk)
+            upload["received"] += len(chunk)
+            return True, upload["received"]
+
+    def complete_upload(self, upload_id):
+        """Verifikasi ukuran & SHA-256 lalu pindahkan ke penyimpanan. Mengembalikan file_id atau None."""
+        with self._upload_lock:
+            upload = self._uploads.get(upload_id)
+            if not upload or upload["received"] != upload["size"]:
+                return None
+            digest = hashlib.sha256()
+            with open(self._partial_path(upload_id), "rb") as f:
+                for block in iter(lambda: f.read(FILE_BLOCK_SIZE), b""):
+                    digest.update(block)
+            if upload["sha256"] and digest.hexdigest() != upload["sha256"]:
+                return None
+            file_id = self._store_file(upload["chat_id"], self._partial_path(upload_id))
+            del self._uploads[upload_id]
+            return file_id
+
+    def save_file(self, chat_id, data):
+        """Simpan file utuh (upload lama /upload_file). Mengembalikan file_id."""
+        partial_path = self._partial_path(uuid.uuid4().hex)
+        with open(partial_path, "wb") as f:
+            f.write(data)
+        return self._store_file(chat_id, partial_path)
+
+    def _store_file(self, chat_id, partial_path):
+        file_id = uuid.uuid4().hex
+        chat_dir = os.path.join(self.files_dir, hashlib.sha256(chat_id.encode('utf-8')).hexdigest()[:16])
+        os.makedirs(chat_dir, exist_ok=True)
+        shutil.move(partial_path, os.path.join(chat_dir, file_id))
+        return file_id
+
+    # --- SSE ---
+    def subscribe(self, username):
+        q = queue.Queue()
+        with self._sub_lock:
+            self._subscribers.setdefault(username, set()).add(q)
+        return q
+
+    def unsubscribe(self, username, q):
+        with self._sub_lock:
+            subscribers = self._subscribers.get(username)
+            if subscribers:
+                subscribers.discard(q)
+
+    def publish(self, username, event_type, payload):
+        with self._sub_lock:
+            subscribers = list(self._subscribers.get(username, ()))
+        for q in subscribers:
+            q.put((event_type, payload))
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    server_version = "LDULocal/1.0"
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True # Header & body ditulis terpisah; tanpa ini keep-alive kena delay ~40 ms
+
+    @property
+    def store(self):
+        return self.server.store
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    # --- Helper ---
+    def _route(self):
+        """Pecah path menjadi segmen; '//' dari API_BASE_URL yang berakhiran '/' diabaikan."""
+        parts = urlsplit(self.path)
+        segments = [unquote(seg) for seg in parts.path.split('/') if seg]
+        return segments, parse_qs(parts.query)
+
+    def _read_json(self):
+        """Body request (JSON atau msgpack, boleh terkompres) -> objek; None jika tidak valid."""
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b""
+        if not raw:
+            return {}
+        try:
+            raw = wire.decompress(raw, self.headers.get('Content-Encoding'))
+            return wire.decode(raw, self.headers.get('Content-Type'))
+        except wire.WireError:
+            return None
+
+    def _body_supported(self):
+        """False jika Content-Type / Content-Encoding body tidak bisa dibaca server ini."""
+        media_type = (self.headers.get('Content-Type') or wire.JSON_TYPE).split(';')[0].strip().lower()
+        encoding = (self.headers.get('Content-Encoding') or 'identity').strip().lower()
+        if media_type == wire.MSGPACK_TYPE and wire.msgpack is None:
+            return False
+        return encoding in ('identity', 'gzip') or (encoding == 'zstd' and wire.zstandard is not None)
+
+    def _read_body(self, limit):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > limit:
+            return None
+        return self.rfile.read(length) if length else b""
+
+    def _send_payload(self, status, payload, cacheable=False):
+        """
+        Kirim payload sebagai JSON atau msgpack (sesuai Accept), dikompres sesuai
+        Accept-Encoding. cacheable=True -> ETag, dan 304 tanpa body jika If-None-Match cocok.
+        """
+        content_type = wire.choose_content_type(self.headers.get('Accept'))
+        body = wire.encode(payload, content_type)
+        headers = {'Vary': 'Accept, Accept-Encoding'}
+        if cacheable:
+            etag = '"%s"' % hashlib.sha1(body).hexdigest()
+            headers['ETag'] = etag
+            if etag in [tag.strip() for tag in (self.headers.get('If-None-Match') or "").split(',')]:
+                self.send_response(304)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        body, encoding = wire.compress(body, wire.choose_encoding(self.headers.get('Accept-Encoding')))
+        self.send_response(status)
+        self.send_header('Content-Type', content_type + ('; charset=utf-8' if content_type == wire.JSON_TYPE else ''))
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, text):
+        data = text.encode('utf-8')
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def _not_found(self):
+        self.close_connection = True # Body request (jika ada) belum dibaca; jangan dipakai ulang
+        self._send_payload(404, {"success": False, "message": "Endpoint tidak ditemukan."})
+
+    # --- Routing ---
+    def do_GET(self):
+        segments, query = self._route()
+        if len(segments) == 2 and segments[0] == 'get_chats':
+            self._send_payload(200, {"success": True, "contacts": self.store.get_contacts(segments[1])}, cacheable=True)
+        elif len(segments) == 2 and segments[0] == 'chat_summary':
+            try:
+                cursors = json.loads(query.get('cursors', ['{}'])[0])
+            except ValueError:
+                cursors = None
+            if not isinstance(cursors, dict):
+                self._send_payload(400, {"success": False, "message": "Parameter cursors tidak valid."})
+                return
+            chats = self.store.chat_summary(segments[1], query.get('since', [None])[0], cursors)
+            self._send_payload(200, {"success": True, "chats": chats}, cacheable=True)
+        elif len(segments) == 2 and segments[0] == 'load_messages':
+            since = query.get('since', [None])[0]
+            self._send_payload(200, self.store.load_messages(segments[1], since), cacheable=True)
+        elif len(segments) == 2 and segments[0] == 'events':
+            self._stream_events(segments[1])
+        elif len(segments) == 2 and segments[0] == 'upload':
+            upload = self.store.upload_status(segments[1])
+            if upload is None:
+                self._send_payload(404, {"success": False, "message": "Sesi upload tidak ditemukan."})
+            else:
+                self._send_payload(200, {"success": True, "received": upload["received"], "size": upload["size"]})
+        elif len(segments) == 3 and segments[0] == 'download_file':
+            self._send_file(segments[1], segments[2])
+        else:
+            self._not_found()
+
+    def do_PUT(self):
+        segments, query = self._route()
+        if len(segments) == 2 and segments[0] == 'upload':
+            self._receive_chunk(segments[1], query)
+        else:
+            self._not_found()
+
+    def do_POST(self):
+        segments, _query = self._route()
+        if not self._body_supported():
+            self.close_connection = True # Body tidak dibaca
+            self._send_payload(415, {"success": False, "message": "Format body tidak didukung."})
+            return
+        if segments == ['save_message']:
+            message = self._read_json()
+            if not isinstance(message, dict) or not message.get('chat_id'):
+                self._send_payload(400, {"success": False, "message": "Data pesan tidak valid."})
+                return
+            if not message.get('client_msg_id') and self.headers.get('Idempotency-Key'):
+                message['client_msg_id'] = self.headers['Idempotency-Key']
+            saved, created = self.store.save_message(message)
+            if created:
+                self._notify_new_message(saved)
+            self._send_payload(200, {"success": True, "id": saved['id'], "db_timestamp": saved['db_timestamp'],
+                                  "duplicate": not created})
+        elif segments == ['save_messages']:
+            self._save_messages()
+        elif segments == ['register']:
+            self._register()
+        elif segments == ['login']:
+            request = self._read_json()
+            user = self.store.get_user(request.get('username')) if isinstance(request, dict) else None
+            if user is None:
+                self._send_payload(404, {"success": False, "message": "User tidak ditemukan."})
+            else:
+                self._send_payload(200, {"success": True, "salt_hex": user[0], "hash_hex": user[1]})
+        elif segments in (['login-face'], ['register-face']):
+            self.close_connection = True # Body (gambar) tidak dibaca
+            self._send_payload(501, {"success": False, "message": "Autentikasi wajah tidak tersedia di server lokal."})
+        elif len(segments) == 2 and segments[0] in ('encrypt', 'decrypt') and segments[1] == 'vigenere':
+            request = self._read_json()
+            if not isinstance(request, dict) or not isinstance(request.get('text'), str):
+                self._send_payload(400, {"success": False, "message": "Data Vigenere tidak valid."})
+                return
+            result = vigenere(request['text'], request.get('key') or "", decrypt=segments[0] == 'decrypt')
+            self._send_payload(200, {"success": True, "result": result})
+        elif len(segments) == 2 and segments[0] == 'upload_file':
+            self._legacy_upload(segments[1])
+        elif len(segments) == 3 and segments[:2] == ['upload', 'start']:
+            request = self._read_json()
+            if not isinstance(request, dict) or not isinstance(request.get('size'), int) or request['size'] < 0:
+                self._send_payload(400, {"success": False, "message": "Data upload tidak valid."})
+                return
+            upload_id = self.store.start_upload(segments[2], request.get('filename'), request['size'], request.get('sha256'))
+            self._send_payload(200, {"success": True, "upload_id": upload_id, "received": 0})
+        elif len(segments) == 3 and segments[0] == 'upload' and segments[2] == 'complete':
+            file_id = self.store.complete_upload(segments[1])
+            if file_id is None:
+                self._send_payload(409, {"success": False, "message": "Upload belum lengkap atau checksum tidak cocok."})
+            else:
+                self._send_payload(200, {"success": True, "file_id": file_id})
+        else:
+            self._not_found()
+
+    def _register(self):
+        request = self._read_json()
+        fields = ('username', 'salt_hex', 'hash_hex')
+        if not isinstance(request, dict) or not all(isinstance(request.get(key), str) and request[key] for key in fields):
+            self._send_payload(400, {"success": False, "message": "Data registrasi tidak valid."})
+            return
+        if not self.store.register_user(*(request[key] for key in fields)):
+            self._send_payload(409, {"success": False, "message": "Username sudah ada."})
+            return
+        self._send_payload(200, {"success": True, "message": "Akun berhasil dibuat!"})
+
+    def _legacy_upload(self, chat_id):
+        """Upload lama: multipart/form-data dengan field 'file', dibaca utuh."""
+        content_type = self.headers.get('Content-Type') or ""
+        body = self._read_body(MAX_LEGACY_UPLOAD)
+        if body is None:
+            self.close_connection = True
+            self._send_payload(413, {"success": False, "message": "File terlalu besar."})
+            return
+        if not content_type.startswith('multipart/form-data'):
+            self._send_payload(400, {"success": False, "message": "Harus multipart/form-data."})
+            return
+        form = BytesParser(policy=policy.HTTP).parsebytes(
+            f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body
+        )
+        for part in form.iter_parts():
+            if part.get_param('name', header='content-disposition') == 'file':
+                file_id = self.store.save_file(chat_id, part.get_payload(decode=True) or b"")
+                self._send_payload(200, {"success": True, "file_id": file_id})
+                return
+        self._send_payload(400, {"success": False, "message": "Field 'file' tidak ditemukan."})
+
+    def _save_messages(self):
+        """Batch: simpan setiap item berurutan dan kembalikan hasil per item."""
+        request = self._read_json()
+        messages = request.get('messages') if isinstance(request, dict) else None
+        if not isinstance(messages, list) or len(messages) > MAX_BATCH_SIZE:
+            self._send_payload(400, {"success": False, "message": "Data batch tidak valid."})
+            return
+        results = []
+        for message in messages:
+            client_msg_id = message.get('client_msg_id') if isinstance(message, dict) else None
+            if not isinstance(message, dict) or not message.get('chat_id'):
+                results.append({"client_msg_id": client_msg_id, "success": False, "status": 400,
+                                "message": "Data pesan tidak valid."})
+                continue
+            saved, created = self.store.save_message(message)
+            if created:
+                self._notify_new_message(saved)
+            results.append({"client_msg_id": client_msg_id, "success": True, "status": 200, "id": saved['id'],
+                            "db_timestamp": saved['db_timestamp'], "duplicate": not created})
+        self._send_payload(200, {"success": True, "results": results})
+
+    # --- File ---
+    def _receive_chunk(self, upload_id, query):
+        if self.store.upload_status(upload_id) is None:
+            self._send_payload(404, {"success": False, "message": "Sesi upload tidak ditemukan."})
+            return
+        try:
+            offset = int(query.get('offset', ['0'])[0])
+        except ValueError:
+            self._send_payload(400, {"success": False, "message": "Offset tidak valid."})
+            return
+        chunk = self._read_body(MAX_UPLOAD_CHUNK)
+        if chunk is None:
+            self.close_connection = True
+            self._send_payload(413, {"success": False, "message": "Chunk terlalu besar."})
+            return
+        expected = self.headers.get('X-Chunk-SHA256')
+        if expected and hashlib.sha256(chunk).hexdigest() != expected:
+            self._send_payload(422, {"success": False, "message": "Checksum chunk tidak cocok."})
+            return
+        ok, received = self.store.write_chunk(upload_id, offset, chunk)
+        self._send_payload(200 if ok else 409, {"success": ok, "received": received})
+
+    def _send_file(self, chat_id, file_id):
+        path = self.store.file_path(chat_id, file_id)
+        if path is None:
+            self._send_payload(404, {"success": False, "message": "File tidak ditemukan."})
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = _RANGE_RE.match(self.headers.get('Range') or "")
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size or start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{size}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        self.send_response(206 if match else 200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        if match:
+            self.send_header('Content-Range', f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        try:
+            with open(path, "rb") as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    block = f.read(min(FILE_BLOCK_SIZE, remaining))
+                    if not block:
+                        break
+                    self.wfile.write(block)
+                    remaining -= len(block)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True # Klien membatalkan / terputus
+
+    # --- Push ---
+    def _notify_new_message(self, message):
+        event = {"chat_id": message.get('chat_id'), "id": message['id'], "db_timestamp": message['db_timestamp']}
+        for username in {message.get('sender'), message.get('recipient')}:
+            if username:
+                self.store.publish(username, "message", event)
+                self.store.publish(username, "contacts", {"username": username})
+
+    def _stream_events(self, username):
+        q = self.store.subscribe(username)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            self.close_connection = True
+            self._write_chunk(": connected\n\n")
+            while not self.server.shutting_down:
+                try:
+                    event_type, payload = q.get(timeout=HEARTBEAT_INTERVAL)
+                    self._write_chunk(f"event: {event_type}\ndata: {json.dumps(payload)}\n\n")
+                except queue.Empty:
+                    self._write_chunk(": ping\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.store.unsubscribe(username, q)
+
+
+class LocalApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, store, verbose=False):
+        super().__init__(address, ApiRequestHandler)
+        self.store = store
+        self.verbose = verbose
+        self.shutting_down = False
+
+    def shutdown(self):
+        self.shutting_down = True
+        super().shutdown()
+
+
+def run_in_thread(host="127.0.0.1", port=0, db_path=":memory:", files_dir=None):
+    """Jalankan server di thread latar (untuk skrip uji). Mengembalikan (server, base_url)."""
+    server = LocalApiServer((host, port), ServerStore(db_path, files_dir))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server API lokal LDU untuk pengujian offline.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", default=":memory:", help="File SQLite (default: di memori)")
+    parser.add_argument("--files", default=None, help="Folder file upload (default: folder sementara)")
+    parser.add_argument("--verbose", action="store_true", help="Tampilkan log setiap request")
+    args = parser.parse_args()
+
+    server = LocalApiServer((args.host, args.port), ServerStore(args.db, args.files), verbose=args.verbose)
+    print(f"Server lokal berjalan di http://{args.host}:{server.server_address[1]}/ (Ctrl+C untuk berhenti)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
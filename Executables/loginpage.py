@@ -2,7 +2,8 @@
 import os
 import cv2
 import io
-import requests
+import api_client
+from utils import API_BASE_URL
 import time
 import numpy as np
 from PySide6.QtWidgets import (
@@ -14,7 +15,7 @@ from PySide6.QtCore import Qt, QThread, QObject, Signal, Slot
 
 # --- Konstanta Global untuk Biometrik ---
 CASCADE_PATH = "fm/haarcascade_frontalface_default.xml"
-API_URL = "https://morsz.azeroth.site" # Ganti dengan URL server Anda
+API_URL = API_BASE_URL.rstrip("/") # [REVISI] Dari konfigurasi (utils.load_api_base_url)
 
 #
 # --- [DARI CONTOH] Class Worker untuk Login Wajah ---
@@ -98,7 +99,7 @@ class FaceLoginWorker(QObject):
             image_bytes = io.BytesIO(buffer.tobytes())
             
             files = {'file': ('login_image.jpg', image_bytes, 'image/jpeg')}
-            response = requests.post(f"{API_URL}/login-face", files=files, timeout=30)
+            response = api_client.post(f"{API_URL}/login-face", endpoint="face_login", files=files)
 
             result = response.json()
             if response.status_code == 200 and result.get("success"):
@@ -1,24 +1,67 @@
+import os
 import sys
 import threading
+from collections import OrderedDict
 import tkinter as tk
 from tkinter import messagebox
 from PySide6.QtWidgets import QApplication, QStackedWidget, QMessageBox
-from PySide6.QtGui import QPalette, QColor
+from PySide6.QtGui import QPalette, QColor, QKeySequence, QShortcut
+from PySide6.QtCore import QObject, Signal
 
 # ====== Import Halaman (UI Pages) ======
 from loginpage import LoginPage
 from registerpage import RegisterPage
 from dashboard import DashboardPage
-from chat import ChatPage
+from chat import ChatPage, wait_for_retiring_threads
 
 # ====== Import Logika (Utils) ======
-from utils import UserManager, MessageManager
+from utils import UserManager, MessageManager, clear_derived_key_cache, LOCAL_DATA_DIR
+from push_channel import PushEventBridge
+import api_client
+import metrics
+from metrics_panel import MetricsPanel
 
 # ====== Import Autentikasi USB ======
 from usb_auth import get_all_valid_keys, check_usb_key, monitor_usb_drive, LOCAL_CONFIG_FILE
 
 
+# [REVISI] Jembatan Qt untuk outbox dan circuit breaker ada di sisi GUI;
+# outbox.py dan api_client.py tetap tanpa Qt
+class DeliveryStateBridge(QObject):
+    """Meneruskan perubahan state outbox (thread worker) ke thread GUI lewat sinyal Qt."""
+    state_changed = Signal(str, str) # (client_msg_id, state)
+
+    def __init__(self, message_manager, parent=None):
+        super().__init__(parent)
+        message_manager.add_delivery_listener(self._on_state)
+
+    def _on_state(self, client_msg_id, state):
+        self.state_changed.emit(client_msg_id, state)
+
+
+class ConnectionStateBridge(QObject):
+    """Meneruskan perubahan state circuit (thread mana pun) ke thread GUI lewat sinyal Qt."""
+    state_changed = Signal(str) # CIRCUIT_CLOSED / CIRCUIT_OPEN / CIRCUIT_HALF_OPEN
+
+    LABELS = {
+        api_client.CIRCUIT_CLOSED: "",
+        api_client.CIRCUIT_OPEN: "● Offline — menampilkan data tersimpan",
+        api_client.CIRCUIT_HALF_OPEN: "● Menyambung ulang ke server...",
+    }
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.state = api_client.CIRCUIT_CLOSED
+        api_client.add_circuit_listener(self._on_state)
+
+    def _on_state(self, _host, state):
+        self.state = state
+        self.state_changed.emit(state)
+
+
 class MainWindow(QStackedWidget):
+    CHAT_PAGE_CACHE_SIZE = 3 # [BARU] Jumlah ChatPage yang tetap hidup (LRU)
+
     def __init__(self):
         super().__init__()
 
@@ -27,27 +70,54 @@ class MainWindow(QStackedWidget):
         self.message_manager = MessageManager()
         self.current_user = None
 
+        # [BARU] Jembatan event push (thread latar -> thread GUI)
+        self.push_bridge = PushEventBridge(self.message_manager, self)
+        # [BARU] Jembatan state outbox (terkirim/gagal) ke bubble chat
+        self.delivery_bridge = DeliveryStateBridge(self.message_manager, self)
+        # [BARU] Jembatan status koneksi server (circuit breaker) ke label UI
+        self.connection_bridge = ConnectionStateBridge(self)
+
         # Halaman-halaman utama
         self.login_page = LoginPage(self.show_dashboard, self.show_register, self.user_manager)
         self.register_page = RegisterPage(self.show_login, self.user_manager)
         self.dashboard_page = DashboardPage(
             logout_callback=self.show_login, 
             switch_to_chat=self.show_chat, 
-            user_manager=self.user_manager
+            user_manager=self.user_manager,
+            push_bridge=self.push_bridge,
+            connection_bridge=self.connection_bridge
         )
         self.chat_page = None
+        # [BARU] LRU ChatPage: recipient -> ChatPage (paling baru di akhir).
+        # Kembali ke chat yang baru dibuka tidak membangun ulang halaman.
+        self.chat_pages = OrderedDict()
 
         # Tambahkan ke QStackedWidget
         self.addWidget(self.login_page)
         self.addWidget(self.register_page)
         self.addWidget(self.dashboard_page)
 
+        # [BARU] Panel debug metrik API (Ctrl+Shift+M)
+        self.metrics_panel = None
+        QShortcut(QKeySequence("Ctrl+Shift+M"), self, self.show_metrics_panel)
+
         self.setWindowTitle("Land Down Under !!!!")
         self.show_login()
 
+    def show_metrics_panel(self):
+        if self.metrics_panel is None:
+            self.metrics_panel = MetricsPanel(self)
+        self.metrics_panel.show()
+        self.metrics_panel.raise_()
+
     # ==== Navigasi Antar Halaman ====
     def show_login(self):
         self.current_user = None
+        self.close_chat_pages() # Halaman chat milik user sebelumnya
+        self.message_manager.stop_push()
+        self.message_manager.stop_outbox() # Antrian yang belum terkirim tetap di disk
+        clear_derived_key_cache()
+        api_client.clear_conditional_cache() # [REVISI] Salinan offline milik user sebelumnya
         self.setCurrentWidget(self.login_page)
         self.setFixedSize(1200, 800)
 
@@ -63,6 +133,8 @@ class MainWindow(QStackedWidget):
             self.show_login()
             return
 
+        self.message_manager.start_push(self.current_user)
+        self.message_manager.start_outbox(self.current_user)
         self.dashboard_page.set_welcome_message(self.current_user)
         self.setCurrentWidget(self.dashboard_page)
         self.setFixedSize(1200, 800)
@@ -77,22 +149,48 @@ class MainWindow(QStackedWidget):
             QMessageBox.warning(self, "Error", "Anda tidak bisa chat dengan diri sendiri.")
             return
 
-        if self.chat_page:
-            self.removeWidget(self.chat_page)
-            self.chat_page.deleteLater()
+        # [REVISI] Halaman chat lama tidak dihapus, hanya ditangguhkan (LRU)
+        if self.chat_page and self.chat_page is not self.chat_pages.get(recipient_username):
+            self.chat_page.suspend()
 
-        self.chat_page = ChatPage(
-            current_user=self.current_user,
-            recipient_username=recipient_username,
-            shared_password=shared_password,
-            message_manager=self.message_manager,
-            back_callback=self.show_dashboard
-        )
+        page = self.chat_pages.get(recipient_username)
+        if page is not None:
+            self.chat_pages.move_to_end(recipient_username)
+            page.resume()
+        else:
+            page = ChatPage(
+                current_user=self.current_user,
+                recipient_username=recipient_username,
+                shared_password=shared_password,
+                message_manager=self.message_manager,
+                back_callback=self.show_dashboard,
+                push_bridge=self.push_bridge,
+                delivery_bridge=self.delivery_bridge,
+                connection_bridge=self.connection_bridge
+            )
+            self.chat_pages[recipient_username] = page
+            self.addWidget(page)
+            while len(self.chat_pages) > self.CHAT_PAGE_CACHE_SIZE:
+                _recipient, evicted = self.chat_pages.popitem(last=False)
+                self.discard_chat_page(evicted)
 
-        self.addWidget(self.chat_page)
+        self.chat_page = page
         self.setCurrentWidget(self.chat_page)
         self.setFixedSize(1200, 800)
 
+    def discard_chat_page(self, page):
+        """[BARU] Hapus ChatPage dari LRU: hentikan thread & tutup cache."""
+        page.shutdown()
+        self.removeWidget(page)
+        page.deleteLater()
+
+    def close_chat_pages(self):
+        """[BARU] Dipanggil saat logout dan saat aplikasi keluar."""
+        while self.chat_pages:
+            _recipient, page = self.chat_pages.popitem(last=False)
+            self.discard_chat_page(page)
+        self.chat_page = None
+
 
 # ========== PROGRAM UTAMA ==========
 if __name__ == "__main__":
@@ -160,4 +258,13 @@ if __name__ == "__main__":
     )
     monitor_thread.start()
 
+    # [BARU] Tutup koneksi pool HTTP bersama saat aplikasi keluar
+    app.aboutToQuit.connect(window.dashboard_page.shutdown)
+    app.aboutToQuit.connect(window.close_chat_pages)
+    app.aboutToQuit.connect(wait_for_retiring_threads)
+    app.aboutToQuit.connect(window.message_manager.stop_outbox)
+    app.aboutToQuit.connect(api_client.close_session)
+    # [BARU] Simpan metrik API saat keluar (LDU_METRICS_FILE untuk path / format .prom)
+    app.aboutToQuit.connect(lambda: metrics.dump_on_exit(os.path.join(LOCAL_DATA_DIR, "api_metrics.json")))
+
     sys.exit(app.exec())
@@ -0,0 +1,145 @@
+import os
+import json
+import sqlite3
+import threading
+
+# [BARU] Cache hasil dekripsi di SQLite (mode WAL), menggantikan cache_<user>.json.
+# Setiap dekripsi/kirim cukup satu upsert baris, dan membuka satu chat hanya
+# membaca baris milik chat_id tersebut (indeks), bukan seluruh file cache.
+
+class MessageCache:
+    """
+    Tabel 'messages': message_id (PK) -> chat_id + value (JSON; teks biasa atau
+    dict stegano {"text", "image_path"}).
+    Isi cache_<user>.json lama diimpor sekali dengan chat_id NULL; baris tersebut
+    tetap bisa diambil lewat get(message_id).
+    """
+
+    def __init__(self, db_path, legacy_json_path=None):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                message_id TEXT PRIMARY KEY,
+                chat_id TEXT,
+                value TEXT NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat ON messages (chat_id)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        # [BARU] Cursor baca per chat: db_timestamp pesan terbaru yang sudah dilihat
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS read_cursors (
+                chat_id TEXT PRIMARY KEY,
+                contact TEXT NOT NULL,
+                cursor TEXT NOT NULL
+            )
+        """)
+        # [BARU] Snapshot riwayat per chat (metadata pesan dari server, urut rowid =
+        # urutan server) agar ChatPage bisa tampil sebelum fetch jaringan selesai
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS history (
+                chat_id TEXT NOT NULL,
+                message_key TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                UNIQUE (chat_id, message_key)
+            )
+        """)
+        self._db.commit()
+        if legacy_json_path:
+            self._import_legacy_json(legacy_json_path)
+
+    def _import_legacy_json(self, legacy_json_path):
+        """Impor cache JSON lama satu kali saja (file lama tidak dihapus)."""
+        with self._lock:
+            done = self._db.execute("SELECT value FROM meta WHERE key = 'legacy_json_imported'").fetchone()
+        if done or not os.path.exists(legacy_json_path):
+            return
+        try:
+            with open(legacy_json_path, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            print(f"Peringatan: Cache JSON lama tidak bisa dibaca, dilewati: {e}")
+            legacy = {}
+        rows = [(message_id, json.dumps(value, ensure_ascii=False))
+                for message_id, value in legacy.items() if message_id]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO messages (message_id, chat_id, value) VALUES (?, NULL, ?)", rows
+            )
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('legacy_json_imported', '1')")
+            self._db.commit()
+        print(f"Cache lama diimpor ke SQLite: {len(rows)} entri.")
+
+    def get(self, message_id):
+        """Ambil satu nilai cache (lookup primary key). None jika tidak ada."""
+        if not message_id:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT value FROM messages WHERE message_id = ?", (message_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def load_chat(self, chat_id):
+        """Semua nilai cache milik satu chat sebagai dict message_id -> value."""
+        with self._lock:
+            rows = self._db.execute("SELECT message_id, value FROM messages WHERE chat_id = ?", (chat_id,)).fetchall()
+        return {message_id: json.loads(value) for message_id, value in rows}
+
+    def put(self, message_id, chat_id, value):
+        """Upsert satu baris."""
+        if not message_id:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO messages (message_id, chat_id, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(message_id) DO UPDATE SET chat_id = excluded.chat_id, value = excluded.value",
+                (message_id, chat_id, json.dumps(value, ensure_ascii=False))
+            )
+            self._db.commit()
+
+    def load_history(self, chat_id):
+        """Snapshot riwayat satu chat: list metadata, urutan sama seperti dari server."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT metadata FROM history WHERE chat_id = ? ORDER BY rowid", (chat_id,)
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save_history(self, chat_id, entries):
+        """Upsert (message_key, metadata) ke snapshot; pesan lama tetap di posisinya."""
+        rows = [(chat_id, message_key, json.dumps(metadata, ensure_ascii=False))
+                for message_key, metadata in entries if message_key]
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO history (chat_id, message_key, metadata) VALUES (?, ?, ?) "
+                "ON CONFLICT(chat_id, message_key) DO UPDATE SET metadata = excluded.metadata",
+                rows
+            )
+            self._db.commit()
+
+    def get_read_cursors(self):
+        """dict kontak -> db_timestamp terakhir yang sudah dibaca."""
+        with self._lock:
+            rows = self._db.execute("SELECT contact, cursor FROM read_cursors").fetchall()
+        return dict(rows)
+
+    def set_read_cursor(self, chat_id, contact, cursor):
+        """Simpan cursor baca chat (pemanggil memastikan cursor tidak mundur)."""
+        if not cursor:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO read_cursors (chat_id, contact, cursor) VALUES (?, ?, ?) "
+                "ON CONFLICT(chat_id) DO UPDATE SET contact = excluded.contact, cursor = excluded.cursor",
+                (chat_id, contact, cursor)
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
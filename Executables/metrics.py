@@ -0,0 +1,160 @@
+import os
+import json
+import time
+import bisect
+import threading
+
+# [BARU] Metrik jaringan per endpoint untuk semua panggilan lewat api_client.
+# Setiap request mencatat: jumlah, histogram latensi, byte keluar/masuk, dan
+# kelas error (nama exception, atau "HTTP <status>" untuk status >= 400).
+# Endpoint = nama jenis endpoint di api_client (contacts, history, send, ...).
+#
+# Bisa dilihat langsung di aplikasi (metrics_panel.py, Ctrl+Shift+M) dan
+# disimpan ke file saat aplikasi keluar (dump): JSON, atau teks Prometheus
+# jika nama file berakhiran .prom / .txt.
+
+# Batas atas bucket histogram latensi (detik), gaya Prometheus (+Inf implisit)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_FILE_ENV = "LDU_METRICS_FILE"
+
+
+class EndpointStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = {}  # kelas error -> jumlah
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+    def add(self, seconds, bytes_out, bytes_in, error):
+        self.count += 1
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.bytes_out += bytes_out
+        self.bytes_in += bytes_in
+        if error:
+            self.errors[error] = self.errors.get(error, 0) + 1
+
+    def quantile(self, fraction):
+        """Perkiraan kuantil dari histogram (interpolasi linear di dalam bucket)."""
+        if not self.count:
+            return None
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            if bucket_count and seen + bucket_count >= target:
+                lower = LATENCY_BUCKETS[index - 1] if index > 0 else 0.0
+                upper = LATENCY_BUCKETS[index] if index < len(LATENCY_BUCKETS) else self.latency_max
+                return lower + (upper - lower) * ((target - seen) / bucket_count)
+            seen += bucket_count
+        return self.latency_max
+
+    def as_dict(self):
+        error_count = sum(self.errors.values())
+        return {
+            "count": self.count,
+            "errors": error_count,
+            "error_rate": error_count / self.count if self.count else 0.0,
+            "error_classes": dict(self.errors),
+            "latency_avg_s": self.latency_sum / self.count if self.count else None,
+            "latency_p50_s": self.quantile(0.50),
+            "latency_p95_s": self.quantile(0.95),
+            "latency_p99_s": self.quantile(0.99),
+            "latency_max_s": self.latency_max,
+            "latency_sum_s": self.latency_sum,
+            "latency_buckets": {("+Inf" if index == len(LATENCY_BUCKETS) else str(LATENCY_BUCKETS[index])): count
+                                for index, count in enumerate(self.buckets)},
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in,
+        }
+
+
+_stats = {}
+_lock = threading.Lock()
+_started_at = time.time()
+
+
+def record(endpoint, seconds, bytes_out=0, bytes_in=0, error=None):
+    """Catat satu panggilan API (dipanggil oleh api_client.request)."""
+    with _lock:
+        stats = _stats.get(endpoint)
+        if stats is None:
+            stats = _stats[endpoint] = EndpointStats()
+        stats.add(seconds, bytes_out or 0, bytes_in or 0, error)
+
+
+def snapshot():
+    """Salinan metrik saat ini: {"since", "endpoints": {endpoint: {...}}}, urut total latensi terbesar."""
+    with _lock:
+        endpoints = {name: stats.as_dict() for name, stats in _stats.items()}
+    ordered = dict(sorted(endpoints.items(), key=lambda item: -item[1]["latency_sum_s"]))
+    return {"since": _started_at, "generated_at": time.time(), "endpoints": ordered}
+
+
+def reset():
+    global _started_at
+    with _lock:
+        _stats.clear()
+        _started_at = time.time()
+
+
+def to_prometheus(data=None):
+    """Format teks eksposisi Prometheus."""
+    data = data or snapshot()
+    lines = [
+        "# HELP ldu_api_requests_total Jumlah panggilan API per endpoint.",
+        "# TYPE ldu_api_requests_total counter",
+    ]
+    endpoints = data["endpoints"]
+    for name, stats in endpoints.items():
+        lines.append(f'ldu_api_requests_total{{endpoint="{name}"}} {stats["count"]}')
+    lines += ["# HELP ldu_api_errors_total Panggilan API gagal per endpoint dan kelas error.",
+              "# TYPE ldu_api_errors_total counter"]
+    for name, stats in endpoints.items():
+        for error, count in stats["error_classes"].items():
+            error_label = error.replace('\\', '\\\\').replace('"', '\\"')
+            lines.append(f'ldu_api_errors_total{{endpoint="{name}",error="{error_label}"}} {count}')
+    lines += ["# HELP ldu_api_latency_seconds Latensi panggilan API.",
+              "# TYPE ldu_api_latency_seconds histogram"]
+    for name, stats in endpoints.items():
+        cumulative = 0
+        for bound, count in stats["latency_buckets"].items():
+            cumulative += count
+            lines.append(f'ldu_api_latency_seconds_bucket{{endpoint="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'ldu_api_latency_seconds_sum{{endpoint="{name}"}} {stats["latency_sum_s"]:.6f}')
+        lines.append(f'ldu_api_latency_seconds_count{{endpoint="{name}"}} {stats["count"]}')
+    for direction in ("out", "in"):
+        lines += [f"# HELP ldu_api_bytes_{direction}_total Byte body {'dikirim' if direction == 'out' else 'diterima'}.",
+                  f"# TYPE ldu_api_bytes_{direction}_total counter"]
+        for name, stats in endpoints.items():
+            lines.append(f'ldu_api_bytes_{direction}_total{{endpoint="{name}"}} {stats["bytes_" + direction]}')
+    return "\n".join(lines) + "\n"
+
+
+def dump(path):
+    """Simpan metrik ke path (.prom/.txt -> Prometheus, selain itu JSON)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    data = snapshot()
+    with open(path, "w", encoding="utf-8") as f:
+        if path.endswith((".prom", ".txt")):
+            f.write(to_prometheus(data))
+        else:
+            json.dump(data, f, indent=2)
+    return path
+
+
+def dump_on_exit(default_path):
+    """Dipanggil saat aplikasi keluar. Path dari LDU_METRICS_FILE jika diset."""
+    path = os.environ.get(METRICS_FILE_ENV) or default_path
+    with _lock:
+        empty = not _stats
+    if empty:
+        return
+    try:
+        print(f"Metrik API disimpan ke {dump(path)}")
+    except OSError as e:
+        print(f"Gagal menyimpan metrik API: {e}")
@@ -0,0 +1,136 @@
+from PySide6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QTableWidget,
+    QTableWidgetItem, QHeaderView, QFileDialog
+)
+from PySide6.QtCore import Qt, QTimer
+import metrics
+
+# [BARU] Panel debug metrik API (dibuka dengan Ctrl+Shift+M dari MainWindow).
+# Menampilkan snapshot metrics.py, diperbarui setiap detik selama terbuka.
+
+REFRESH_INTERVAL_MS = 1000
+
+
+def _format_ms(seconds):
+    return "-" if seconds is None else f"{seconds * 1000:.1f}"
+
+
+def _format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+class MetricsPanel(QDialog):
+    COLOR_BACKGROUND = "#1A1B2E"
+    COLOR_CARD = "#3E3C6E"
+    COLOR_TEXT = "#F0F0F5"
+    COLOR_TEXT_SUBTLE = "#A9A8C0"
+    COLOR_GOLD = "#D4AF37"
+
+    COLUMNS = ("Endpoint", "Jumlah", "Error", "Rata-rata ms", "p50 ms", "p95 ms", "p99 ms", "Maks ms",
+               "Keluar", "Masuk", "Kelas error")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Metrik API")
+        self.setMinimumSize(1000, 360)
+
+        self.summary_label = QLabel()
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset_metrics)
+        save_button = QPushButton("Simpan...")
+        save_button.clicked.connect(self.save_metrics)
+        close_button = QPushButton("Tutup")
+        close_button.clicked.connect(self.close)
+
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.summary_label)
+        buttons.addStretch()
+        buttons.addWidget(reset_button)
+        buttons.addWidget(save_button)
+        buttons.addWidget(close_button)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.table)
+        layout.addLayout(buttons)
+        self.apply_styles()
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def apply_styles(self):
+        self.setStyleSheet(f"""
+            QDialog {{ background-color: {self.COLOR_BACKGROUND}; }}
+            QLabel {{ color: {self.COLOR_TEXT_SUBTLE}; }}
+            QTableWidget {{
+                background-color: {self.COLOR_BACKGROUND}; color: {self.COLOR_TEXT};
+                gridline-color: {self.COLOR_CARD}; border: 1px solid {self.COLOR_GOLD};
+            }}
+            QHeaderView::section {{
+                background-color: {self.COLOR_CARD}; color: {self.COLOR_GOLD};
+                border: none; padding: 4px; font-weight: bold;
+            }}
+            QPushButton {{
+                background-color: {self.COLOR_CARD}; color: {self.COLOR_TEXT};
+                border: none; border-radius: 8px; padding: 6px 14px;
+            }}
+            QPushButton:hover {{ background-color: {self.COLOR_GOLD}; color: {self.COLOR_BACKGROUND}; }}
+        """)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        data = metrics.snapshot()
+        endpoints = data["endpoints"]
+        self.table.setRowCount(len(endpoints))
+        total_count = total_latency = 0
+        for row, (name, stats) in enumerate(endpoints.items()):
+            total_count += stats["count"]
+            total_latency += stats["latency_sum_s"]
+            error_classes = ", ".join(f"{error} x{count}" for error, count in
+                                      sorted(stats["error_classes"].items(), key=lambda item: -item[1]))
+            cells = (
+                name, str(stats["count"]), f"{stats['errors']} ({stats['error_rate'] * 100:.0f}%)",
+                _format_ms(stats["latency_avg_s"]), _format_ms(stats["latency_p50_s"]),
+                _format_ms(stats["latency_p95_s"]), _format_ms(stats["latency_p99_s"]),
+                _format_ms(stats["latency_max_s"]), _format_bytes(stats["bytes_out"]),
+                _format_bytes(stats["bytes_in"]), error_classes or "-",
+            )
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if 0 < column < 10:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, column, item)
+        self.summary_label.setText(
+            f"{total_count} panggilan, total waktu tunggu {total_latency:.1f} detik "
+            f"(diurutkan dari endpoint dengan total latensi terbesar)"
+        )
+
+    def reset_metrics(self):
+        metrics.reset()
+        self.refresh()
+
+    def save_metrics(self):
+        path, _selected = QFileDialog.getSaveFileName(
+            self, "Simpan Metrik API", "api_metrics.json", "JSON (*.json);;Prometheus (*.prom *.txt)"
+        )
+        if path:
+            metrics.dump(path)
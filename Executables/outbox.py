@@ -0,0 +1,256 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import requests
+import api_client
+from datetime import datetime
+
+# [BARU] Outbox persisten untuk pengiriman pesan (menggantikan satu thread per
+# pesan di MessageManager.save_message).
+# - Setiap pesan disimpan dulu ke SQLite, lalu satu worker mengirimnya berurutan
+#   (seq). Pesan berikutnya menunggu sampai pesan di depannya berhasil, jadi
+#   urutan kirim terjaga.
+# - Gagal karena jaringan / 5xx / 429 -> dicoba lagi dengan backoff eksponensial,
+#   tanpa batas percobaan (pesan tidak hilang, termasuk setelah aplikasi ditutup).
+# - Ditolak server (4xx lain) -> state 'failed', worker lanjut ke pesan berikutnya.
+# - client_msg_id dikirim di body (dan header Idempotency-Key untuk kiriman
+#   tunggal); server yang mendukungnya mengabaikan kiriman ganda (mis. respons
+#   hilang lalu dikirim ulang).
+
+STATE_PENDING = "pending"
+STATE_RETRYING = "retrying"
+STATE_SENT = "sent"
+STATE_FAILED = "failed"
+
+RETRY_MIN_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+SENT_RETENTION = 7 * 24 * 3600 # Baris terkirim dihapus setelah 7 hari
+# [BARU] Pesan yang masuk antrian dalam BATCH_WINDOW detik dikirim bersama lewat
+# POST /save_messages (maks BATCH_MAX_SIZE per request); server lama -> satu per satu.
+BATCH_WINDOW = 0.05
+BATCH_MAX_SIZE = 50
+IDLE_WAIT = 30.0 # Antrian kosong: worker tetap bangun sesekali sebagai jaring pengaman
+
+
+class Outbox:
+    """
+    Antrian kirim milik satu user. on_state(client_msg_id, state) dipanggil dari
+    thread worker setiap state pesan berubah (lihat DeliveryStateBridge di main.py untuk Qt).
+    """
+
+    def __init__(self, db_path, api_url, on_state=None):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.api_url = api_url
+        self.on_state = on_state
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        # Flag dibaca/ditulis di bawah _wakeup dan dicek sebelum worker tidur, jadi
+        # notify yang datang di sela "antrian kosong" dan wait() tidak hilang.
+        self._new_work = False  # enqueue(): ada pesan baru
+        self._retry_now = False # wake(): koneksi pulih, potong jeda backoff
+        self._stop = threading.Event()
+        self._batch_supported = True
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                client_msg_id TEXT NOT NULL UNIQUE,
+                chat_id TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_outbox_state ON outbox (state, seq)")
+        self._db.execute("DELETE FROM outbox WHERE state = ? AND updated_at < ?",
+                         (STATE_SENT, time.time() - SENT_RETENTION))
+        self._db.commit()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    # --- API publik ---
+    def enqueue(self, chat_id, payload):
+        """Simpan pesan ke antrian. Mengembalikan client_msg_id-nya."""
+        payload = dict(payload)
+        client_msg_id = payload.get('client_msg_id') or uuid.uuid4().hex
+        payload['client_msg_id'] = client_msg_id
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO outbox (client_msg_id, chat_id, payload, state, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (client_msg_id, chat_id, json.dumps(payload, ensure_ascii=False), STATE_PENDING,
+                 datetime.now().astimezone().isoformat(), time.time())
+            )
+            self._db.commit()
+        with self._wakeup:
+            self._new_work = True
+            self._wakeup.notify()
+        return client_msg_id
+
+    def wake(self):
+        """Bangunkan worker sekarang, termasuk memotong jeda backoff (mis. koneksi pulih)."""
+        with self._wakeup:
+            self._retry_now = True
+            self._wakeup.notify()
+
+    def state_of(self, client_msg_id):
+        with self._lock:
+            row = self._db.execute("SELECT state FROM outbox WHERE client_msg_id = ?", (client_msg_id,)).fetchone()
+        return row[0] if row else None
+
+    def undelivered(self, chat_id):
+        """Pesan chat ini yang belum terkirim: list (payload, state, created_at) urut seq."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payload, state, created_at FROM outbox WHERE chat_id = ? AND state != ? ORDER BY seq",
+                (chat_id, STATE_SENT)
+            ).fetchall()
+        return [(json.loads(payload), state, created_at) for payload, state, created_at in rows]
+
+    def stop(self):
+        self._stop.set()
+        self.wake()
+        self._thread.join(timeout=2)
+        with self._lock:
+            self._db.close()
+
+    # --- Worker ---
+    def _next_batch(self, limit):
+        with self._lock:
+            return self._db.execute(
+                "SELECT seq, client_msg_id, payload, attempts FROM outbox WHERE state IN (?, ?) ORDER BY seq LIMIT ?",
+                (STATE_PENDING, STATE_RETRYING, limit)
+            ).fetchall()
+
+    def _set_state(self, seq, client_msg_id, state, attempts=None, error=None):
+        with self._lock:
+            if self._stop.is_set():
+                return
+            self._db.execute(
+                "UPDATE outbox SET state = ?, attempts = COALESCE(?, attempts), last_error = ?, updated_at = ? WHERE seq = ?",
+                (state, attempts, error, time.time(), seq)
+            )
+            self._db.commit()
+        if self.on_state:
+            try:
+                self.on_state(client_msg_id, state)
+            except Exception as e:
+                print(f"Outbox: Listener state gagal: {e}")
+
+    @staticmethod
+    def _classify(status_code):
+        """None jika sukses, 'retry' jika boleh dicoba lagi, 'reject' jika ditolak permanen."""
+        if 200 <= status_code < 300:
+            return None
+        if status_code in (408, 425, 429) or status_code >= 500:
+            return "retry"
+        return "reject"
+
+    def _deliver(self, payload):
+        """Kirim satu pesan (POST /save_message). Mengembalikan (outcome, error)."""
+        try:
+            response = api_client.post_payload(
+                f"{self.api_url}/save_message", payload, endpoint="send",
+                headers={"Idempotency-Key": payload['client_msg_id']}
+            )
+        except requests.exceptions.RequestException as e:
+            return "retry", str(e)
+        outcome = self._classify(response.status_code)
+        return outcome, (f"HTTP {response.status_code}" if outcome else None)
+
+    def _deliver_batch(self, payloads):
+        """
+        [BARU] Kirim beberapa pesan sekaligus (POST /save_messages). Mengembalikan
+        list (outcome, error) untuk awalan payloads yang sudah diputuskan: berhenti
+        di item pertama yang harus dicoba lagi agar urutan tetap terjaga.
+        """
+        try:
+            response = api_client.post_payload(
+                f"{self.api_url}/save_messages", {"messages": payloads}, endpoint="send"
+            )
+        except requests.exceptions.RequestException as e:
+            return [("retry", str(e))]
+        if response.status_code in (404, 405, 501):
+            print("Outbox: Server tidak mendukung /save_messages, kirim satu per satu.")
+            self._batch_supported = False
+            return []
+        outcome = self._classify(response.status_code)
+        if outcome:
+            return [(outcome, f"HTTP {response.status_code}")]
+        try:
+            items = api_client.decode_payload(response).get("results", [])
+        except AttributeError:
+            return [("retry", "Respons batch tidak valid")]
+        results = []
+        for payload, item in zip(payloads, items):
+            if not isinstance(item, dict) or item.get("client_msg_id") != payload['client_msg_id']:
+                break
+            if item.get("success"):
+                results.append((None, None))
+                continue
+            status = item.get("status", 400)
+            outcome = self._classify(status) or "reject"
+            results.append((outcome, item.get("message") or f"HTTP {status}"))
+            if outcome == "retry":
+                break
+        return results or [("retry", "Respons batch kosong")]
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._wakeup:
+                # Dibersihkan SEBELUM membaca antrian: enqueue sesudah titik ini pasti terlihat
+                self._new_work = self._retry_now = False
+            rows = self._next_batch(BATCH_MAX_SIZE if self._batch_supported else 1)
+            if not rows:
+                with self._wakeup:
+                    self._wakeup.wait_for(lambda: self._new_work or self._retry_now or self._stop.is_set(),
+                                          timeout=IDLE_WAIT)
+                continue
+            if self._batch_supported and rows[0][3] == 0 and len(rows) < BATCH_MAX_SIZE:
+                # Pesan baru: tunggu sebentar agar kiriman beruntun ikut satu batch
+                if self._stop.wait(BATCH_WINDOW):
+                    break
+                rows = self._next_batch(BATCH_MAX_SIZE)
+
+            payloads = [json.loads(row[2]) for row in rows]
+            if self._batch_supported and len(rows) > 1:
+                results = self._deliver_batch(payloads)
+                if not results:
+                    continue # Baru tahu batch tidak didukung: ulangi satu per satu
+            else:
+                results = [self._deliver(payloads[0])]
+
+            retry_attempts = 0; retry_error = None
+            for (seq, client_msg_id, _payload, attempts), (outcome, error) in zip(rows, results):
+                if outcome is None:
+                    self._set_state(seq, client_msg_id, STATE_SENT, attempts + 1)
+                elif outcome == "reject":
+                    print(f"Outbox: Pesan ditolak server ({error}), tidak dikirim ulang.")
+                    self._set_state(seq, client_msg_id, STATE_FAILED, attempts + 1, error)
+                else:
+                    retry_attempts, retry_error = attempts + 1, error
+                    self._set_state(seq, client_msg_id, STATE_RETRYING, retry_attempts, error)
+            # [REVISI] Sisa batch yang tidak dijawab server diperlakukan seperti 'retry'
+            # (attempts + backoff), agar server yang terus menjawab sebagian tidak
+            # memicu kirim ulang beruntun tanpa jeda.
+            for seq, client_msg_id, _payload, attempts in rows[len(results):]:
+                retry_attempts = max(retry_attempts, attempts + 1)
+                retry_error = retry_error or "Tidak dijawab server dalam batch"
+                self._set_state(seq, client_msg_id, STATE_RETRYING, attempts + 1, retry_error)
+            sent = sum(1 for outcome, _error in results if outcome is None)
+            if sent:
+                print(f"Pesan (metadata) berhasil dikirim ke server: {sent} pesan.")
+            if retry_attempts:
+                delay = min(RETRY_MIN_DELAY * (2 ** (retry_attempts - 1)), RETRY_MAX_DELAY)
+                print(f"Gagal mengirim pesan: {retry_error} (coba lagi dalam {delay:.0f} detik)")
+                with self._wakeup:
+                    # Pesan baru tidak memotong backoff (pesan di depannya masih gagal)
+                    self._wakeup.wait_for(lambda: self._retry_now or self._stop.is_set(), timeout=delay)
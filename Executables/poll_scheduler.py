@@ -0,0 +1,145 @@
+import random
+from PySide6.QtCore import QObject, QTimer, Signal, Qt, QEvent
+from PySide6.QtGui import QGuiApplication
+
+# [BARU] Penjadwal polling adaptif yang dipakai ChatPage dan DashboardPage.
+# - Tick berikutnya dijadwalkan dari report(), yaitu setelah polling selesai,
+#   sehingga backoff langsung berlaku untuk jeda berikutnya.
+# - Idle (tidak ada perubahan) -> interval dikali 'backoff' sampai max_interval.
+# - Ada aktivitas (kirim/terima) -> langsung kembali ke min_interval.
+# - Server gagal -> ikut mundur seperti idle.
+# - Window diminimize / aplikasi tersembunyi -> tick tidak dikirim sama sekali;
+#   polling lanjut begitu halaman tampil / window dipulihkan.
+# - Jitter acak agar klien tidak polling serentak.
+
+class AdaptivePoller(QObject):
+    """
+    Pengganti QTimer polling dengan interval tetap.
+    Pemilik menghubungkan 'tick' ke fungsi polling-nya lalu memanggil
+    report(changed, failed) setelah hasil polling diketahui.
+    """
+    tick = Signal()
+
+    def __init__(self, owner, min_interval, max_interval, backoff=2.0, jitter=0.2):
+        super().__init__(owner)
+        self.owner = owner
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.current_interval = min_interval
+        self._active = False
+        self._paused = False
+        self._awaiting_report = False # [REVISI] Tick terkirim, menunggu report()
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._on_timeout)
+
+        app = QGuiApplication.instance()
+        if app is not None:
+            app.applicationStateChanged.connect(self._on_application_state_changed)
+
+    # --- API publik ---
+    def start(self, immediate=False):
+        """Mulai polling dari interval tercepat."""
+        self._active = True
+        self._paused = False
+        self._awaiting_report = False
+        self.current_interval = self.min_interval
+        self._schedule(0 if immediate else None)
+
+    def stop(self):
+        self._active = False
+        self._paused = False
+        self._awaiting_report = False
+        self._timer.stop()
+
+    def is_active(self):
+        return self._active
+
+    def set_interval_range(self, min_interval, max_interval):
+        """Ubah batas interval (mis. lebih lambat saat kanal push tersambung)."""
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.current_interval = min(max(self.current_interval, min_interval), max_interval)
+        if self._active and not self._paused and not self._awaiting_report:
+            self._schedule()
+
+    def notify_activity(self):
+        """Ada kiriman/terimaan pesan: kembali ke polling cepat sekarang juga."""
+        self.current_interval = self.min_interval
+        if self._active and not self._paused and not self._awaiting_report:
+            self._schedule()
+
+    def report(self, changed, failed=False):
+        """
+        Dipanggil pemilik setelah satu polling selesai.
+        [REVISI] Tick berikutnya dijadwalkan di sini dengan interval yang baru.
+        """
+        self._awaiting_report = False
+        if changed and not failed:
+            self.current_interval = self.min_interval
+        else:
+            self.current_interval = min(int(self.current_interval * self.backoff), self.max_interval)
+        if self._active and not self._paused:
+            self._schedule()
+
+    # --- Internal ---
+    def _schedule(self, delay=None):
+        if delay is None:
+            spread = self.current_interval * self.jitter
+            delay = int(self.current_interval + random.uniform(-spread, spread))
+        self._timer.start(max(0, delay))
+
+    def _is_hidden(self):
+        app_state = QGuiApplication.applicationState()
+        if app_state in (Qt.ApplicationState.ApplicationHidden, Qt.ApplicationState.ApplicationSuspended):
+            return True
+        if not self.owner.isVisible():
+            return True
+        return self.owner.window().isMinimized()
+
+    def _on_timeout(self):
+        if not self._active:
+            return
+        if self._is_hidden():
+            # Jangan polling saat tersembunyi; lanjut lewat event show / pulih
+            # dari minimize (lihat eventFilter). Cek ulang dengan interval
+            # maksimum (tanpa request jaringan) sebagai jaring pengaman.
+            self._paused = True
+            self._watch_visibility()
+            self._schedule(self.max_interval)
+            return
+        self._paused = False
+        # Tick berikutnya dijadwalkan oleh report(); timer ini hanya penjaga
+        # jika pemilik melewatkan report() (mis. hasil fetch basi dibuang).
+        self._awaiting_report = True
+        self._schedule(self.max_interval)
+        self.tick.emit()
+
+    def _watch_visibility(self):
+        # Window induk bisa berganti (halaman dipindah ke QStackedWidget), jadi
+        # filter dipasang ulang setiap kali pause; Qt tidak memasang dobel.
+        self.owner.installEventFilter(self)
+        window = self.owner.window()
+        if window is not self.owner:
+            window.installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+        if self._paused and event.type() in (QEvent.Show, QEvent.WindowStateChange):
+            # Diproses setelah event selesai, saat state visible/minimized sudah final
+            QTimer.singleShot(0, self, self._resume)
+        return False
+
+    def _resume(self):
+        if not self._active or not self._paused or self._is_hidden():
+            return
+        self._paused = False
+        self._awaiting_report = False
+        self.current_interval = self.min_interval
+        self._schedule(0)
+
+    def _on_application_state_changed(self, state):
+        if state == Qt.ApplicationState.ApplicationActive:
+            self._resume()
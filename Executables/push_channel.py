@@ -0,0 +1,140 @@
+import json
+import threading
+import requests
+import api_client
+from PySide6.QtCore import QObject, Signal
+
+# [BARU] Kanal push (Server-Sent Events) untuk pesan baru dan perubahan kontak.
+# Satu koneksi GET /events/<username> yang dibiarkan terbuka; server mengirim
+# event "message" dan "contacts". Jika server tidak mendukung endpoint ini atau
+# koneksi putus, klien tetap jalan dengan polling (AdaptivePoller).
+
+RECONNECT_MIN_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+UNSUPPORTED_RETRY_DELAY = 300.0 # Server tanpa /events: coba lagi 5 menit kemudian
+READ_TIMEOUT = 60 # Server mengirim heartbeat jauh lebih sering dari ini
+
+
+class PushChannel:
+    """
+    Thread latar yang menjaga satu langganan SSE.
+    on_event(event_type, payload) dan on_state(connected) dipanggil dari
+    thread latar, jadi penerima Qt harus memakai PushEventBridge.
+    """
+
+    def __init__(self, api_url, username, on_event, on_state):
+        self.api_url = api_url
+        self.username = username
+        self.on_event = on_event
+        self.on_state = on_state
+        self.connected = False
+        self._stop = threading.Event()
+        self._response = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        response = self._response
+        if response is not None:
+            try:
+                response.close() # Membuka blokir iter_lines()
+            except Exception:
+                pass
+
+    def _set_connected(self, connected):
+        if connected != self.connected:
+            self.connected = connected
+            if not self._stop.is_set(): # Setelah stop(), state diumumkan oleh pemanggil
+                self.on_state(connected)
+
+    def _run(self):
+        delay = RECONNECT_MIN_DELAY
+        while not self._stop.is_set():
+            try:
+                response = api_client.get(
+                    f"{self.api_url}/events/{self.username}", endpoint="push",
+                    headers={"Accept": "text/event-stream"},
+                    stream=True, timeout=(10, READ_TIMEOUT)
+                )
+                self._response = response
+                if response.status_code in (404, 405, 501):
+                    print("PushChannel: Server tidak mendukung /events, tetap memakai polling.")
+                    response.close()
+                    self._stop.wait(UNSUPPORTED_RETRY_DELAY)
+                    continue
+                if response.status_code != 200:
+                    raise requests.exceptions.RequestException(f"HTTP {response.status_code}")
+
+                self._set_connected(True)
+                delay = RECONNECT_MIN_DELAY
+                self._read_events(response)
+            except requests.exceptions.RequestException as e:
+                if not self._stop.is_set():
+                    print(f"PushChannel: Koneksi push terputus: {e}")
+            except Exception as e:
+                if not self._stop.is_set(): # close() dari stop() juga memicu error di sini
+                    print(f"PushChannel: Error tak terduga: {e}")
+            finally:
+                self._response = None
+                self._set_connected(False)
+
+            self._stop.wait(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def _read_events(self, response):
+        """Parser SSE minimal: field 'event' dan 'data', dipisah baris kosong."""
+        event_type = "message"
+        data_lines = []
+        # chunk_size=1: jangan menunggu buffer 512 byte terisi sebelum event diproses
+        for raw_line in response.iter_lines(chunk_size=1, decode_unicode=True):
+            if self._stop.is_set():
+                return
+            if raw_line is None:
+                continue
+            if raw_line == "":
+                if data_lines:
+                    self._dispatch(event_type, "\n".join(data_lines))
+                event_type = "message"
+                data_lines = []
+            elif raw_line.startswith(":"):
+                continue # Heartbeat / komentar
+            elif raw_line.startswith("event:"):
+                event_type = raw_line[6:].strip()
+            elif raw_line.startswith("data:"):
+                data_lines.append(raw_line[5:].lstrip())
+
+    def _dispatch(self, event_type, data):
+        try:
+            payload = json.loads(data)
+        except json.JSONDecodeError:
+            payload = {"raw": data}
+        try:
+            self.on_event(event_type, payload)
+        except Exception as e:
+            print(f"PushChannel: Listener gagal memproses event '{event_type}': {e}")
+
+
+class PushEventBridge(QObject):
+    """
+    Meneruskan event PushChannel (thread latar) ke thread GUI lewat sinyal Qt.
+    Dibuat sekali oleh MainWindow lalu dibagikan ke DashboardPage dan ChatPage.
+    """
+    event_received = Signal(str, dict) # (event_type, payload)
+    state_changed = Signal(bool)       # True = push tersambung
+
+    def __init__(self, message_manager, parent=None):
+        super().__init__(parent)
+        self.message_manager = message_manager
+        message_manager.add_push_listener(self._on_event, self._on_state)
+
+    def is_connected(self):
+        return self.message_manager.push_connected()
+
+    def _on_event(self, event_type, payload):
+        self.event_received.emit(event_type, payload if isinstance(payload, dict) else {"raw": payload})
+
+    def _on_state(self, connected):
+        self.state_changed.emit(connected)
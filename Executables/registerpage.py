@@ -3,7 +3,8 @@ import os
 import cv2
 import io
 import zipfile
-import requests
+import api_client
+from utils import API_BASE_URL
 import time
 import numpy as np
 from PySide6.QtWidgets import (
@@ -15,7 +16,7 @@ from PySide6.QtCore import Qt, QThread, QObject, Signal, Slot
 
 # --- Konstanta Global untuk Biometrik ---
 CASCADE_PATH = "fm/haarcascade_frontalface_default.xml"
-API_URL = "https://morsz.azeroth.site" # Ganti dengan URL server Anda
+API_URL = API_BASE_URL.rstrip("/") # [REVISI] Dari konfigurasi (utils.load_api_base_url)
 
 #
 # --- [DARI CONTOH] Class Worker untuk Registrasi Wajah ---
@@ -105,7 +106,7 @@ class FaceRegisterWorker(QObject):
 
             files = {'file': ('faces.zip', mem_zip, 'application/zip')}
             data = {'username': self.username}
-            response = requests.post(f"{API_URL}/register-face", files=files, data=data, timeout=60)
+            response = api_client.post(f"{API_URL}/register-face", endpoint="face_register", files=files, data=data)
 
             if response.status_code == 200:
                 self.finished.emit(True, "Face registered successfully! Training started.")
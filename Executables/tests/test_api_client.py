@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+import api_client
+from api_client import CircuitOpenError
+
+URL = "http://server.test/get_chats/alice"
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, headers=None):
+        self.status_code = status_code
+        self.content = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        self.headers = dict({"Content-Type": "application/json"}, **(headers or {}))
+        self.url = URL
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    api_client.clear_conditional_cache()
+    yield
+    api_client.clear_conditional_cache()
+
+
+def serve(monkeypatch, *responses):
+    """Ganti api_client.get; setiap item berupa FakeResponse atau exception."""
+    sent_headers = []
+    queue = list(responses)
+
+    def fake_get(url, endpoint="default", **kwargs):
+        sent_headers.append(kwargs.get("headers") or {})
+        item = queue.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    monkeypatch.setattr(api_client, "get", fake_get)
+    return sent_headers
+
+
+def test_offline_copy_kept_without_validators(monkeypatch):
+    sent = serve(monkeypatch, FakeResponse(200, ["bob"]), CircuitOpenError("open"))
+    assert api_client.get_json_conditional(URL) == (200, ["bob"], True)
+    assert api_client.get_json_conditional(URL) == (200, ["bob"], False)
+    assert "If-None-Match" not in sent[1] and "If-Modified-Since" not in sent[1]
+
+
+def test_validators_sent_and_304_reuses_payload(monkeypatch):
+    sent = serve(monkeypatch, FakeResponse(200, ["bob"], {"ETag": '"v1"'}), FakeResponse(304))
+    api_client.get_json_conditional(URL)
+    assert api_client.get_json_conditional(URL) == (200, ["bob"], False)
+    assert sent[1]["If-None-Match"] == '"v1"'
+    assert "If-Modified-Since" not in sent[1]
+
+
+def test_cleared_cache_serves_nothing_offline(monkeypatch):
+    serve(monkeypatch, FakeResponse(200, ["bob"]), CircuitOpenError("open"))
+    api_client.get_json_conditional(URL)
+    api_client.clear_conditional_cache() # Logout
+    with pytest.raises(CircuitOpenError):
+        api_client.get_json_conditional(URL)
+
+
+class FakeSession:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        response = FakeResponse(self.status_code)
+        response.request = None
+        return response
+
+
+@pytest.mark.parametrize("enabled, expected_calls", [(True, api_client.CIRCUIT_FAILURE_THRESHOLD), (False, 10)])
+def test_breaker_flag(monkeypatch, enabled, expected_calls):
+    session = FakeSession(503)
+    monkeypatch.setattr(api_client, "get_session", lambda: session)
+    monkeypatch.setattr(api_client, "CIRCUIT_BREAKER_ENABLED", enabled)
+    url = f"http://breaker-{enabled}.test/load_messages/a_b"
+    for _ in range(10):
+        try:
+            assert api_client.get(url).status_code == 503
+        except CircuitOpenError:
+            pass
+    assert session.calls == expected_calls # Tanpa breaker: setiap 503 benar-benar dikirim
@@ -0,0 +1,120 @@
+import io
+
+import pytest
+
+from utils import CryptoEngine, STREAM_V3_HEADER_SIZE, STREAM_MAX_CHUNK_SIZE, STREAM_TAG_SIZE
+
+CHUNK = 1024
+BLOCK = CHUNK + STREAM_TAG_SIZE
+PLAINTEXT = bytes(range(256)) * 16 # 4 chunk penuh
+
+
+class RecordingReader(io.BytesIO):
+    """BytesIO yang mencatat ukuran setiap read()."""
+
+    def __init__(self, data):
+        super().__init__(data)
+        self.read_sizes = []
+
+    def read(self, size=-1):
+        self.read_sizes.append(size)
+        return super().read(size)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return CryptoEngine("kunci_uji")
+
+
+class TrickleReader(io.BytesIO):
+    """Seperti pipe/socket: read() mengembalikan paling banyak 'step' byte."""
+
+    def __init__(self, data, step=100):
+        super().__init__(data)
+        self.step = step
+
+    def read(self, size=-1):
+        return super().read(self.step if size < 0 else min(size, self.step))
+
+
+def encrypted(engine, plaintext, chunk_size=CHUNK):
+    dst = io.BytesIO()
+    engine.encrypt_stream(io.BytesIO(plaintext), dst, chunk_size=chunk_size)
+    return dst.getvalue()
+
+
+def with_chunk_size(payload, chunk_size):
+    return payload[:STREAM_V3_HEADER_SIZE - 4] + chunk_size.to_bytes(4, 'big') + payload[STREAM_V3_HEADER_SIZE:]
+
+
+def test_round_trip(engine):
+    plaintext = bytes(range(256)) * 20
+    dst = io.BytesIO()
+    assert engine.decrypt_stream(io.BytesIO(encrypted(engine, plaintext)), dst) == len(plaintext)
+    assert dst.getvalue() == plaintext
+
+
+@pytest.mark.parametrize("cut", [0, 4, STREAM_V3_HEADER_SIZE - 1])
+def test_truncated_header_rejected(engine, cut):
+    payload = encrypted(engine, b"data")[:cut]
+    with pytest.raises(ValueError):
+        engine.decrypt_stream(io.BytesIO(payload), io.BytesIO())
+
+
+@pytest.mark.parametrize("chunk_size", [0, STREAM_MAX_CHUNK_SIZE + 1, 0x7FFFFFFF, 0xFFFFFFFF])
+def test_bad_chunk_size_rejected_before_reading_body(engine, chunk_size):
+    src = RecordingReader(with_chunk_size(encrypted(engine, b"data"), chunk_size))
+    with pytest.raises(ValueError):
+        engine.decrypt_stream(src, io.BytesIO())
+    assert src.read_sizes == [STREAM_V3_HEADER_SIZE]
+
+
+def test_encrypt_rejects_oversized_chunk_size(engine):
+    with pytest.raises(ValueError):
+        engine.encrypt_stream(io.BytesIO(b"data"), io.BytesIO(), chunk_size=STREAM_MAX_CHUNK_SIZE + 1)
+
+
+def blocks_of(payload):
+    body = payload[STREAM_V3_HEADER_SIZE:]
+    return payload[:STREAM_V3_HEADER_SIZE], [body[i:i + BLOCK] for i in range(0, len(body), BLOCK)]
+
+
+def assert_rejected(engine, payload):
+    dst = io.BytesIO()
+    with pytest.raises(ValueError):
+        engine.decrypt_stream(io.BytesIO(payload), dst)
+    return dst.getvalue()
+
+
+def test_flipped_byte_in_middle_chunk_rejected(engine):
+    payload = bytearray(encrypted(engine, PLAINTEXT))
+    payload[STREAM_V3_HEADER_SIZE + BLOCK + 10] ^= 0x01
+    # Hanya chunk sebelum chunk rusak yang sempat ditulis (pemanggil menulis ke .part)
+    assert assert_rejected(engine, bytes(payload)) == PLAINTEXT[:CHUNK]
+
+
+def test_swapped_chunks_rejected(engine):
+    header, blocks = blocks_of(encrypted(engine, PLAINTEXT))
+    blocks[1], blocks[2] = blocks[2], blocks[1]
+    assert assert_rejected(engine, header + b"".join(blocks)) == PLAINTEXT[:CHUNK]
+
+
+@pytest.mark.parametrize("keep_blocks, extra", [(3, 0), (1, 0), (3, STREAM_TAG_SIZE - 1), (3, 500)])
+def test_truncated_before_final_chunk_rejected(engine, keep_blocks, extra):
+    payload = encrypted(engine, PLAINTEXT + b"ekor")
+    assert assert_rejected(engine, payload[:STREAM_V3_HEADER_SIZE + keep_blocks * BLOCK + extra]) \
+        != PLAINTEXT + b"ekor"
+
+
+def test_wrong_password_rejected(engine):
+    assert assert_rejected(CryptoEngine("kunci_lain"), encrypted(engine, PLAINTEXT)) == b""
+
+
+def test_partial_reads_are_not_eof(engine):
+    dst = io.BytesIO()
+    engine.encrypt_stream(TrickleReader(PLAINTEXT), dst, chunk_size=CHUNK)
+    payload = dst.getvalue()
+    assert len(payload) == STREAM_V3_HEADER_SIZE + 4 * BLOCK # Bukan berhenti di read() pendek pertama
+    out = io.BytesIO()
+    assert engine.decrypt_stream(TrickleReader(payload), out) == len(PLAINTEXT)
+    assert out.getvalue() == PLAINTEXT
@@ -0,0 +1,22 @@
+import pytest
+
+from loadtest import percentile
+
+
+@pytest.mark.parametrize("n, fraction, expected", [
+    (10, 0.50, 5),
+    (10, 0.90, 9),
+    (10, 0.95, 10),
+    (10, 1.00, 10),
+    (100, 0.95, 95),
+    (100, 0.99, 99),
+    (100, 0.07, 7),
+    (1, 0.50, 1),
+    (3, 0.0, 1),
+])
+def test_percentile_nearest_rank(n, fraction, expected):
+    assert percentile(list(range(1, n + 1)), fraction) == expected
+
+
+def test_percentile_empty():
+    assert percentile([], 0.5) is None
@@ -0,0 +1,174 @@
+import time
+import threading
+
+import pytest
+import requests
+
+import api_client
+import local_server
+import outbox
+from outbox import Outbox, STATE_SENT, STATE_FAILED, STATE_RETRYING
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+@pytest.fixture
+def server():
+    server, url = local_server.run_in_thread()
+    yield server, url.rstrip("/")
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_outbox(tmp_path):
+    created = []
+
+    def make(api_url, **kwargs):
+        box = Outbox(str(tmp_path / f"outbox_{len(created)}.sqlite3"), api_url, **kwargs)
+        created.append(box)
+        return box
+
+    yield make
+    for box in created:
+        box.stop()
+
+
+@pytest.fixture
+def fast_retry(monkeypatch):
+    monkeypatch.setattr(outbox, "RETRY_MIN_DELAY", 0.05)
+
+
+def message(index, chat_id="alice_bob"):
+    return {"chat_id": chat_id, "sender": "alice", "recipient": "bob", "type": "text", "data": f"m{index}"}
+
+
+def stored_ids(server, chat_id="alice_bob"):
+    return [m["client_msg_id"] for m in server[0].store.load_messages(chat_id)]
+
+
+def test_messages_are_stored_in_enqueue_order(server, make_outbox):
+    box = make_outbox(server[1])
+    ids = [box.enqueue("alice_bob", message(i)) for i in range(30)]
+    assert wait_until(lambda: all(box.state_of(i) == STATE_SENT for i in ids))
+    assert stored_ids(server) == ids
+
+
+def test_rejected_message_fails_and_queue_moves_on(server, make_outbox):
+    box = make_outbox(server[1])
+    rejected = box.enqueue("alice_bob", {"sender": "alice", "data": "tanpa chat_id"}) # Server: 400
+    accepted = box.enqueue("alice_bob", message(1))
+    assert wait_until(lambda: box.state_of(accepted) == STATE_SENT)
+    assert box.state_of(rejected) == STATE_FAILED
+    assert stored_ids(server) == [accepted]
+
+
+def test_retryable_error_keeps_order(server, make_outbox, monkeypatch, fast_retry):
+    real_post = api_client.post_payload
+    failures = {"left": 3}
+    states = []
+
+    def flaky_post(url, payload, endpoint="default", **kwargs):
+        if failures["left"]:
+            failures["left"] -= 1
+            return FakeResponse(503)
+        return real_post(url, payload, endpoint, **kwargs)
+
+    monkeypatch.setattr(api_client, "post_payload", flaky_post)
+    box = make_outbox(server[1], on_state=lambda client_msg_id, state: states.append((client_msg_id, state)))
+    first = box.enqueue("alice_bob", message(0))
+    second = box.enqueue("alice_bob", message(1))
+    assert wait_until(lambda: box.state_of(second) == STATE_SENT)
+    assert (first, STATE_RETRYING) in states
+    assert stored_ids(server) == [first, second]
+
+
+def test_lost_batch_response_is_resent_idempotently(server, make_outbox, monkeypatch, fast_retry):
+    real_post = api_client.post_payload
+    lost = {"batches": 0}
+
+    def lossy_post(url, payload, endpoint="default", **kwargs):
+        response = real_post(url, payload, endpoint, **kwargs)
+        if url.endswith("/save_messages") and not lost["batches"]:
+            lost["batches"] += 1
+            raise requests.exceptions.ConnectionError("respons hilang") # Server sudah menyimpan
+        return response
+
+    monkeypatch.setattr(api_client, "post_payload", lossy_post)
+    box = make_outbox(server[1])
+    ids = [box.enqueue("alice_bob", message(i)) for i in range(5)]
+    assert wait_until(lambda: all(box.state_of(i) == STATE_SENT for i in ids))
+    assert lost["batches"] == 1
+    assert stored_ids(server) == ids # Tidak ada duplikat
+
+
+def test_enqueue_between_empty_read_and_wait_is_not_lost(server, make_outbox, monkeypatch):
+    real_next_batch = Outbox._next_batch
+    injected = {}
+
+    def next_batch_with_race(self, limit):
+        rows = real_next_batch(self, limit)
+        if not rows and "id" not in injected:
+            # Enqueue tepat di sela antrian kosong dan wait() milik worker
+            worker = threading.Thread(target=lambda: injected.setdefault("id", self.enqueue("alice_bob", message(0))))
+            worker.start()
+            worker.join()
+        return rows
+
+    monkeypatch.setattr(Outbox, "_next_batch", next_batch_with_race)
+    box = make_outbox(server[1])
+    assert wait_until(lambda: "id" in injected)
+    assert wait_until(lambda: box.state_of(injected["id"]) == STATE_SENT, timeout=3.0) # Bukan IDLE_WAIT
+
+
+def test_enqueue_does_not_cut_backoff_but_wake_does(make_outbox, monkeypatch):
+    monkeypatch.setattr(outbox, "RETRY_MIN_DELAY", 30.0)
+    calls = []
+
+    def failing_post(url, payload, endpoint="default", **kwargs):
+        calls.append(time.monotonic())
+        return FakeResponse(503)
+
+    monkeypatch.setattr(api_client, "post_payload", failing_post)
+    box = make_outbox("http://127.0.0.1:9")
+    box.enqueue("alice_bob", message(0))
+    assert wait_until(lambda: len(calls) == 1)
+    for index in range(1, 4):
+        box.enqueue("alice_bob", message(index))
+    time.sleep(0.3)
+    assert len(calls) == 1 # Masih dalam backoff
+    box.wake()
+    assert wait_until(lambda: len(calls) == 2, timeout=2.0)
+
+
+def test_partial_batch_result_backs_off(server, make_outbox, monkeypatch):
+    monkeypatch.setattr(outbox, "RETRY_MIN_DELAY", 0.2)
+    real_post = api_client.post_payload
+    calls = []
+
+    def partial_post(url, payload, endpoint="default", **kwargs):
+        calls.append(time.monotonic())
+        if url.endswith("/save_messages"):
+            # Server hanya menjawab pesan pertama dari setiap batch
+            payload = {"messages": payload["messages"][:1]}
+        return real_post(url, payload, endpoint, **kwargs)
+
+    monkeypatch.setattr(api_client, "post_payload", partial_post)
+    box = make_outbox(server[1])
+    ids = [box.enqueue("alice_bob", message(i)) for i in range(3)]
+    assert wait_until(lambda: all(box.state_of(i) == STATE_SENT for i in ids))
+    assert stored_ids(server) == ids
+    assert len(calls) == 3
+    assert all(later - earlier >= 0.15 for earlier, later in zip(calls, calls[1:])) # Bukan kirim ulang beruntun
@@ -0,0 +1,108 @@
+import pytest
+
+import api_client
+import transfer
+from transfer import ChunkedUploader, TransferError, download_file
+
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None, body=b"", headers=None):
+        self.status_code = status_code
+        self.payload = payload
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        if self.payload is None:
+            raise ValueError("bukan JSON")
+        return self.payload
+
+    def iter_content(self, chunk_size):
+        yield self.body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    """Catat setiap jeda backoff tanpa benar-benar menunggu."""
+    recorded = []
+    monkeypatch.setattr(transfer, "_retry_delay", lambda attempt, cancel_event: recorded.append(attempt))
+    return recorded
+
+
+@pytest.fixture
+def upload_file(tmp_path):
+    path = tmp_path / "lampiran.bin"
+    path.write_bytes(b"x" * 100)
+    return str(path)
+
+
+def fake_server(monkeypatch, put_responses, received=0):
+    """Server upload palsu: PUT menjawab sesuai put_responses, GET status selalu 'received'."""
+    calls = {"put": 0, "get": 0}
+
+    def fake_post(url, endpoint="default", **kwargs):
+        if url.endswith("/complete"):
+            return FakeResponse(200, {"success": True, "file_id": "file-1"})
+        return FakeResponse(200, {"success": True, "upload_id": "up-1", "received": 0})
+
+    def fake_put(url, endpoint="default", **kwargs):
+        calls["put"] += 1
+        return put_responses(kwargs["params"]["offset"], kwargs["data"])
+
+    def fake_get(url, endpoint="default", **kwargs):
+        calls["get"] += 1
+        return FakeResponse(200, {"received": received})
+
+    monkeypatch.setattr(api_client, "post", fake_post)
+    monkeypatch.setattr(api_client, "put", fake_put)
+    monkeypatch.setattr(api_client, "get", fake_get)
+    return calls
+
+
+def test_repeated_409_without_received_gives_up(monkeypatch, delays, upload_file):
+    calls = fake_server(monkeypatch, lambda offset, chunk: FakeResponse(409, {"success": False}))
+    with pytest.raises(TransferError):
+        ChunkedUploader("http://server.test", "a_b", chunk_size=40).upload(upload_file, "lampiran.bin")
+    assert calls["put"] == transfer.MAX_ATTEMPTS
+    assert calls["get"] >= transfer.MAX_ATTEMPTS # 409 tanpa 'received' -> tanya status sesi
+    assert len(delays) == transfer.MAX_ATTEMPTS - 1
+
+
+def test_409_with_received_resumes_from_server_offset(monkeypatch, delays, upload_file):
+    def put(offset, chunk):
+        if offset == 0:
+            return FakeResponse(409, {"received": 80}) # Dua chunk pertama sudah ada di server
+        return FakeResponse(200, {"received": offset + len(chunk)})
+
+    calls = fake_server(monkeypatch, put)
+    progress = []
+    file_id = ChunkedUploader("http://server.test", "a_b", chunk_size=40).upload(
+        upload_file, "lampiran.bin", on_progress=lambda sent, total: progress.append(sent))
+    assert file_id == "file-1"
+    assert progress == [80, 100]
+    assert calls["put"] == 2 and delays == []
+
+
+def test_incomplete_download_backs_off(monkeypatch, delays, tmp_path):
+    responses = [
+        FakeResponse(200, body=b"a" * 40, headers={"Content-Length": "100"}),
+        FakeResponse(206, body=b"b" * 60, headers={"Content-Length": "60"}),
+    ]
+    sent_ranges = []
+
+    def fake_get(url, endpoint="default", headers=None, **kwargs):
+        sent_ranges.append((headers or {}).get("Range"))
+        return responses.pop(0)
+
+    monkeypatch.setattr(api_client, "get", fake_get)
+    dest = tmp_path / "unduhan.bin"
+    assert download_file("http://server.test", "a_b", "file-1", str(dest)) == str(dest)
+    assert dest.read_bytes() == b"a" * 40 + b"b" * 60
+    assert sent_ranges == [None, "bytes=40-"]
+    assert delays == [0]
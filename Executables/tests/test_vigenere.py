@@ -0,0 +1,93 @@
+import random
+
+import pytest
+import requests
+
+import local_server
+import utils
+from utils import VIGENERE_CONFORMANCE_SAMPLES, VigenereUnavailableError
+
+
+class FakeResponse:
+    def __init__(self, result, status_code=200):
+        self.result = result
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return {"result": self.result}
+
+
+@pytest.fixture
+def unverified(monkeypatch):
+    """Belum ada vektor rekaman: server tetap menjadi acuan."""
+    monkeypatch.setattr(utils, "_vigenere_local_verified", False)
+
+
+def test_recorded_server_vectors_match_local():
+    vectors = utils.load_vigenere_vectors()
+    assert len(vectors) == 2 * len(VIGENERE_CONFORMANCE_SAMPLES)
+    assert utils.check_vigenere_vectors(vectors) == []
+
+
+def test_local_engine_is_default(monkeypatch):
+    monkeypatch.setattr(utils, "_vigenere_local_verified", None)
+    monkeypatch.setattr(utils.api_client, "post", lambda *a, **kw: pytest.fail("server tidak boleh dipanggil"))
+    assert utils.vigenere_local_verified()
+    assert utils.vigenere_encrypt("attack at dawn", "LEMON") == "lxfopv ef rnhr"
+
+
+def test_local_matches_server_reference_on_random_input():
+    rng = random.Random(2024)
+    alphabet = "abcXYZ 019.,-_!ßüñ🔐\n"
+    for _ in range(500):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        key = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 8)))
+        for decrypt in (False, True):
+            assert utils._vigenere_apply(text, key, decrypt=decrypt) == local_server.vigenere(text, key, decrypt=decrypt)
+
+
+def test_server_used_when_local_not_verified(unverified, monkeypatch):
+    calls = []
+
+    def fake_post(url, endpoint="default", **kwargs):
+        calls.append((url, kwargs["json"]))
+        return FakeResponse("dari-server")
+
+    monkeypatch.setattr(utils.api_client, "post", fake_post)
+    assert utils.vigenere_encrypt("Halo", "kunci") == "dari-server"
+    assert utils.vigenere_encrypt("Halo", "kunci") == "dari-server"
+    assert len(calls) == 2 # Tanpa cache: teks dan kunci tidak disimpan
+    assert calls[0][0].endswith("/encrypt/vigenere")
+    assert calls[0][1] == {"text": "Halo", "key": "kunci"}
+
+
+@pytest.mark.parametrize("error", [requests.exceptions.ConnectionError("offline"), ValueError("respons rusak")])
+def test_unverified_and_server_failure_raises(unverified, monkeypatch, error):
+    def fake_post(url, endpoint="default", **kwargs):
+        raise error
+
+    monkeypatch.setattr(utils.api_client, "post", fake_post)
+    with pytest.raises(VigenereUnavailableError):
+        utils.vigenere_encrypt("attack at dawn", "LEMON")
+
+
+def test_local_used_once_verified(monkeypatch):
+    monkeypatch.setattr(utils, "_vigenere_local_verified", True)
+    monkeypatch.setattr(utils.api_client, "post", lambda *a, **kw: pytest.fail("server tidak boleh dipanggil"))
+    assert utils.vigenere_decrypt("lxfopv ef rnhr", "LEMON") == "attack at dawn"
+
+
+@pytest.mark.parametrize("text, key", VIGENERE_CONFORMANCE_SAMPLES)
+def test_local_round_trip(text, key):
+    encrypted = utils._vigenere_apply(text, key)
+    assert utils._vigenere_apply(encrypted, key, decrypt=True) == text
+
+
+def test_check_vigenere_vectors_reports_mismatch():
+    vectors = [{"operation": "encrypt", "text": "abc", "key": "b", "result": "bcd"},
+               {"operation": "encrypt", "text": "abc", "key": "b", "result": "xxx"}]
+    assert utils.check_vigenere_vectors(vectors) == [vectors[1]]
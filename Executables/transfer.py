@@ -0,0 +1,240 @@
+import os
+import time
+import hashlib
+import requests
+import api_client
+
+# [BARU] Protokol transfer file per chunk yang bisa dilanjutkan (resumable)
+# selama proses berjalan. Sesi upload hanya ada di memori: setelah aplikasi
+# ditutup, upload dimulai dari awal (lampiran dienkripsi ulang setiap kirim).
+#
+# Upload:
+#   POST /upload/start/<chat_id>   {"filename", "size", "sha256", "chunk_size"} -> {"upload_id", "received"}
+#   GET  /upload/<upload_id>                                                     -> {"received", "size"}
+#   PUT  /upload/<upload_id>?offset=<n>  (body = bytes chunk, header X-Chunk-SHA256) -> {"received"}
+#   POST /upload/<upload_id>/complete                                            -> {"file_id"}
+# Server hanya menerima chunk pada offset == received (409 + received jika tidak),
+# dan memverifikasi checksum setiap chunk serta SHA-256 seluruh file saat complete.
+#
+# Download:
+#   GET /download_file/<chat_id>/<file_id> dengan header "Range: bytes=<n>-".
+#   Data ditulis ke <tujuan>.part dan dilanjutkan dari ukuran .part jika terputus.
+#
+# Server lama tanpa /upload/start (404/405) -> fallback ke POST /upload_file multipart.
+# Memori yang dipakai hanya sebesar satu chunk, berapa pun ukuran file.
+#
+# Chunk yang gagal diulang di sini (MAX_ATTEMPTS, backoff) dan upload dilanjutkan
+# dari offset yang dilaporkan server; PUT sengaja tidak diulang oleh urllib3
+# (api_client.RETRY_POLICY) agar percobaan ulang tidak berlipat. Jawaban yang
+# tidak memajukan offset (mis. 409 berulang) juga dihitung sebagai percobaan.
+
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_BLOCK_SIZE = 64 * 1024
+MAX_ATTEMPTS = 5
+RETRY_BASE_DELAY = 1.0
+
+
+class TransferError(Exception):
+    """Transfer gagal permanen (setelah semua percobaan ulang)."""
+
+
+class TransferCancelled(TransferError):
+    """Transfer dibatalkan oleh pengguna."""
+
+
+def file_sha256(path, block_size=DOWNLOAD_BLOCK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _json_or_empty(response):
+    try:
+        payload = response.json()
+    except ValueError:
+        return {}
+    return payload if isinstance(payload, dict) else {}
+
+
+def _check_cancel(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise TransferCancelled("Transfer dibatalkan.")
+
+
+def _retry_delay(attempt, cancel_event):
+    delay = RETRY_BASE_DELAY * (2 ** attempt)
+    if cancel_event is not None:
+        if cancel_event.wait(delay):
+            raise TransferCancelled("Transfer dibatalkan.")
+    else:
+        time.sleep(delay)
+
+
+class ChunkedUploader:
+    """
+    Upload satu file dari disk dalam satu sesi upload. Koneksi putus di tengah
+    jalan -> chunk berikutnya dilanjutkan dari offset terakhir di server, bukan
+    dari awal. Batasan: sesi tidak disimpan ke disk, jadi setelah aplikasi
+    ditutup/crash upload mulai dari awal. Lampiran dienkripsi ulang (salt &
+    nonce baru) setiap kali dikirim, jadi sesi lama memang tidak bisa dipakai.
+    Dipanggil dari thread latar (UploadWorker di chat.py), bukan thread GUI.
+    """
+
+    def __init__(self, api_url, chat_id, chunk_size=TRANSFER_CHUNK_SIZE):
+        self.api_url = api_url
+        self.chat_id = chat_id
+        self.chunk_size = chunk_size
+
+    # --- Protokol ---
+    def _start_session(self, filename, size, sha256):
+        """Mengembalikan (upload_id, received) atau None jika server tidak mendukung."""
+        response = api_client.post(
+            f"{self.api_url}/upload/start/{self.chat_id}", endpoint="transfer",
+            json={"filename": filename, "size": size, "sha256": sha256, "chunk_size": self.chunk_size}
+        )
+        if response.status_code in (404, 405, 501):
+            return None
+        payload = _json_or_empty(response)
+        if response.status_code != 200 or not payload.get("success"):
+            raise TransferError(payload.get("message", f"Gagal memulai upload (HTTP {response.status_code})."))
+        return payload["upload_id"], payload.get("received", 0)
+
+    def _query_received(self, upload_id):
+        response = api_client.get(f"{self.api_url}/upload/{upload_id}", endpoint="transfer")
+        if response.status_code != 200:
+            raise TransferError(f"Sesi upload tidak ditemukan (HTTP {response.status_code}).")
+        return _json_or_empty(response).get("received", 0)
+
+    def _put_chunk(self, upload_id, offset, chunk):
+        response = api_client.put(
+            f"{self.api_url}/upload/{upload_id}", endpoint="transfer",
+            params={"offset": offset}, data=chunk,
+            headers={"Content-Type": "application/octet-stream",
+                     "X-Chunk-SHA256": hashlib.sha256(chunk).hexdigest()}
+        )
+        payload = _json_or_empty(response)
+        if response.status_code == 200:
+            return payload.get("received", offset + len(chunk))
+        if response.status_code == 409:
+            # Offset tidak cocok (mis. chunk sebelumnya sudah diterima), ikuti server
+            if "received" in payload:
+                return payload["received"]
+            return self._query_received(upload_id)
+        raise requests.exceptions.RequestException(payload.get("message", f"HTTP {response.status_code}"))
+
+    def _complete(self, upload_id):
+        response = api_client.post(f"{self.api_url}/upload/{upload_id}/complete", endpoint="transfer")
+        payload = _json_or_empty(response)
+        if response.status_code != 200 or not payload.get("success"):
+            raise TransferError(payload.get("message", f"Gagal menyelesaikan upload (HTTP {response.status_code})."))
+        return payload.get("file_id")
+
+    def _legacy_upload(self, path, filename, content_type):
+        with open(path, "rb") as f:
+            files = {'file': (filename, f, content_type)}
+            response = api_client.post(f"{self.api_url}/upload_file/{self.chat_id}", endpoint="transfer", files=files)
+        payload = _json_or_empty(response)
+        if response.status_code != 200 or not payload.get("success"):
+            raise TransferError(f"Gagal mengunggah file: {payload.get('message', 'Error tidak diketahui')}")
+        return payload.get("file_id")
+
+    def upload(self, path, filename, content_type='application/octet-stream', on_progress=None, cancel_event=None):
+        """
+        Upload file di 'path'. on_progress(sent, total) dipanggil setiap chunk.
+        Mengembalikan file_id dari server. cancel_event (threading.Event) juga
+        memotong jeda backoff antar percobaan.
+        """
+        size = os.path.getsize(path)
+        sha256 = file_sha256(path)
+        _check_cancel(cancel_event)
+        session = self._start_session(filename, size, sha256)
+        if session is None:
+            print("Transfer: Server tidak mendukung upload per chunk, memakai /upload_file.")
+            return self._legacy_upload(path, filename, content_type)
+        upload_id, received = session
+
+        attempt = 0
+        with open(path, "rb") as f:
+            while received < size:
+                _check_cancel(cancel_event)
+                f.seek(received)
+                chunk = f.read(self.chunk_size)
+                try:
+                    new_received = self._put_chunk(upload_id, received, chunk)
+                    if new_received <= received:
+                        # [REVISI] Server tidak maju (mis. 409 terus-menerus): jangan ulang tanpa batas
+                        raise requests.exceptions.RequestException(f"Server tidak menerima chunk di byte {received}")
+                    received = new_received
+                    attempt = 0
+                except requests.exceptions.RequestException as e:
+                    attempt += 1
+                    if attempt >= MAX_ATTEMPTS:
+                        raise TransferError(f"Upload terputus setelah {MAX_ATTEMPTS} percobaan: {e}")
+                    print(f"Transfer: Chunk di byte {received} gagal ({e}), mencoba lagi...")
+                    _retry_delay(attempt - 1, cancel_event)
+                    try:
+                        received = self._query_received(upload_id)
+                    except requests.exceptions.RequestException:
+                        pass
+                    continue
+                if on_progress:
+                    on_progress(received, size)
+
+        _check_cancel(cancel_event)
+        return self._complete(upload_id)
+
+
+def download_file(api_url, chat_id, file_id, dest_path, on_progress=None, cancel_event=None):
+    """
+    Unduh file ke dest_path lewat <dest_path>.part, melanjutkan dengan header Range
+    jika .part sudah ada. on_progress(received, total) dipanggil per blok
+    (total 0 jika server tidak memberi ukuran). Mengembalikan dest_path.
+    """
+    partial_path = f"{dest_path}.part"
+    url = f"{api_url}/download_file/{chat_id}/{file_id}"
+    attempt = 0
+    while True:
+        _check_cancel(cancel_event)
+        received = os.path.getsize(partial_path) if os.path.exists(partial_path) else 0
+        headers = {"Range": f"bytes={received}-"} if received else {}
+        try:
+            with api_client.get(url, endpoint="transfer", headers=headers, stream=True) as response:
+                if response.status_code == 416:
+                    # .part sudah lengkap (atau lebih besar dari file di server): mulai ulang
+                    os.remove(partial_path)
+                    continue
+                if response.status_code not in (200, 206):
+                    raise TransferError(f"Gagal mengunduh file dari server (HTTP {response.status_code}).")
+                if response.status_code == 200:
+                    received = 0 # Server mengabaikan Range: tulis ulang dari awal
+                total = received + int(response.headers.get("Content-Length") or 0)
+                expected_sha256 = response.headers.get("X-Content-SHA256")
+                with open(partial_path, "ab" if received else "wb") as f:
+                    for block in response.iter_content(chunk_size=DOWNLOAD_BLOCK_SIZE):
+                        _check_cancel(cancel_event)
+                        f.write(block)
+                        received += len(block)
+                        if on_progress:
+                            on_progress(received, total)
+        except requests.exceptions.RequestException as e:
+            attempt += 1
+            if attempt >= MAX_ATTEMPTS:
+                raise TransferError(f"Unduhan terputus setelah {MAX_ATTEMPTS} percobaan: {e}")
+            print(f"Transfer: Unduhan terputus di byte {received} ({e}), melanjutkan...")
+            _retry_delay(attempt - 1, cancel_event)
+            continue
+
+        if total and received < total:
+            attempt += 1
+            if attempt >= MAX_ATTEMPTS:
+                raise TransferError(f"Unduhan tidak lengkap setelah {MAX_ATTEMPTS} percobaan.")
+            print(f"Transfer: Unduhan berhenti di byte {received} dari {total}, melanjutkan...")
+            _retry_delay(attempt - 1, cancel_event)
+            continue
+        if expected_sha256 and file_sha256(partial_path) != expected_sha256:
+            os.remove(partial_path)
+            raise TransferError("Checksum file unduhan tidak cocok. Silakan coba lagi.")
+        os.replace(partial_path, dest_path)
+        return dest_path
@@ -1,4 +1,5 @@
 import os
+import re
 import sys
 from hashlib import pbkdf2_hmac
 from Crypto.Cipher import AES
@@ -7,10 +8,17 @@ import base64  # <-- [BARU] Diperlukan untuk White-Mist
 import hashlib
 import json
 import requests
+import api_client
 import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
 from stegano import lsb
+from outbox import Outbox
 from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives import hashes
+from cryptography.exceptions import InvalidTag
 from cryptography.hazmat.backends import default_backend
 
 # --- [BARU] Impor White-Mist ---
@@ -56,14 +64,54 @@ def verify_password(stored_salt_hex, stored_hash_hex, password_to_check):
     except (ValueError, TypeError):
         return False
 
+# --- [BARU] HELPER TIMESTAMP ---
+def parse_db_timestamp(timestamp_iso):
+    """Parse 'db_timestamp' (ISO 8601) menjadi datetime aware. None jika tidak valid."""
+    if not timestamp_iso:
+        return None
+    try:
+        dt_obj = datetime.fromisoformat(timestamp_iso)
+    except (ValueError, TypeError):
+        return None
+    if dt_obj.tzinfo is None:
+        dt_obj = dt_obj.replace(tzinfo=timezone.utc)
+    return dt_obj
+
 # --- [ LOGIKA API KLIEN ] ---
-API_BASE_URL = "https://morsz.azeroth.site/" 
+# [REVISI] URL server dipilih lewat konfigurasi, urutan prioritas:
+#   1. variabel lingkungan LDU_API_URL
+#   2. "api_url" di client_config.json (folder proyek)
+#   3. server produksi
+# Contoh client_config.json untuk server lokal (local_server.py):
+#   {"api_url": "http://127.0.0.1:8765/"}
+DEFAULT_API_URL = "https://morsz.azeroth.site/"
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CLIENT_CONFIG_FILE = os.path.join(PROJECT_DIR, "client_config.json")
+
+def load_api_base_url(config_path=CLIENT_CONFIG_FILE):
+    if os.environ.get("LDU_API_URL"):
+        return os.environ["LDU_API_URL"]
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            api_url = json.load(f).get("api_url")
+        if api_url:
+            return api_url
+    except FileNotFoundError:
+        pass
+    except (IOError, ValueError, AttributeError) as e:
+        print(f"Konfigurasi klien tidak valid ({config_path}): {e}")
+    return DEFAULT_API_URL
+
+API_BASE_URL = load_api_base_url()
+# [BARU] Folder data lokal (sama dengan ChatPage.base_data_dir)
+LOCAL_DATA_DIR = os.path.join(PROJECT_DIR, "local_data")
 
 # --- MANAJEMEN USER (Tidak berubah) ---
 class UserManager:
     # ... (kode tidak berubah)
     def __init__(self):
         self.api_url = API_BASE_URL
+        self._summary_supported = True # [BARU] False setelah server menjawab 404 untuk /chat_summary
         print("UserManager (API Mode) diinisialisasi.")
 
     def register_user(self, username, password):
@@ -71,7 +119,7 @@ class UserManager:
         salt_hex, hash_hex = hash_password(password)
         payload = { "username": username, "salt_hex": salt_hex, "hash_hex": hash_hex }
         try:
-            response = requests.post(f"{self.api_url}/register", json=payload, timeout=10)
+            response = api_client.post(f"{self.api_url}/register", endpoint="auth", json=payload)
             if response.status_code == 200:
                 return True, response.json().get("message", "Akun berhasil dibuat!")
             else:
@@ -82,7 +130,7 @@ class UserManager:
     def verify_user(self, username, password):
         # ... (kode tidak berubah)
         try:
-            response = requests.post(f"{self.api_url}/login", json={"username": username}, timeout=10)
+            response = api_client.post(f"{self.api_url}/login", endpoint="auth", json={"username": username})
             if response.status_code != 200: return False 
             data = response.json()
             stored_salt_hex = data['salt_hex']
@@ -96,43 +144,180 @@ class UserManager:
             return False
             
     def get_contacts(self, username):
-        # ... (kode tidak berubah)
+        ok, contacts, _changed = self.get_contacts_if_changed(username)
+        return ok, contacts
+
+    def get_contacts_if_changed(self, username):
+        """
+        [BARU] Seperti get_contacts, lewat GET bersyarat (ETag). Mengembalikan
+        (berhasil, kontak, berubah); berubah False jika server menjawab 304.
+        """
         try:
-            response = requests.get(f"{self.api_url}/get_chats/{username}", timeout=10)
-            if response.status_code == 200 and response.json().get("success"):
-                return True, response.json().get("contacts", [])
+            status, payload, changed = api_client.get_json_conditional(f"{self.api_url}/get_chats/{username}", endpoint="contacts")
+            if status == 200 and isinstance(payload, dict) and payload.get("success"):
+                return True, payload.get("contacts", []), changed
             else:
-                print(f"Gagal mengambil kontak: {response.json().get('message')}")
-                return False, []
+                print(f"Gagal mengambil kontak: {(payload or {}).get('message') if isinstance(payload, dict) else status}")
+                return False, [], False
         except requests.exceptions.RequestException as e:
             print(f"Koneksi error ambil kontak: {e}")
-            return False, []
+            return False, [], False
+
+    def get_chat_summary(self, username, cursors=None, since=None):
+        """
+        [BARU] Ringkasan semua obrolan dalam satu request (GET bersyarat):
+        per kontak waktu & tipe pesan terakhir serta jumlah pesan belum dibaca
+        sejak cursor klien (cursors: {kontak: db_timestamp}, default 'since').
+        Mengembalikan (berhasil, chats, berubah); chats urut pesan terakhir terbaru.
+        Server lama tanpa /chat_summary -> daftar dari get_chats tanpa unread.
+        """
+        if self._summary_supported:
+            params = {"cursors": json.dumps(cursors or {}, sort_keys=True, separators=(',', ':'))}
+            if since:
+                params["since"] = since
+            try:
+                status, payload, changed = api_client.get_json_conditional(
+                    f"{self.api_url}/chat_summary/{username}", endpoint="contacts", params=params
+                )
+            except requests.exceptions.RequestException as e:
+                print(f"Koneksi error ambil ringkasan chat: {e}")
+                return False, [], False
+            if status == 200 and isinstance(payload, dict) and payload.get("success"):
+                return True, payload.get("chats", []), changed
+            if status not in (404, 405, 501):
+                print(f"Gagal mengambil ringkasan chat: {status}")
+                return False, [], False
+            print("Server tidak mendukung /chat_summary, memakai /get_chats.")
+            self._summary_supported = False
+        ok, contacts, changed = self.get_contacts_if_changed(username)
+        return ok, [{"contact": contact, "unread": 0} for contact in contacts], changed
 
 # --- MANAJEMEN PESAN (Tidak berubah) ---
 class MessageManager:
     # ... (kode tidak berubah)
     def __init__(self):
         self.api_url = API_BASE_URL
+        # [BARU] Kanal push (SSE) + daftar listener (on_event, on_state)
+        self._push_channel = None
+        self._push_listeners = []
+        # [BARU] Outbox persisten milik user yang login + listener state kirim
+        self._outbox = None
+        self._outbox_user = None
+        self._outbox_lock = threading.Lock()
+        self._delivery_listeners = []
+        # [BARU] Server pulih (circuit tertutup lagi): kirim antrian outbox segera
+        api_client.add_circuit_listener(self._on_circuit_state)
         print("MessageManager (API Mode) diinisialisasi.")
 
+    # --- [BARU] KANAL PUSH ---
+    def add_push_listener(self, on_event, on_state=None):
+        """Daftarkan callback event push. Dipanggil dari thread latar PushChannel."""
+        self._push_listeners.append((on_event, on_state))
+
+    def start_push(self, username):
+        """Buka langganan push untuk user yang login (ganti langganan lama jika ada)."""
+        if self._push_channel and self._push_channel.username == username:
+            return
+        # [REVISI] Impor di sini: push_channel memuat PySide6 (PushEventBridge),
+        # utils sendiri tetap bisa diimpor tanpa Qt
+        from push_channel import PushChannel
+        self.stop_push()
+        self._push_channel = PushChannel(self.api_url, username, self._fan_out_event, self._fan_out_state)
+        self._push_channel.start()
+
+    def stop_push(self):
+        if self._push_channel:
+            self._push_channel.stop()
+            self._push_channel = None
+            self._fan_out_state(False)
+
+    def push_connected(self):
+        return bool(self._push_channel and self._push_channel.connected)
+
+    def _fan_out_event(self, event_type, payload):
+        for on_event, _on_state in list(self._push_listeners):
+            on_event(event_type, payload)
+
+    def _fan_out_state(self, connected):
+        if connected and self._outbox:
+            self._outbox.wake() # Koneksi pulih: kirim ulang antrian tanpa menunggu backoff
+        for _on_event, on_state in list(self._push_listeners):
+            if on_state:
+                on_state(connected)
+
+    def _on_circuit_state(self, _host, state):
+        if state == api_client.CIRCUIT_CLOSED and self._outbox:
+            self._outbox.wake()
+
+    # --- [BARU] OUTBOX ---
+    def add_delivery_listener(self, on_state):
+        """on_state(client_msg_id, state) dipanggil dari thread worker outbox."""
+        self._delivery_listeners.append(on_state)
+
+    def _fan_out_delivery(self, client_msg_id, state):
+        for on_state in list(self._delivery_listeners):
+            on_state(client_msg_id, state)
+
+    def start_outbox(self, username):
+        """Buka outbox user (sisa antrian dari sesi sebelumnya langsung dikirim)."""
+        with self._outbox_lock:
+            if self._outbox and self._outbox_user == username:
+                return self._outbox
+            if self._outbox:
+                self._outbox.stop()
+            db_path = os.path.join(LOCAL_DATA_DIR, "user_caches", f"outbox_{username}.sqlite3")
+            self._outbox = Outbox(db_path, self.api_url, self._fan_out_delivery)
+            self._outbox_user = username
+            return self._outbox
+
+    def stop_outbox(self):
+        with self._outbox_lock:
+            if self._outbox:
+                self._outbox.stop()
+                self._outbox = None
+                self._outbox_user = None
+
+    def undelivered_messages(self, username, chat_id):
+        """Pesan user di chat ini yang masih di outbox: list (payload, state, created_at)."""
+        return self.start_outbox(username).undelivered(chat_id)
+
     def get_chat_id(self, user1, user2):
         users = sorted([user1, user2])
         return f"{users[0]}_{users[1]}"
 
-    def load_messages(self, chat_id):
-        # ... (kode tidak berubah)
+    def load_messages(self, chat_id, since=None):
+        """
+        [REVISI Delta Sync]
+        Memuat pesan sebuah chat. Jika 'since' (db_timestamp terakhir yang
+        sudah dimiliki klien) diberikan, hanya pesan yang lebih baru atau sama
+        dengan cursor tersebut yang dikembalikan.
+        Mengembalikan None jika server tidak bisa dihubungi / error.
+        """
+        params = {"since": since} if since else None
         try:
-            response = requests.get(f"{self.api_url}/load_messages/{chat_id}", timeout=10)
-            if response.status_code == 200:
-                return response.json() 
-            else:
-                return []
+            # [REVISI] GET bersyarat: 304 -> hasil parse sebelumnya untuk cursor yang sama
+            status, messages, _changed = api_client.get_json_conditional(
+                f"{self.api_url}/load_messages/{chat_id}", endpoint="history", params=params
+            )
+            if status != 200:
+                return None
         except requests.exceptions.RequestException:
             print("Gagal memuat pesan dari server.")
-            return [] 
+            return None
+        # Server lama mengabaikan parameter 'since' dan mengirim seluruh riwayat,
+        # jadi saring ulang di sisi klien. Pesan dengan timestamp yang sama dengan
+        # cursor tetap dikembalikan; duplikatnya dibuang oleh ChatPage.
+        if since and isinstance(messages, list):
+            cursor = parse_db_timestamp(since)
+            if cursor is not None:
+                messages = [m for m in messages if (parse_db_timestamp(m.get('db_timestamp')) or cursor) >= cursor]
+        return messages
 
     def save_message(self, chat_id, message_data):
-        # ... (kode tidak berubah)
+        """
+        [REVISI] Masukkan pesan ke outbox persisten milik pengirim; worker outbox
+        yang mengirimnya (berurutan, dengan retry). Mengembalikan client_msg_id.
+        """
         message_data_copy = message_data.copy() # [REVISI] Salin data agar tidak merusak metadata lokal
         message_data_copy['chat_id'] = chat_id
         if message_data_copy.get('type') in ['stegano', 'file']:
@@ -140,74 +325,359 @@ class MessageManager:
         # Hapus timestamp sisi klien, server akan menambahkannya
         if 'db_timestamp' in message_data_copy:
             del message_data_copy['db_timestamp']
-            
-        try:
-            def send_in_thread():
-                try:
-                    requests.post(f"{self.api_url}/save_message", json=message_data_copy, timeout=10)
-                    print("Pesan (metadata) berhasil dikirim ke server.")
-                except requests.exceptions.RequestException as e:
-                    print(f"Gagal mengirim pesan: {e}")
-            threading.Thread(target=send_in_thread, daemon=True).start()
-        except Exception as e:
-            print(f"Error memulai thread kirim pesan: {e}")
+        return self.start_outbox(message_data_copy.get('sender')).enqueue(chat_id, message_data_copy)
 
-# --- FUNGSI VIGENERE (Tidak berubah) ---
-def vigenere_encrypt(plain_text, key):
-    # ... (kode tidak berubah)
-    if not key: key = "defaultkey"
-    payload = {"text": plain_text, "key": key}
+# --- FUNGSI VIGENERE ---
+# [REVISI] Vigenere dihitung lokal (tanpa round-trip ke server). Versi lokal
+# dicek terhadap vektor rekaman endpoint server (VIGENERE_VECTORS_FILE, ikut
+# di-commit; rekam ulang dengan record_vigenere_vectors). Hanya jika vektor
+# hilang atau tidak cocok, endpoint POST /encrypt|decrypt/vigenere dipakai lagi;
+# server gagal -> VigenereUnavailableError (tidak ada fallback diam-diam ke
+# versi lokal yang terbukti berbeda).
+# Aturan versi lokal (Vigenere klasik): hanya huruf A-Z/a-z yang digeser
+# (kapitalisasi tetap), karakter lain tidak berubah, dan posisi kunci hanya
+# maju pada huruf. Huruf non-alfabet di kunci diabaikan.
+# Implementasi "vektor": huruf teks dikumpulkan, lalu setiap kelas posisi
+# (i mod panjang kunci) diterjemahkan sekaligus dengan str.translate.
+_VIGENERE_DEFAULT_KEY = "defaultkey"
+_NON_LETTER_RE = re.compile(r"[^A-Za-z]+")
+_LETTER_RE = re.compile(r"[A-Za-z]")
+
+def _build_shift_tables():
+    lower = "abcdefghijklmnopqrstuvwxyz"; upper = lower.upper()
+    tables = []
+    for shift in range(26):
+        shifted_lower = lower[shift:] + lower[:shift]
+        shifted_upper = upper[shift:] + upper[:shift]
+        tables.append(str.maketrans(lower + upper, shifted_lower + shifted_upper))
+    return tables
+
+_SHIFT_TABLES = _build_shift_tables() # _SHIFT_TABLES[k] menggeser huruf sejauh k
+
+def _vigenere_shifts(key):
+    if not key: key = _VIGENERE_DEFAULT_KEY
+    shifts = [ord(ch) - ord('a') for ch in key.lower() if 'a' <= ch <= 'z']
+    if not shifts:
+        shifts = [ord(ch) - ord('a') for ch in _VIGENERE_DEFAULT_KEY]
+    return shifts
+
+def _vigenere_apply(text, key, decrypt=False):
+    shifts = _vigenere_shifts(key)
+    letters = _NON_LETTER_RE.sub("", text)
+    if not letters:
+        return text
+    period = len(shifts)
+    out = [""] * len(letters)
+    for offset, shift in enumerate(shifts[:len(letters)]):
+        table = _SHIFT_TABLES[(26 - shift) % 26 if decrypt else shift]
+        out[offset::period] = letters[offset::period].translate(table)
+    # Sisipkan kembali huruf hasil ke sela-sela karakter non-huruf
+    gaps = _LETTER_RE.split(text)
+    pieces = [None] * (len(gaps) + len(out))
+    pieces[0::2] = gaps
+    pieces[1::2] = out
+    return "".join(pieces)
+
+# --- [BARU] Vektor Vigenere dari server produksi ---
+VIGENERE_VECTORS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vigenere_vectors.json")
+VIGENERE_CONFORMANCE_SAMPLES = [
+    ("Hello, World!", "kunci"),
+    ("attack at dawn", "LEMON"),
+    ("Pesan 123 dengan angka & simbol: @#$", "rahasia"),
+    ("0123456789 !\"#$%&'()*+,-./:;<=>?@[\\]^_`{|}~", "angka"),
+    ("MiXeD CaSe tExT", "Key With Spaces"),
+    ("Teks tanpa kunci", ""),
+    ("Kunci 2024 ber-angka", "k3y-2024!"),
+    ("ünïcödé dan emoji 🔐 tetap", "abc"),
+    ("Straße Ångström ÆØÅ ñandú", "ßeta"),
+    ("", "kunci"),
+]
+_vigenere_local_verified = None # None = belum dicek
+
+def load_vigenere_vectors(path=VIGENERE_VECTORS_FILE):
+    """List {"operation", "text", "key", "result"} hasil rekaman; [] jika belum ada."""
     try:
-        response = requests.post(f"{API_BASE_URL}/encrypt/vigenere", json=payload, timeout=5)
-        if response.status_code == 200:
-            return response.json().get("result", plain_text)
-        else:
-            print(f"Server error Vigenere Encrypt: {response.status_code}")
-            return plain_text 
-    except requests.exceptions.RequestException as e:
-        print(f"Koneksi error Vigenere Encrypt: {e}")
-        return plain_text 
+        with open(path, 'r', encoding='utf-8') as f:
+            vectors = json.load(f)
+    except (IOError, ValueError):
+        return []
+    return vectors if isinstance(vectors, list) else []
 
-def vigenere_decrypt(encrypted_text, key):
-    # ... (kode tidak berubah)
-    if not key: key = "defaultkey"
-    payload = {"text": encrypted_text, "key": key}
+def check_vigenere_vectors(vectors):
+    """Mengembalikan list vektor yang hasilnya berbeda dengan versi lokal."""
+    mismatches = []
+    for vector in vectors:
+        decrypt = vector["operation"] == "decrypt"
+        if _vigenere_apply(vector["text"], vector["key"], decrypt=decrypt) != vector["result"]:
+            mismatches.append(vector)
+    return mismatches
+
+def vigenere_local_verified():
+    """True jika vektor rekaman server ada dan semuanya cocok dengan versi lokal."""
+    global _vigenere_local_verified
+    if _vigenere_local_verified is None:
+        vectors = load_vigenere_vectors()
+        _vigenere_local_verified = bool(vectors) and not check_vigenere_vectors(vectors)
+    return _vigenere_local_verified
+
+def record_vigenere_vectors(path=VIGENERE_VECTORS_FILE, samples=VIGENERE_CONFORMANCE_SAMPLES):
+    """
+    Rekam vektor dari endpoint server (API_BASE_URL, arahkan ke produksi lewat
+    LDU_API_URL). Setiap sampel direkam untuk encrypt, lalu decrypt dari hasilnya.
+    """
+    vectors = []
+    for text, key in samples:
+        encrypted = _vigenere_remote("encrypt", text, key)
+        vectors.append({"operation": "encrypt", "text": text, "key": key, "result": encrypted})
+        vectors.append({"operation": "decrypt", "text": encrypted, "key": key,
+                        "result": _vigenere_remote("decrypt", encrypted, key)})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(vectors, f, ensure_ascii=False, indent=2)
+    return vectors
+
+class VigenereUnavailableError(RuntimeError):
+    """Versi lokal tidak terverifikasi dan server Vigenere tidak bisa dipakai."""
+
+def _vigenere_remote(operation, text, key):
+    """Satu operasi lewat server (tanpa cache: teks dan kunci tidak disimpan)."""
+    if not key: key = _VIGENERE_DEFAULT_KEY
+    response = api_client.post(f"{API_BASE_URL}/{operation}/vigenere", endpoint="vigenere", json={"text": text, "key": key})
+    response.raise_for_status()
+    result = response.json().get("result")
+    if not isinstance(result, str):
+        raise ValueError("Respons Vigenere server tidak berisi 'result'.")
+    return result
+
+def _vigenere(operation, text, key):
+    decrypt = operation == "decrypt"
+    if vigenere_local_verified():
+        return _vigenere_apply(text, key, decrypt=decrypt)
     try:
-        response = requests.post(f"{API_BASE_URL}/decrypt/vigenere", json=payload, timeout=5)
-        if response.status_code == 200:
-            return response.json().get("result", encrypted_text)
-        else:
-            print(f"Server error Vigenere Decrypt: {response.status_code}")
-            return encrypted_text
-    except requests.exceptions.RequestException as e:
-        print(f"Koneksi error Vigenere Decrypt: {e}")
-        return encrypted_text 
+        return _vigenere_remote(operation, text, key)
+    except (requests.exceptions.RequestException, ValueError) as e:
+        raise VigenereUnavailableError(f"Vigenere {operation} gagal: versi lokal belum terverifikasi "
+                                       f"dan server tidak bisa dipakai ({e}).") from e
+
+def vigenere_encrypt(plain_text, key):
+    return _vigenere("encrypt", plain_text, key)
+
+def vigenere_decrypt(encrypted_text, key):
+    return _vigenere("decrypt", encrypted_text, key)
 
 # --- CRYPTO ENGINE (Modern - AES) ---
-# (Tidak berubah)
+# [REVISI] Format payload v2: Scrypt hanya sekali per sesi (per CryptoEngine),
+# setiap pesan memakai sub-key HKDF dari salt pesan acak.
+#   v1: salt(16) + nonce(12) + ciphertext            -> Scrypt per pesan
+#   v2: "LDU\x02" + session_salt(16) + msg_salt(16) + nonce(12) + ciphertext
+# decrypt() tetap menerima payload v1.
+PAYLOAD_V2_MAGIC = b"LDU\x02"
+PAYLOAD_V2_HEADER_SIZE = len(PAYLOAD_V2_MAGIC) + 16 + 16 + 12
+
+# [BARU] Format stream v3 untuk file (biner, bukan base64), diproses per chunk
+# sehingga memori konstan berapa pun ukuran file:
+#   header: "LDU\x03" + session_salt(16) + file_salt(16) + nonce_prefix(7) + chunk_size(4, BE)
+#   lalu chunk: ciphertext(<= chunk_size) + tag(16)
+# Nonce chunk = nonce_prefix + indeks(4, BE) + flag_final(1); header menjadi AAD.
+# Chunk yang ditukar/dihapus/dipotong gagal verifikasi (indeks & flag final ikut diautentikasi).
+STREAM_V3_MAGIC = b"LDU\x03"
+STREAM_V3_HEADER_SIZE = len(STREAM_V3_MAGIC) + 16 + 16 + 7 + 4
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_MAX_CHUNK_SIZE = STREAM_CHUNK_SIZE * 16 # Batas chunk_size dari header (header belum terautentikasi)
+STREAM_TAG_SIZE = 16
+
+# [BARU] Cache LRU kunci hasil Scrypt, dipakai bersama semua CryptoEngine.
+# Dekripsi ulang (tombol 🔄, refresh) payload yang salt-nya sudah pernah
+# diturunkan tidak perlu Scrypt lagi.
+class DerivedKeyCache:
+    """
+    Key cache = SHA-256(password, salt), jadi password tidak disimpan.
+    Nilai disimpan sebagai bytearray dan ditimpa nol saat dikeluarkan dari
+    cache atau saat clear() (logout). Salinan bytes yang sudah diberikan ke
+    AESGCM tidak bisa dinolkan; ini upaya terbaik di Python.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(password: bytes, salt: bytes) -> bytes:
+        return hashlib.sha256(len(password).to_bytes(4, 'big') + password + salt).digest()
+
+    @staticmethod
+    def _zeroize(buffer: bytearray):
+        buffer[:] = bytes(len(buffer))
+
+    def get_or_derive(self, password: bytes, salt: bytes, derive) -> bytes:
+        cache_key = self._cache_key(password, salt)
+        with self._lock:
+            key = self._entries.get(cache_key)
+            if key is not None:
+                self._entries.move_to_end(cache_key)
+                return bytes(key)
+        derived = derive() # Scrypt di luar lock agar thread lain tidak tertahan
+        with self._lock:
+            if cache_key not in self._entries:
+                self._entries[cache_key] = bytearray(derived)
+                while len(self._entries) > self.max_entries:
+                    _old_key, evicted = self._entries.popitem(last=False)
+                    self._zeroize(evicted)
+        return derived
+
+    def clear(self):
+        with self._lock:
+            for key in self._entries.values():
+                self._zeroize(key)
+            self._entries.clear()
+
+DERIVED_KEY_CACHE = DerivedKeyCache()
+
+def clear_derived_key_cache():
+    """Hapus (dan nolkan) semua kunci turunan. Dipanggil saat logout."""
+    DERIVED_KEY_CACHE.clear()
+
 class CryptoEngine:
     # ... (kode tidak berubah)
     def __init__(self, password: str):
         self.password = password.encode('utf-8')
+        # [BARU] Kunci sesi: satu Scrypt untuk semua pesan yang dienkripsi engine ini
+        self._session_salt = None
+        self._session_key = None
     def _derive_key(self, salt: bytes) -> bytes:
-        kdf = Scrypt(salt=salt, length=32, n=2**14, r=8, p=1, backend=default_backend())
-        return kdf.derive(self.password)
+        # [REVISI] Lewat DERIVED_KEY_CACHE: (password, salt) yang sama tidak di-Scrypt ulang
+        def derive():
+            kdf = Scrypt(salt=salt, length=32, n=2**14, r=8, p=1, backend=default_backend())
+            return kdf.derive(self.password)
+        return DERIVED_KEY_CACHE.get_or_derive(self.password, salt, derive)
+    def _master_key(self, session_salt: bytes) -> bytes:
+        # Master key v2 = Scrypt(password, session_salt), jadi ikut ter-cache
+        return self._derive_key(session_salt)
+    @staticmethod
+    def _message_key(master_key: bytes, msg_salt: bytes) -> bytes:
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=msg_salt, info=b"ldu-msg-v2", backend=default_backend())
+        return hkdf.derive(master_key)
     def encrypt(self, data: bytes) -> bytes:
-        salt = os.urandom(16); key = self._derive_key(salt)
-        aesgcm = AESGCM(key); nonce = os.urandom(12)
-        encrypted_data = aesgcm.encrypt(nonce, data, None)
-        return base64.b64encode(salt + nonce + encrypted_data) 
+        if self._session_key is None:
+            self._session_salt = os.urandom(16)
+            self._session_key = self._master_key(self._session_salt)
+        msg_salt = os.urandom(16); nonce = os.urandom(12)
+        header = PAYLOAD_V2_MAGIC + self._session_salt + msg_salt
+        aesgcm = AESGCM(self._message_key(self._session_key, msg_salt))
+        encrypted_data = aesgcm.encrypt(nonce, data, header)
+        return base64.b64encode(header + nonce + encrypted_data)
+    def _decrypt_v2(self, combined_payload: bytes) -> bytes:
+        magic_size = len(PAYLOAD_V2_MAGIC)
+        session_salt = combined_payload[magic_size:magic_size + 16]
+        msg_salt = combined_payload[magic_size + 16:magic_size + 32]
+        nonce = combined_payload[magic_size + 32:PAYLOAD_V2_HEADER_SIZE]
+        encrypted_data = combined_payload[PAYLOAD_V2_HEADER_SIZE:]
+        aesgcm = AESGCM(self._message_key(self._master_key(session_salt), msg_salt))
+        return aesgcm.decrypt(nonce, encrypted_data, combined_payload[:magic_size + 32])
+    def _decrypt_v1(self, combined_payload: bytes) -> bytes:
+        salt = combined_payload[:16]; nonce = combined_payload[16:28]
+        encrypted_data = combined_payload[28:]
+        key = self._derive_key(salt)
+        aesgcm = AESGCM(key)
+        return aesgcm.decrypt(nonce, encrypted_data, None)
     def decrypt(self, combined_payload_b64: bytes) -> bytes:
         try:
             combined_payload = base64.b64decode(combined_payload_b64)
-            salt = combined_payload[:16]; nonce = combined_payload[16:28]
-            encrypted_data = combined_payload[28:]
-            key = self._derive_key(salt)
-            aesgcm = AESGCM(key)
-            return aesgcm.decrypt(nonce, encrypted_data, None)
+            if combined_payload.startswith(PAYLOAD_V2_MAGIC) and len(combined_payload) > PAYLOAD_V2_HEADER_SIZE:
+                try:
+                    return self._decrypt_v2(combined_payload)
+                except InvalidTag:
+                    # Bisa jadi payload v1 yang salt-nya kebetulan diawali magic v2
+                    pass
+            return self._decrypt_v1(combined_payload)
         except Exception as e:
             print(f"CryptoEngine Gagal Dekripsi: {e}")
             raise ValueError("Gagal mendekripsi data: Password salah atau data korup.")
+    # --- [BARU] Enkripsi/dekripsi stream (file) ---
+    @staticmethod
+    def is_stream_payload(head: bytes) -> bool:
+        """True jika bytes awal file adalah header format stream v3."""
+        return head[:len(STREAM_V3_MAGIC)] == STREAM_V3_MAGIC
+    @staticmethod
+    def _file_key(master_key: bytes, file_salt: bytes) -> bytes:
+        hkdf = HKDF(algorithm=hashes.SHA256(), length=32, salt=file_salt, info=b"ldu-file-v3", backend=default_backend())
+        return hkdf.derive(master_key)
+    @staticmethod
+    def _chunk_nonce(nonce_prefix: bytes, index: int, final: bool) -> bytes:
+        if index > 0xFFFFFFFF:
+            raise ValueError("File terlalu besar untuk format stream.")
+        return nonce_prefix + index.to_bytes(4, 'big') + (b"\x01" if final else b"\x00")
+    @staticmethod
+    def _read_full(src, size: int) -> bytes:
+        """read() sampai 'size' byte atau EOF; read() boleh mengembalikan lebih sedikit (pipe/socket)."""
+        parts = []; remaining = size
+        while remaining > 0:
+            part = src.read(remaining)
+            if not part:
+                break
+            parts.append(part); remaining -= len(part)
+        return b"".join(parts)
+    def encrypt_stream(self, src, dst, chunk_size: int = STREAM_CHUNK_SIZE) -> int:
+        """
+        Enkripsi file object 'src' ke 'dst' per chunk. Hanya dua chunk yang
+        dipegang di memori (chunk saat ini + satu lookahead untuk flag final).
+        Mengembalikan jumlah byte yang ditulis ke dst.
+        """
+        if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+            raise ValueError(f"chunk_size harus 1..{STREAM_MAX_CHUNK_SIZE} byte.")
+        if self._session_key is None:
+            self._session_salt = os.urandom(16)
+            self._session_key = self._master_key(self._session_salt)
+        file_salt = os.urandom(16); nonce_prefix = os.urandom(7)
+        header = STREAM_V3_MAGIC + self._session_salt + file_salt + nonce_prefix + chunk_size.to_bytes(4, 'big')
+        aesgcm = AESGCM(self._file_key(self._session_key, file_salt))
+        dst.write(header); written = len(header)
+        index = 0
+        chunk = self._read_full(src, chunk_size)
+        while True:
+            next_chunk = self._read_full(src, chunk_size) if len(chunk) == chunk_size else b""
+            final = not next_chunk
+            encrypted_chunk = aesgcm.encrypt(self._chunk_nonce(nonce_prefix, index, final), chunk, header)
+            dst.write(encrypted_chunk); written += len(encrypted_chunk)
+            if final:
+                return written
+            chunk = next_chunk; index += 1
+    def decrypt_stream(self, src, dst) -> int:
+        """
+        Dekripsi file object 'src' (format stream v3) ke 'dst'. Plaintext ditulis
+        per chunk, jadi jika gagal di tengah jalan dst berisi sebagian data:
+        pemanggil sebaiknya menulis ke file sementara lalu mengganti namanya.
+        Mengembalikan jumlah byte plaintext. Gagal -> ValueError.
+        Chunk pendek hanya sah sebagai chunk terakhir (EOF); stream yang terpotong
+        sebelum chunk berflag final gagal verifikasi.
+        """
+        header = self._read_full(src, STREAM_V3_HEADER_SIZE)
+        if len(header) != STREAM_V3_HEADER_SIZE or not self.is_stream_payload(header):
+            raise ValueError("Gagal mendekripsi data: Bukan format stream yang dikenali.")
+        offset = len(STREAM_V3_MAGIC)
+        session_salt = header[offset:offset + 16]
+        file_salt = header[offset + 16:offset + 32]
+        nonce_prefix = header[offset + 32:offset + 39]
+        chunk_size = int.from_bytes(header[offset + 39:offset + 43], 'big')
+        if not 0 < chunk_size <= STREAM_MAX_CHUNK_SIZE:
+            # Dicek sebelum read(): header belum terautentikasi, jangan alokasi sebesar isinya
+            raise ValueError("Gagal mendekripsi data: Header stream korup.")
+        try:
+            aesgcm = AESGCM(self._file_key(self._master_key(session_salt), file_salt))
+            block_size = chunk_size + STREAM_TAG_SIZE
+            index = 0; written = 0
+            block = self._read_full(src, block_size)
+            while True:
+                next_block = self._read_full(src, block_size) if len(block) == block_size else b""
+                final = not next_block
+                if len(block) < STREAM_TAG_SIZE:
+                    raise ValueError("Gagal mendekripsi data: Stream terpotong.")
+                chunk = aesgcm.decrypt(self._chunk_nonce(nonce_prefix, index, final), block, header)
+                dst.write(chunk); written += len(chunk)
+                if final:
+                    return written
+                block = next_block; index += 1
+        except InvalidTag:
+            raise ValueError("Gagal mendekripsi data: Password salah atau data korup.")
 
 # --- [INSTRUKSI 1: FUNGSI HELPER WHITE-MIST] ---
 def encrypt_whitemist(data_bytes: bytes, key: str, is_text: bool = False) -> str:
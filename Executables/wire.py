@@ -0,0 +1,217 @@
+import json
+import gzip
+import zlib
+import base64
+import binascii
+
+# [BARU] Format kawat (wire format) ringkas untuk riwayat pesan dan pengiriman pesan.
+#
+# Negosiasi lewat header HTTP biasa, JSON tetap menjadi fallback:
+#   Accept: application/x-msgpack, application/json;q=0.5
+#   Accept-Encoding: zstd, gzip (request body: Content-Encoding)
+#
+# Di dalam msgpack:
+# - List pesan (list berisi dict) dikirim sebagai tabel {"$table": [fields, rows, sparse]},
+#   jadi nama key ("sender", "recipient", ...) tidak diulang di setiap pesan.
+#   Key yang tidak ada di sebuah pesan ditandai ExtType(MISSING_EXT) agar bentuk
+#   dict hasil decode sama persis dengan versi JSON (sparse=False: tidak ada yang hilang).
+# - Field 'data' (payload AES dalam base64) dikirim sebagai bytes mentah; hasil
+#   decode dikembalikan lagi ke string base64 yang sama, jadi kode dekripsi tidak
+#   berubah. Hanya base64 kanonik yang dikonversi (round-trip harus identik).
+#
+# msgpack dan zstandard opsional: tanpa keduanya semua tetap berjalan dengan
+# JSON + gzip.
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/x-msgpack"
+ACCEPT = f"{MSGPACK_TYPE}, {JSON_TYPE};q=0.5" if msgpack else JSON_TYPE
+
+COMPRESS_MIN_SIZE = 1024 # Body lebih kecil dari ini tidak dikompres
+MAX_DECODED_SIZE = 64 * 1024 * 1024 # Batas hasil dekompresi (anti "zip bomb")
+BYTES_FIELDS = ('data',)
+MISSING_EXT = 0
+_TABLE_KEY = "$table"
+
+
+class WireError(ValueError):
+    """Body tidak bisa di-decode (format/encoding tidak dikenal atau rusak)."""
+
+
+class _Missing:
+    pass
+
+
+_MISSING = _Missing()
+
+
+# --- Transformasi struktur ---
+def _field_to_wire(key, value):
+    if key in BYTES_FIELDS and isinstance(value, str):
+        try:
+            raw = base64.b64decode(value, validate=True)
+        except (binascii.Error, ValueError):
+            return value
+        if base64.b64encode(raw).decode('ascii') == value:
+            return raw
+    return value
+
+
+def _field_from_wire(key, value):
+    if key in BYTES_FIELDS and isinstance(value, bytes):
+        return base64.b64encode(value).decode('ascii')
+    return value
+
+
+def _is_record_list(value):
+    return isinstance(value, list) and len(value) > 1 and all(isinstance(item, dict) for item in value)
+
+
+def _to_wire(value):
+    if _is_record_list(value):
+        fields = []
+        seen = set()
+        for record in value:
+            for key in record:
+                if key not in seen:
+                    seen.add(key)
+                    fields.append(key)
+        # Isi sel tabel dikirim apa adanya (msgpack menangani struktur bersarang);
+        # hanya kolom BYTES_FIELDS yang dikonversi.
+        rows = [[_field_to_wire(key, record[key]) if key in record else msgpack.ExtType(MISSING_EXT, b"")
+                 for key in fields] for record in value]
+        sparse = any(len(record) != len(fields) for record in value)
+        return {_TABLE_KEY: [fields, rows, sparse]}
+    if isinstance(value, dict):
+        return {key: _field_to_wire(key, _to_wire(item)) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_to_wire(item) for item in value]
+    return value
+
+
+def _table_from_wire(fields, rows, sparse):
+    # Jalur cepat: dipanggil untuk setiap pesan di riwayat panjang
+    bytes_columns = [index for index, key in enumerate(fields) if key in BYTES_FIELDS]
+    b2a = binascii.b2a_base64
+    records = []
+    for row in rows:
+        for index in bytes_columns:
+            item = row[index]
+            if type(item) is bytes:
+                row[index] = b2a(item, newline=False).decode('ascii')
+        if sparse:
+            records.append({key: item for key, item in zip(fields, row) if item is not _MISSING})
+        else:
+            records.append(dict(zip(fields, row)))
+    return records
+
+
+def _from_wire(value):
+    if isinstance(value, dict):
+        if len(value) == 1 and _TABLE_KEY in value:
+            return _table_from_wire(*value[_TABLE_KEY])
+        return {key: _field_from_wire(key, _from_wire(item)) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_from_wire(item) for item in value]
+    return value
+
+
+def _ext_hook(code, data):
+    if code == MISSING_EXT:
+        return _MISSING
+    return msgpack.ExtType(code, data)
+
+
+# --- Negosiasi ---
+def _accepted(header):
+    """Nilai header Accept/Accept-Encoding -> set token dengan q > 0."""
+    tokens = set()
+    for part in (header or "").split(','):
+        token, _, params = part.strip().partition(';')
+        if params.strip().replace(' ', '') in ('q=0', 'q=0.0'):
+            continue
+        if token:
+            tokens.add(token.strip().lower())
+    return tokens
+
+
+def choose_content_type(accept_header):
+    if msgpack and MSGPACK_TYPE in _accepted(accept_header):
+        return MSGPACK_TYPE
+    return JSON_TYPE
+
+
+def choose_encoding(accept_encoding_header):
+    accepted = _accepted(accept_encoding_header)
+    if zstandard and 'zstd' in accepted:
+        return 'zstd'
+    if 'gzip' in accepted:
+        return 'gzip'
+    return None
+
+
+# --- Encode / decode body ---
+def encode(payload, content_type=JSON_TYPE):
+    if content_type == MSGPACK_TYPE:
+        return msgpack.packb(_to_wire(payload), use_bin_type=True)
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def decode(body, content_type=None):
+    """Body (sudah didekompres) -> objek Python. Raise WireError jika gagal."""
+    media_type = (content_type or JSON_TYPE).split(';')[0].strip().lower()
+    if not body:
+        return None
+    if media_type == MSGPACK_TYPE:
+        if msgpack is None:
+            raise WireError("msgpack tidak terpasang.")
+        try:
+            return _from_wire(msgpack.unpackb(body, raw=False, ext_hook=_ext_hook))
+        except (ValueError, TypeError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as e:
+            raise WireError(f"Body msgpack rusak: {e}")
+    try:
+        return json.loads(body.decode('utf-8'))
+    except (UnicodeDecodeError, ValueError) as e:
+        raise WireError(f"Body JSON rusak: {e}")
+
+
+def compress(body, encoding):
+    """Mengembalikan (body, content_encoding). Body kecil tidak dikompres."""
+    if not encoding or len(body) < COMPRESS_MIN_SIZE:
+        return body, None
+    if encoding == 'zstd' and zstandard:
+        return zstandard.ZstdCompressor(level=3).compress(body), 'zstd'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6), 'gzip'
+    return body, None
+
+
+def decompress(body, encoding, max_size=MAX_DECODED_SIZE):
+    encoding = (encoding or "").strip().lower()
+    if not encoding or encoding == 'identity':
+        return body
+    try:
+        if encoding == 'gzip':
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            result = decompressor.decompress(body, max_size)
+            if decompressor.unconsumed_tail:
+                raise WireError("Body terlalu besar setelah dekompresi.")
+            return result
+        if encoding == 'zstd' and zstandard:
+            return zstandard.ZstdDecompressor().decompress(body, max_output_size=max_size)
+    except (zlib.error, EOFError) as e:
+        raise WireError(f"Body terkompresi rusak: {e}")
+    except Exception as e:
+        if zstandard and isinstance(e, zstandard.ZstdError):
+            raise WireError(f"Body terkompresi rusak: {e}")
+        raise
+    raise WireError(f"Content-Encoding tidak didukung: {encoding}")